@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark the artifact cache against a local HTTP server.
+
+Serves artifacts from a local HTTP server that counts downloads and
+delays each response, and checks that `ArtifactCache`:
+
+* downloads an artifact once, and serves it from disk afterwards, also
+  to a new cache on the same directory;
+* rejects an artifact that does not match its SHA-256 digest, or whose
+  download breaks off, without caching it or leaving it on disk;
+* serves cached artifacts in offline mode, and refuses to download others;
+* evicts the least recently used artifacts once it grows past its size cap;
+* shares one download between concurrent fetches of the same URL.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+
+from pluto.utils import ArtifactCache, ArtifactCacheError
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serve the server's artifacts, counting downloads."""
+
+    def do_GET(self) -> None:
+        """Serve an artifact, or cut it short if its path says so."""
+        server = self.server
+        with server.lock:
+            server.downloads[self.path] = server.downloads.get(self.path, 0) + 1
+        data = server.artifacts.get(self.path.replace("/truncated", ""))
+        if data is None:
+            self.send_error(404)
+            return
+        time.sleep(server.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data[: len(data) // 2] if self.path.startswith("/truncated") else data)
+
+    def log_message(self, *_: Any) -> None:
+        """Keep quiet."""
+
+
+def _serve(artifacts: Dict[str, bytes], delay: float) -> ThreadingHTTPServer:
+    """Start serving artifacts on a local port in a background thread."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.artifacts = artifacts
+    server.downloads = {}
+    server.delay = delay
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _leftovers(root: Path) -> List[str]:
+    """Get files in the cache that no index entry accounts for."""
+    return [p.name for p in root.iterdir() if p.is_file() and p.name != "index.json"]
+
+
+async def _check(server: ThreadingHTTPServer, root: Path, size: int) -> List[str]:
+    """Exercise the cache against the server, and get what went wrong."""
+    failures = []
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    downloads = server.downloads
+    artifacts = server.artifacts
+
+    cache = ArtifactCache(root / "cache", max_size=size * 5 // 2)
+    start = time.monotonic()
+    path = await cache.fetch(f"{base}/a.tar.gz")
+    cold = time.monotonic() - start
+    start = time.monotonic()
+    warm = await cache.fetch(f"{base}/a.tar.gz")
+    hit = time.monotonic() - start
+    reopened = await ArtifactCache(root / "cache").fetch(f"{base}/a.tar.gz")
+    print(f"Cold fetch of {size / 2**20:.0f} MiB took {cold:.3f}s, warm fetch {hit:.4f}s")
+    if path.read_bytes() != artifacts["/a.tar.gz"] or warm != path or reopened != path:
+        failures.append("cached artifact differs from the download")
+    if downloads.get("/a.tar.gz") != 1:
+        failures.append(f"artifact was downloaded {downloads.get('/a.tar.gz')} times")
+
+    try:
+        await cache.fetch(f"{base}/b.tar.gz", sha256="0" * 64)
+        failures.append("artifact with the wrong digest was accepted")
+    except ArtifactCacheError:
+        pass
+    if cache.get(f"{base}/b.tar.gz") or _leftovers(cache.root):
+        failures.append("artifact with the wrong digest was cached")
+    try:
+        await cache.fetch(f"{base}/truncated/b.tar.gz")
+        failures.append("truncated artifact was accepted")
+    except ArtifactCacheError:
+        pass
+    if cache.get(f"{base}/truncated/b.tar.gz") or _leftovers(cache.root):
+        failures.append("truncated artifact was cached")
+    digest = hashlib.sha256(artifacts["/b.tar.gz"]).hexdigest()
+    if (await cache.fetch(f"{base}/b.tar.gz", sha256=digest)).parent.name != digest:
+        failures.append("artifact with the right digest was not cached by digest")
+
+    offline = ArtifactCache(root / "cache", offline=True)
+    before = dict(downloads)
+    if (await offline.fetch(f"{base}/a.tar.gz")) != path:
+        failures.append("offline cache did not serve a cached artifact")
+    try:
+        await offline.fetch(f"{base}/c.tar.gz")
+        failures.append("offline cache downloaded an artifact")
+    except ArtifactCacheError:
+        pass
+    if downloads != before:
+        failures.append("offline cache contacted the server")
+
+    # a and b are cached. Touch a, so that b is least recently used.
+    cache.get(f"{base}/a.tar.gz")
+    await cache.fetch(f"{base}/c.tar.gz")
+    cached = [n for n in "abc" if cache.get(f"{base}/{n}.tar.gz")]
+    print(f"Cache of {cache.max_size / 2**20:.1f} MiB holds {cached} after fetching a, b, c")
+    if cached != ["a", "c"] or cache.size > cache.max_size:
+        failures.append(f"eviction kept {cached} totalling {cache.size} bytes")
+    if (root / "cache" / "objects" / digest).exists():
+        failures.append("evicted artifact was left on disk")
+
+    start = time.monotonic()
+    paths = await asyncio.gather(*(cache.fetch(f"{base}/d.tar.gz") for _ in range(8)))
+    print(f"8 concurrent fetches of one artifact took {time.monotonic() - start:.3f}s")
+    if downloads.get("/d.tar.gz") != 1 or len(set(paths)) != 1:
+        failures.append(f"concurrent fetches downloaded {downloads.get('/d.tar.gz')} times")
+    return failures
+
+
+def main() -> int:
+    """Run the artifact cache benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=4 << 20, help="Bytes of each artifact.")
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds each download waits.")
+    args = parser.parse_args()
+
+    artifacts = {f"/{n}.tar.gz": bytes([i]) * args.size for i, n in enumerate("abcd")}
+    server = _serve(artifacts, args.delay)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            failures = asyncio.run(_check(server, Path(tmp), args.size))
+    finally:
+        server.shutdown()
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark SSH round trips of provisioning the NFS server.
+
+Provisions the NFS server of a simulated cluster (see `sim.py`)
+three ways, and reports the SSH and SCP round trips and simulated time
+each takes:
+
+* one SSH session per command, as bootstrap originally did;
+* installing exports with `Cluster.push`, with the other commands on
+  their own SSH sessions;
+* as bootstrap does now, with the commands that surround the push
+  queued into the command batch that checks the exports file.
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+from typing import Any, Dict
+
+from craft_cli import EmitterMode, emit
+from juju.unit import Unit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimModel
+
+from pluto.drivers import Cluster
+from pluto.ops.bootstrap import NFS_EXPORTS, _Bootstrap
+
+_INSTALL = "sudo apt -y install nfs-kernel-server"
+_HOME = "sudo mkdir -p /home/researcher && sudo chown -R researcher /home/researcher"
+
+
+async def _per_command(cluster: Cluster) -> None:
+    """Provision NFS servers with one SSH session per command."""
+
+    async def _provision(unit: Unit) -> None:
+        await unit.ssh(_INSTALL)
+        with tempfile.NamedTemporaryFile("w") as exports:
+            exports.write(NFS_EXPORTS)
+            exports.flush()
+            await unit.scp_to(exports.name, "~/exports")
+        await unit.ssh("sudo mv ~/exports /etc/exports")
+        await unit.ssh("sudo exportfs -a")
+        await unit.ssh("sudo systemctl restart nfs-kernel-server")
+        await unit.ssh(_HOME)
+
+    await cluster.fan_out("nfs-server", _provision, check=True)
+
+
+async def _push(cluster: Cluster) -> None:
+    """Provision NFS servers with a push of the exports file between other commands."""
+    await cluster.ssh_on("nfs-server", _INSTALL, check=True)
+    await cluster.push(
+        "nfs-server",
+        NFS_EXPORTS.encode(),
+        "/etc/exports",
+        on_change="exportfs -a && systemctl restart nfs-kernel-server",
+    )
+    await cluster.ssh_on("nfs-server", _HOME, check=True)
+
+
+async def _batched(cluster: Cluster) -> None:
+    """Provision NFS servers as bootstrap does."""
+    await _Bootstrap(cluster, None, None).provision_nfs()
+
+
+_MODES = {"per command": _per_command, "push": _push, "batched": _batched}
+
+
+async def _provision(cloud: SimCloud, servers: int, mode: str) -> float:
+    """Provision the NFS servers of a fresh simulated cluster.
+
+    Returns:
+        Simulated seconds provisioning took, after the servers came up.
+    """
+    cluster = Cluster(
+        "bench-batch",
+        controller=SimController(cloud),
+        model=SimModel(cloud),
+        juju=SimJujuRunner(cloud),
+    )
+    async with cluster:
+        await cluster.deploy("ubuntu", application_name="nfs-server", num_units=servers)
+        await cluster.wait_for(["nfs-server"], status="active", timeout=1200)
+        cloud.round_trips.clear()
+        start = asyncio.get_event_loop().time()
+        await _MODES[mode](cluster)
+        return asyncio.get_event_loop().time() - start
+
+
+def run(servers: int, mode: str, seed: int = 0) -> Dict[str, Any]:
+    """Provision simulated NFS servers one way and measure it."""
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    cloud = SimCloud(seed=seed)
+    try:
+        simulated = loop.run_until_complete(_provision(cloud, servers, mode))
+    finally:
+        loop.close()
+    return {
+        "simulated": simulated,
+        "ssh": cloud.round_trips["ssh"],
+        "scp": cloud.round_trips["scp"],
+        "round_trips": sum(cloud.round_trips.values()),
+    }
+
+
+def main() -> int:
+    """Run the command batch benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--servers", type=int, nargs="+", default=[1, 4], help="Numbers of NFS servers."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of simulated latencies.")
+    args = parser.parse_args()
+
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting command batch benchmark")
+    try:
+        results = [
+            (servers, mode, run(servers, mode, args.seed))
+            for servers in args.servers
+            for mode in _MODES
+        ]
+    finally:
+        emit.ended_ok()
+
+    print(
+        f"{'Servers':>7} {'Mode':<12} {'SSH':>5} {'SCP':>5} {'Round trips':>12} {'Simulated':>10}"
+    )
+    for servers, mode, r in results:
+        print(
+            f"{servers:>7} {mode:<12} {r['ssh']:>5} {r['scp']:>5} "
+            f"{r['round_trips']:>12} {r['simulated']:>9.1f}s"
+        )
+
+    failed = False
+    for servers in args.servers:
+        before, after = (
+            next(r for s, m, r in results if s == servers and m == mode)
+            for mode in ("per command", "batched")
+        )
+        # Checking the exports file, copying it, and installing it.
+        if after["round_trips"] > 3 * servers or after["round_trips"] >= before["round_trips"]:
+            print(f"FAIL: batched provisioning of {servers} servers took {after['round_trips']}")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark full bootstraps against a simulated Juju controller.
+
+Bootstraps the default cluster at several compute node counts on a
+simulated controller (see `sim.py`) and reports, for each size,
+how long the bootstrap would take against the simulated latencies, the
+wall-clock time pluto itself spent, the number of Juju round trips and
+machines, and peak memory traced with tracemalloc. Clusters can also be
+bootstrapped with dense placement of control plane services, and on a
+cloud that provisions a limited number of machines at once. Fails if
+results regress past a stored baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from craft_cli import EmitterMode, emit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimModel
+
+from pluto.drivers import Cluster
+from pluto.ops.bootstrap import NHC_URL, bootstrap_cluster
+from pluto.spec import ClusterSpec
+from pluto.utils import ArtifactCache
+
+# Allowed regression over the baseline, as a fraction of the baseline plus
+# an absolute slack that absorbs noise in small measurements.
+_TOLERANCE = {"round_trips": (0.05, 0), "simulated": (0.10, 5.0), "peak_memory": (0.50, 1 << 20)}
+
+
+async def _bootstrap(
+    cloud: SimCloud, nodes: int, clusters: int, concurrency: int, placement: str, root: Path
+) -> List[str]:
+    """Bootstrap simulated clusters with a number of compute nodes each.
+
+    Like `pluto bootstrap`, clusters share a controller connection, Juju runner,
+    artifact cache and concurrency limit.
+    """
+    spec = ClusterSpec.default()
+    spec.scale("compute", nodes)
+    spec.place(placement)
+    nhc = root / "lbnl-nhc-1.4.3.tar.gz"
+    nhc.write_bytes(b"nhc")
+    cache = ArtifactCache(root / "artifacts", offline=True)
+    cache.add(NHC_URL, nhc)
+
+    controller = SimController(cloud)
+    await controller.connect()
+    juju = SimJujuRunner(cloud)
+    limit = asyncio.Semaphore(concurrency)
+
+    async def _one(name: str) -> List[str]:
+        cluster = Cluster(
+            name, controller=controller, model=SimModel(cloud), juju=juju, limit=limit
+        )
+        async with cluster:
+            graph = await bootstrap_cluster(cluster, spec, cache, concurrency)
+        return graph.report()
+
+    reports = await asyncio.gather(*(_one(f"bench-{i}") for i in range(clusters)))
+    return reports[0]
+
+
+def run(
+    nodes: int,
+    clusters: int = 1,
+    concurrency: int = 16,
+    seed: int = 0,
+    placement: str = "spread",
+    machine_concurrency: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Bootstrap simulated clusters and measure them.
+
+    Args:
+        nodes: Number of compute nodes per cluster.
+        clusters: Number of clusters to bootstrap at once. Default: 1.
+        concurrency: Maximum number of units pluto operates on at once. Default: 16.
+        seed: Seed of the simulated latencies. Default: 0.
+        placement: Placement of applications onto machines. Default: "spread".
+        machine_concurrency: Maximum number of machines the cloud provisions
+            at once. Default: None, no limit.
+    """
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    cloud = SimCloud(machine_concurrency=machine_concurrency, seed=seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SNAP_USER_DATA"] = tmp
+        tracemalloc.start()
+        start, wall = loop.time(), time.perf_counter()
+        try:
+            report = loop.run_until_complete(
+                _bootstrap(cloud, nodes, clusters, concurrency, placement, Path(tmp))
+            )
+            simulated, wall = loop.time() - start, time.perf_counter() - wall
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+            loop.close()
+
+    return {
+        "nodes": nodes,
+        "clusters": clusters,
+        "placement": placement,
+        "machine_concurrency": machine_concurrency,
+        "simulated": round(simulated, 1),
+        "wall": round(wall, 2),
+        "round_trips": sum(cloud.round_trips.values()),
+        "machines": cloud.machines,
+        "peak_memory": peak,
+        "by_operation": dict(sorted(cloud.round_trips.items())),
+        "critical_path": report,
+    }
+
+
+def _key(result: Dict[str, Any]) -> str:
+    """Get baseline key of a result."""
+    key = str(result["nodes"])
+    if result["clusters"] != 1:
+        key += f"x{result['clusters']}"
+    if result.get("placement", "spread") != "spread":
+        key += f"-{result['placement']}"
+    if result.get("machine_concurrency"):
+        key += f"-m{result['machine_concurrency']}"
+    return key
+
+
+def _regressions(result: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Compare a result against its baseline."""
+    failures = []
+    label = _key(result)
+    for metric, (tolerance, slack) in _TOLERANCE.items():
+        limit = baseline[metric] * (1 + tolerance) + slack
+        if result[metric] > limit:
+            failures.append(
+                f"{label}: {metric} {result[metric]} exceeds "
+                f"baseline {baseline[metric]} by more than {tolerance:.0%}"
+            )
+    return failures
+
+
+def main() -> int:
+    """Run the bootstrap benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--nodes", type=int, nargs="+", default=[1, 100, 1000], help="Compute node counts."
+    )
+    parser.add_argument(
+        "--clusters", type=int, default=1, help="Number of clusters to bootstrap at once."
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="Bootstrap concurrency.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of simulated latencies.")
+    parser.add_argument(
+        "--placement",
+        nargs="+",
+        choices=["spread", "dense"],
+        default=["spread"],
+        help="Placements of applications onto machines to compare.",
+    )
+    parser.add_argument(
+        "--machine-concurrency",
+        type=int,
+        help="Maximum number of machines the cloud provisions at once. Default: no limit.",
+    )
+    parser.add_argument("--baseline", type=Path, help="Baseline results to compare against.")
+    parser.add_argument(
+        "--write-baseline", action="store_true", help="Write results to the baseline file."
+    )
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print critical paths.")
+    args = parser.parse_args()
+
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting bootstrap benchmark")
+    try:
+        results = [
+            run(
+                nodes,
+                args.clusters,
+                args.concurrency,
+                args.seed,
+                placement,
+                args.machine_concurrency,
+            )
+            for nodes in args.nodes
+            for placement in args.placement
+        ]
+    finally:
+        emit.ended_ok()
+
+    print(
+        f"{'Nodes':>6} {'Clusters':>8} {'Placement':>9} {'Machines':>8} {'Simulated':>10} "
+        f"{'Wall':>8} {'Round trips':>12} {'Peak memory':>12}"
+    )
+    for r in results:
+        print(
+            f"{r['nodes']:>6} {r['clusters']:>8} {r['placement']:>9} {r['machines']:>8} "
+            f"{r['simulated']:>9.1f}s {r['wall']:>7.2f}s "
+            f"{r['round_trips']:>12} {r['peak_memory'] / 2**20:>10.1f}MB"
+        )
+        if args.verbose:
+            print("\n".join(r["critical_path"]))
+
+    if args.baseline and args.write_baseline:
+        args.baseline.write_text(json.dumps({_key(r): r for r in results}, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        failures = []
+        for r in results:
+            if _key(r) in baseline:
+                failures.extend(_regressions(r, baseline[_key(r)]))
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        return 1 if failures else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
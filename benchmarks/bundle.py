@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Check the Juju bundles that cluster specifications compile to.
+
+Compiles `ClusterSpec` bundles offline, without a controller, and checks
+that:
+
+* the default specification compiles to the expected bundle, in which
+  subordinate applications have no `num_units`;
+* constraints are rendered as a space-separated string of Juju constraints;
+* compiling a subset of applications keeps only the relations between them;
+* an unsupported base is rejected with `SpecError`.
+
+Also reports how long compiling a large cluster's bundle takes.
+"""
+
+import argparse
+import sys
+import time
+from typing import List
+
+import yaml
+
+from pluto.spec import ClusterSpec, SpecError
+
+EXPECTED = """
+series: jammy
+applications:
+  slurm-controller:
+    charm: slurmctld
+    channel: edge
+    num_units: 1
+    options:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  compute:
+    charm: slurmd
+    channel: edge
+    num_units: 1
+    options:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  slurm-database:
+    charm: slurmdbd
+    channel: edge
+    num_units: 1
+    options:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  slurm-restapi:
+    charm: slurmrestd
+    channel: edge
+    num_units: 1
+    options:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  mysql:
+    charm: mysql
+    channel: 8.0/edge
+    num_units: 1
+  slurm-database-mysql-router:
+    charm: mysql-router
+    channel: dpe/edge
+  sssd:
+    charm: sssd
+    channel: edge
+  glauth:
+    charm: glauth
+    channel: edge
+    num_units: 1
+    options:
+      ldap-search-base: dc=glauth,dc=com
+      tls: "true"
+  home:
+    charm: nfs-client
+    channel: edge
+    options:
+      mountpoint: /home
+  home-nfs-proxy:
+    charm: nfs-server-proxy
+    channel: edge
+    num_units: 1
+  nfs-server:
+    charm: ubuntu
+    num_units: 1
+relations:
+  - [compute:slurmd, slurm-controller:slurmd]
+  - [slurm-restapi:slurmrestd, slurm-controller:slurmrestd]
+  - [slurm-database:slurmdbd, slurm-controller:slurmdbd]
+  - [slurm-database-mysql-router:backend-database, mysql:database]
+  - [slurm-database:database, slurm-database-mysql-router:database]
+  - [compute:juju-info, home:juju-info]
+  - [slurm-controller:juju-info, home:juju-info]
+  - [compute:juju-info, sssd:juju-info]
+  - [slurm-controller:juju-info, sssd:juju-info]
+  - [nfs-server:juju-info, sssd:juju-info]
+"""
+
+_SUBORDINATES = ("slurm-database-mysql-router", "sssd", "home")
+
+
+def _check() -> List[str]:
+    """Compile bundles, and get what went wrong."""
+    failures = []
+    bundle = ClusterSpec.default().to_bundle()
+    if bundle != yaml.safe_load(EXPECTED):
+        failures.append(f"default specification compiled to:\n{yaml.safe_dump(bundle)}")
+    for name in _SUBORDINATES:
+        if "num_units" in bundle["applications"][name]:
+            failures.append(f"subordinate {name} has num_units")
+
+    spec = ClusterSpec.from_dict(
+        {
+            "applications": {
+                "compute": {"charm": "slurmd", "constraints": "cores=2 root_disk=20G"},
+                "slurm-controller": {"charm": "slurmctld", "plane": "control"},
+            }
+        }
+    )
+    spec.constrain("control", {"mem": "8G", "virt_type": "virtual-machine"})
+    constraints = {
+        name: app.get("constraints") for name, app in spec.to_bundle()["applications"].items()
+    }
+    expected = {
+        "compute": "cores=2 root-disk=20G",
+        "slurm-controller": "mem=8G virt-type=virtual-machine",
+    }
+    if constraints != expected:
+        failures.append(f"constraints were rendered as {constraints}")
+
+    subset = ClusterSpec.default().to_bundle(["compute", "slurm-controller", "sssd"])
+    relations = [
+        ["compute:slurmd", "slurm-controller:slurmd"],
+        ["compute:juju-info", "sssd:juju-info"],
+        ["slurm-controller:juju-info", "sssd:juju-info"],
+    ]
+    if sorted(subset["applications"]) != ["compute", "slurm-controller", "sssd"]:
+        failures.append(f"subset compiled to applications {sorted(subset['applications'])}")
+    if subset["relations"] != relations:
+        failures.append(f"subset kept relations {subset['relations']}")
+
+    spec = ClusterSpec.default()
+    spec.base = "ubuntu@18.04"
+    try:
+        spec.to_bundle()
+        failures.append("unsupported base ubuntu@18.04 was accepted")
+    except SpecError as e:
+        if "ubuntu@18.04" not in e.message:
+            failures.append(f"unsupported base was rejected with {e.message}")
+    return failures
+
+
+def main() -> int:
+    """Run the bundle check."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=1000, help="Compute nodes to compile.")
+    args = parser.parse_args()
+
+    failures = _check()
+    for placement in ("spread", "dense"):
+        spec = ClusterSpec.default()
+        spec.scale("compute", args.nodes)
+        spec.place(placement)
+        start = time.monotonic()
+        spec.to_bundle()
+        elapsed = time.monotonic() - start
+        print(
+            f"Compiled bundle of {args.nodes} nodes with {placement} placement in {elapsed:.4f}s"
+        )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
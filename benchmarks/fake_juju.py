@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Stand-in for the Juju CLI, for exercising `JujuRunner` without a controller.
+
+Point a runner at it with `JujuRunner(binary="benchmarks/fake_juju.py")`.
+It understands these subcommands:
+
+    sleep SECONDS             wait, then print "slept SECONDS"
+    fail CODE MESSAGE         print MESSAGE to stderr and exit with CODE
+    dump BYTES [LINE_LENGTH]  write BYTES to stdout and to stderr, in lines
+                              of LINE_LENGTH. Default: one line of BYTES.
+
+Other subcommands exit 1 with an error, like the Juju CLI does.
+"""
+
+import sys
+import time
+from typing import List
+
+
+def _dump(size: int, line_length: int) -> None:
+    """Write lines to stdout and stderr in turn, so that both pipes fill up."""
+    line = "x" * (line_length - 1) + "\n"
+    for _ in range(size // line_length):
+        sys.stdout.write(line)
+        sys.stderr.write(line)
+    if rest := size % line_length:
+        sys.stdout.write("x" * rest)
+        sys.stderr.write("x" * rest)
+
+
+def main(args: List[str]) -> int:
+    """Run a fake Juju subcommand."""
+    subcommand, *rest = args or [""]
+    if subcommand == "sleep":
+        time.sleep(float(rest[0]))
+        print(f"slept {rest[0]}")
+        return 0
+    if subcommand == "fail":
+        print(rest[1], file=sys.stderr)
+        return int(rest[0])
+    if subcommand == "dump":
+        size = int(rest[0])
+        _dump(size, int(rest[1]) if len(rest) > 1 else size + 1)
+        return 0
+    print(f'ERROR juju: "{subcommand}" is not a juju command', file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark `pluto health` sweeps on a simulated cluster.
+
+Runs NHC on every compute node of a simulated cluster (see `sim.py`)
+whose checks take a few seconds, with a few slow, failing and hung nodes,
+and reports how long the sweep takes compared to the slowest single
+check, when the first failure is reported, and check latency percentiles. Failing nodes are then drained, and the benchmark
+checks that nodes are reported drained only if their scontrol call
+succeeded.
+The sweep is also run with the concurrency that `pluto` uses for other
+SSH fan-outs, for comparison.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from typing import Any, Dict, Optional
+
+from craft_cli import EmitterMode, emit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimModel
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import BATCH_MARKER
+from pluto.ops.health import HealthResult, drain, sweep
+from pluto.utils.stats import summarize
+
+
+class _Nodes:
+    """Simulated outcome of NHC on each node."""
+
+    def __init__(self, seed: int, slow: float, failing: float, hung: float) -> None:
+        self._rng = random.Random(seed)
+        self._odds = (slow, failing, hung)
+        # Exit code of scontrol calls that drain nodes.
+        self.drain_code = 0
+
+    async def ssh(self, unit: Any, command: str) -> str:
+        """Answer an SSH command run on a unit."""
+        if BATCH_MARKER in command:
+            # Drain batches stop at the first scontrol call that fails.
+            if self.drain_code:
+                return f"{BATCH_MARKER} 0 {self.drain_code} \n"
+            return "".join(
+                f"{BATCH_MARKER} {i} 0 \n" for i in range(command.count(f'"{BATCH_MARKER} '))
+            )
+        if "nhc" not in command:
+            return ""
+        slow, failing, hung = self._odds
+        draw = self._rng.random()
+        host = unit.name.replace("/", "-")
+        if draw < hung:
+            await asyncio.sleep(1e6)
+        if draw < hung + slow:
+            await asyncio.sleep(self._rng.uniform(20, 40))
+        else:
+            await asyncio.sleep(self._rng.lognormvariate(1.5, 0.3))
+        if draw > 1 - failing:
+            return (
+                "ERROR:  nhc:  Health check failed:  check_fs_mount:  /home not mounted\n"
+                f"pluto-nhc: 1 {host}\n"
+            )
+        return f"pluto-nhc: 0 {host}\n"
+
+
+async def _sweep(
+    nodes: int, concurrency: int, timeout: float, outcomes: _Nodes, cloud: SimCloud
+) -> Dict[str, Any]:
+    """Sweep a fresh simulated cluster and measure it."""
+    cluster = Cluster(
+        "bench-health",
+        controller=SimController(cloud),
+        model=SimModel(cloud),
+        juju=SimJujuRunner(cloud),
+    )
+    loop = asyncio.get_event_loop()
+    async with cluster:
+        await cluster.deploy("slurmctld", application_name="slurm-controller")
+        await cluster.deploy("slurmd", application_name="compute", num_units=nodes)
+        await cluster.wait_for(["slurm-controller", "compute"], timeout=1200)
+        cloud.round_trips.clear()
+        start = loop.time()
+        first_failure: Optional[float] = None
+
+        def _record(result: HealthResult) -> None:
+            nonlocal first_failure
+            if not result.healthy and first_failure is None:
+                first_failure = loop.time() - start
+
+        report = await sweep(cluster, "compute", timeout, concurrency, _record)
+        elapsed = loop.time() - start
+        failed = [r for r in report.results if not r.healthy]
+        drained = await drain(cluster, failed)
+        outcomes.drain_code = 1
+        undrained = await drain(cluster, failed)
+
+    latencies = [r.latency for r in report.results if r.latency is not None]
+    return {
+        "elapsed": elapsed,
+        "slowest": max(latencies + [timeout + 15] * (len(report.results) - len(latencies))),
+        "first_failure": first_failure,
+        "failed": len(failed),
+        "drainable": len([r for r in failed if r.host]),
+        "drained": len(drained),
+        "drained_on_failure": len(undrained),
+        "checked": len(report.results),
+        "round_trips": sum(cloud.round_trips.values()),
+        **summarize(latencies),
+    }
+
+
+def run(nodes: int, concurrency: int, timeout: float, seed: int = 0) -> Dict[str, Any]:
+    """Sweep a simulated cluster of a number of compute nodes."""
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    outcomes = _Nodes(seed, slow=0.01, failing=0.02, hung=0.002)
+    cloud = SimCloud(seed=seed, ssh_handler=outcomes.ssh)
+    try:
+        return loop.run_until_complete(_sweep(nodes, concurrency, timeout, outcomes, cloud))
+    finally:
+        loop.close()
+
+
+def main() -> int:
+    """Run the health sweep benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--nodes", type=int, nargs="+", default=[100, 1000], help="Compute node counts."
+    )
+    parser.add_argument("--timeout", type=float, default=60, help="Per-node check timeout.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of simulated checks.")
+    args = parser.parse_args()
+
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting health sweep benchmark")
+    try:
+        results = [
+            (nodes, concurrency, run(nodes, concurrency, args.timeout, args.seed))
+            for nodes in args.nodes
+            for concurrency in (16, max(nodes, 256))
+        ]
+    finally:
+        emit.ended_ok()
+
+    print(
+        f"{'Nodes':>6} {'Conc':>5} {'Sweep':>8} {'Slowest':>8} {'1st fail':>8} "
+        f"{'p50':>6} {'p95':>6} {'p99':>6} {'Failed':>6} {'Drained':>7} {'RTs':>5}"
+    )
+    failed = False
+    for nodes, concurrency, r in results:
+        first = f"{r['first_failure']:.1f}s" if r["first_failure"] is not None else "-"
+        print(
+            f"{nodes:>6} {concurrency:>5} {r['elapsed']:>7.1f}s {r['slowest']:>7.1f}s "
+            f"{first:>8} {r['p50']:>5.1f}s {r['p95']:>5.1f}s {r['p99']:>5.1f}s "
+            f"{r['failed']:>6} {r['drained']:>7} {r['round_trips']:>5}"
+        )
+        if r["checked"] != nodes:
+            print(f"FAIL: checked {r['checked']} of {nodes} nodes")
+            failed = True
+        if r["drained"] != r["drainable"]:
+            print(f"FAIL: drained {r['drained']} of {r['drainable']} failing nodes")
+            failed = True
+        if r["drained_on_failure"]:
+            print(f"FAIL: {r['drained_on_failure']} nodes reported drained by failing scontrol")
+            failed = True
+        if concurrency >= nodes and r["elapsed"] > r["slowest"] * 1.05 + 1:
+            print(
+                f"FAIL: sweep of {nodes} nodes took {r['elapsed']:.1f}s, "
+                f"more than the slowest check of {r['slowest']:.1f}s"
+            )
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
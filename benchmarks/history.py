@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark bootstrap ETAs and stall detection on a simulated cluster.
+
+Bootstraps a simulated cluster (see `sim.py`) a few times to
+build up a history of step durations. Then bootstraps it once more and
+reports how far the estimates of time left were off, and once with an NFS
+server whose package installation hangs, and reports how soon the stall
+is flagged compared to the timeout bootstrap waits with.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from craft_cli import EmitterMode, emit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimModel
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import BATCH_MARKER
+from pluto.ops.bootstrap import NHC_URL, _Bootstrap, bootstrap_cluster
+from pluto.spec import ClusterSpec
+from pluto.utils import ArtifactCache, History, Journal, StepMonitor
+
+# Seconds bootstrap waits for applications to settle before giving up.
+_TIMEOUT = 1200
+
+
+async def _hang(unit: Any, command: str) -> str:
+    """Hang installing packages on the NFS server, and succeed otherwise."""
+    if "nfs-kernel-server" in command:
+        await asyncio.sleep(1e6)
+    return "".join(f"{BATCH_MARKER} {i} 0 \n" for i in range(command.count(f'"{BATCH_MARKER} ')))
+
+
+async def _bootstrap(
+    cloud: SimCloud, spec: ClusterSpec, cache: ArtifactCache, history: History, monitor: bool
+) -> Dict[str, Any]:
+    """Bootstrap a fresh simulated cluster, optionally watching it with a step monitor."""
+    cluster = Cluster(
+        "bench-history",
+        controller=SimController(cloud),
+        model=SimModel(cloud),
+        juju=SimJujuRunner(cloud),
+    )
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    etas: List[Tuple[float, Optional[float]]] = []
+    stalls: List[Tuple[str, float, float]] = []
+    async with cluster:
+        if not monitor:
+            await bootstrap_cluster(cluster, spec, cache, history=history)
+            return {"elapsed": loop.time() - start}
+
+        steps = _Bootstrap(cluster, cache, spec, journal=Journal.for_cluster(cluster.name))
+        graph = steps.graph()
+        watcher = StepMonitor(graph, history, f"{cluster.cloud}/{spec.topology()}")
+        watch = asyncio.ensure_future(
+            watcher.watch(
+                lambda eta: etas.append((loop.time() - start, eta)),
+                lambda step, elapsed, p95: stalls.append((step.name, elapsed, p95)),
+            )
+        )
+        try:
+            await asyncio.wait_for(graph.run(), _TIMEOUT)
+            completed = True
+        except asyncio.TimeoutError:
+            completed = False
+        finally:
+            watch.cancel()
+            await asyncio.gather(watch, return_exceptions=True)
+    return {"elapsed": loop.time() - start, "completed": completed, "etas": etas, "stalls": stalls}
+
+
+def run(
+    nodes: int, seed: int, root: Path, history: History, monitor: bool = False, hang: bool = False
+) -> Dict[str, Any]:
+    """Bootstrap a simulated cluster of a number of compute nodes."""
+    spec = ClusterSpec.default()
+    spec.scale("compute", nodes)
+    nhc = root / "lbnl-nhc-1.4.3.tar.gz"
+    nhc.write_bytes(b"nhc")
+    cache = ArtifactCache(root / "artifacts", offline=True)
+    cache.add(NHC_URL, nhc)
+
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    cloud = SimCloud(seed=seed, ssh_handler=_hang if hang else None)
+    try:
+        return loop.run_until_complete(_bootstrap(cloud, spec, cache, history, monitor))
+    finally:
+        loop.close()
+
+
+def _errors(result: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """Get how far off each estimate of time left was, as a fraction of the bootstrap."""
+    return [
+        (at, abs(at + eta - result["elapsed"]) / result["elapsed"])
+        for at, eta in result["etas"]
+        if eta is not None
+    ]
+
+
+def main() -> int:
+    """Run the bootstrap history benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--nodes", type=int, nargs="+", default=[1, 100], help="Compute node counts."
+    )
+    parser.add_argument("--runs", type=int, default=5, help="Bootstraps to build history from.")
+    args = parser.parse_args()
+
+    print(
+        f"{'Nodes':>6} {'Bootstrap':>10} {'1st ETA':>8} {'Error':>6} {'Max error':>9} "
+        f"{'Stalled step':<16} {'Flagged':>8} {'p95':>6} {'Timeout':>8}"
+    )
+    failed = False
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting bootstrap history benchmark")
+    try:
+        for nodes in args.nodes:
+            with tempfile.TemporaryDirectory() as tmp:
+                os.environ["SNAP_USER_DATA"] = tmp
+                history = History(Path(tmp) / "history.json")
+                for seed in range(1, args.runs + 1):
+                    run(nodes, seed, Path(tmp), history)
+                normal = run(nodes, 0, Path(tmp), history, monitor=True)
+                stalled = run(nodes, 0, Path(tmp), history, monitor=True, hang=True)
+
+            errors = _errors(normal)
+            first, error = errors[0] if errors else (None, None)
+            worst = max((e for _, e in errors), default=None)
+            step, elapsed, p95 = stalled["stalls"][0] if stalled["stalls"] else ("-", None, None)
+            print(
+                f"{nodes:>6} {normal['elapsed']:>9.1f}s "
+                + (f"{first:>7.1f}s {error:>6.0%} {worst:>9.0%} " if errors else f"{'-':>25} ")
+                + f"{step:<16} "
+                + (f"{elapsed:>7.1f}s {p95:>5.1f}s " if p95 is not None else f"{'-':>15} ")
+                + f"{_TIMEOUT:>7}s"
+            )
+            if not errors or error > 0.25:
+                print(f"FAIL: first estimate of bootstrap of {nodes} nodes was off")
+                failed = True
+            if step != "provision-nfs" or stalled["completed"]:
+                print(f"FAIL: hung NFS server of cluster with {nodes} nodes was not flagged")
+                failed = True
+    finally:
+        emit.ended_ok()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark `HTTPPool` against a stub slurmrestd that closes connections.
+
+Sends requests through `HTTPPool` to the stub of slurmrestd (see
+`slurmrestd_stub.py`), and checks that:
+
+* responses delimited by Content-Length and by chunked transfer encoding
+  are read alike, and responses to HEAD requests are read without a body;
+* responses to requests pipelined on one connection are matched to their
+  requests;
+* when the server closes a connection mid-pipeline, with or without
+  announcing it, responses that arrived are kept, idempotent requests that
+  were not answered are resent, and others fail without being resent;
+* requests sent after the server closed an idle keep-alive connection
+  succeed on a new connection.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Any, List, Tuple
+
+from slurmrestd_stub import StubSlurmRestd
+
+from pluto.utils import HTTPError, HTTPPool
+
+_HEADERS = {"X-SLURM-USER-TOKEN": "token"}
+
+
+async def _ping(pool: HTTPPool, method: str = "GET") -> bool:
+    """Ping the stub, and determine if it answered."""
+    response = await pool.request(method, "/slurm/v0.0.39/ping")
+    if method == "HEAD":
+        return response.status == 200 and response.body == b""
+    return response.status == 200 and json.loads(response.body)["pings"][0]["pinged"] == "UP"
+
+
+async def _submit(pool: HTTPPool, name: str) -> int:
+    """Submit a job to the stub, and get its ID."""
+    body = json.dumps({"script": "#!/bin/bash\n", "job": {"name": name}}).encode()
+    response = await pool.request("POST", "/slurm/v0.0.39/job/submit", body)
+    return json.loads(response.body)["job_id"]
+
+
+async def _pipelined(
+    stub: StubSlurmRestd, requests: int, depth: int
+) -> Tuple[float, List[Any], int]:
+    """Ping with GET and HEAD requests, and submit jobs, pipelined on one connection.
+
+    Returns:
+        How long the requests took, their outcomes, and connections opened.
+    """
+    url = await stub.start()
+    start = time.monotonic()
+    try:
+        async with HTTPPool(url, 1, depth, timeout=10, headers=_HEADERS) as pool:
+            outcomes = await asyncio.gather(
+                *(_ping(pool, "HEAD" if i % 2 else "GET") for i in range(requests)),
+                *(_submit(pool, f"job-{i}") for i in range(requests)),
+                return_exceptions=True,
+            )
+            opened = pool.opened
+    finally:
+        await stub.stop()
+    return time.monotonic() - start, outcomes, opened
+
+
+async def _encodings(requests: int, depth: int) -> List[str]:
+    """Read responses delimited by Content-Length and by chunked encoding."""
+    failures = []
+    for chunked in (False, True):
+        stub = StubSlurmRestd(rtt=0.001, chunked=chunked)
+        elapsed, outcomes, opened = await _pipelined(stub, requests, depth)
+        pings, job_ids = outcomes[:requests], outcomes[requests:]
+        encoding = "chunked" if chunked else "Content-Length"
+        print(f"{2 * requests} requests with {encoding} on {opened} connection: {elapsed:.3f}s")
+        if not all(ping is True for ping in pings):
+            failures.append(f"pings with {encoding} failed: {pings[:3]}")
+        if any(stub.names.get(job_id) != f"job-{i}" for i, job_id in enumerate(job_ids)):
+            failures.append(f"responses with {encoding} were matched to the wrong requests")
+        if opened != 1:
+            failures.append(f"pipelined requests with {encoding} opened {opened} connections")
+    return failures
+
+
+async def _mid_pipeline(requests: int, depth: int, max_requests: int) -> List[str]:
+    """Close connections after a few requests, with and without announcing it."""
+    failures = []
+    for announce in (True, False):
+        stub = StubSlurmRestd(max_requests=max_requests, announce_close=announce)
+        _, outcomes, opened = await _pipelined(stub, requests, depth)
+        pings, job_ids = outcomes[:requests], outcomes[requests:]
+        submitted = [job_id for job_id in job_ids if not isinstance(job_id, Exception)]
+        lost = [e for e in job_ids if isinstance(e, Exception)]
+        how = "announced" if announce else "unannounced"
+        print(
+            f"{how.capitalize()} close after {max_requests} requests: "
+            f"{sum(p is True for p in pings)} of {requests} pings, "
+            f"{len(submitted)} of {requests} jobs, {opened} connections"
+        )
+        if not all(ping is True for ping in pings):
+            failures.append(f"pings were not resent after {how} close: {pings[:3]}")
+        if not all(isinstance(e, HTTPError) for e in lost):
+            failures.append(f"submissions failed with {lost[:3]} after {how} close")
+        if not lost or stub.jobs != len(submitted):
+            failures.append(f"{stub.jobs} jobs were submitted, {len(submitted)} reported")
+        if any(stub.names.get(job_id) != f"job-{job_ids.index(job_id)}" for job_id in submitted):
+            failures.append(f"responses were matched to the wrong requests after {how} close")
+    return failures
+
+
+async def _idle(idle_timeout: float) -> List[str]:
+    """Send requests after the server closed idle connections."""
+    failures = []
+    stub = StubSlurmRestd(idle_timeout=idle_timeout)
+    url = await stub.start()
+    try:
+        async with HTTPPool(url, 2, 4, timeout=10, headers=_HEADERS) as pool:
+            outcomes = []
+            for i in range(3):
+                outcomes += await asyncio.gather(
+                    _ping(pool), _submit(pool, f"job-{i}"), return_exceptions=True
+                )
+                await asyncio.sleep(idle_timeout * 2)
+            opened = pool.opened
+    finally:
+        await stub.stop()
+    print(f"Requests after idle close: {sum(o is True for o in outcomes)} pings, {stub.jobs} jobs")
+    if any(isinstance(outcome, Exception) for outcome in outcomes):
+        failures.append(f"requests after idle close failed: {outcomes}")
+    if stub.jobs != 3 or opened < 3:
+        failures.append(f"idle close submitted {stub.jobs} jobs on {opened} connections")
+    return failures
+
+
+async def _check(args: argparse.Namespace) -> List[str]:
+    """Run all checks, and get what went wrong."""
+    return (
+        await _encodings(args.requests, args.pipeline)
+        + await _mid_pipeline(args.requests, args.pipeline, args.max_requests)
+        + await _idle(args.idle_timeout)
+    )
+
+
+def main() -> int:
+    """Run the HTTP pool benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Requests of each kind.")
+    parser.add_argument("--pipeline", type=int, default=32, help="Pipeline depth.")
+    parser.add_argument(
+        "--max-requests", type=int, default=50, help="Requests per connection of the stub."
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, default=0.1, help="Seconds before the stub closes."
+    )
+    args = parser.parse_args()
+
+    failures = asyncio.run(_check(args))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
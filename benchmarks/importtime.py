@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Measure how long it takes to import pluto's entry point.
+
+Runs `python -X importtime -c "import pluto.main"` several times in fresh
+interpreters and reports the best cumulative import time of `pluto.main`.
+Fails if the best run exceeds the budget or if any module matching a
+forbidden prefix, such as the Juju client library, is imported at startup.
+"""
+
+import argparse
+import subprocess
+import sys
+from typing import List, Tuple
+
+
+def _measure(module: str) -> Tuple[int, List[str]]:
+    """Import module in a fresh interpreter.
+
+    Returns:
+        Cumulative import time of module in microseconds and all imported module names.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    cumulative = 0
+    imported = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, total, name = (field.strip() for field in line.split("|"))
+        if not total.isdigit():
+            continue
+        imported.append(name)
+        if name == module:
+            cumulative = int(total)
+    return cumulative, imported
+
+
+def main() -> int:
+    """Run the import-time benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="pluto.main", help="Module to import.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh imports.")
+    parser.add_argument(
+        "--budget", type=float, default=100.0, help="Maximum import time in milliseconds."
+    )
+    parser.add_argument(
+        "--forbid",
+        action="append",
+        default=["juju", "websockets", "macaroonbakery"],
+        help="Module prefix that must not be imported at startup.",
+    )
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.runs):
+        cumulative, imported = _measure(args.module)
+        timings.append(cumulative / 1000)
+
+    best = min(timings)
+    print(f"{args.module}: best {best:.1f}ms, worst {max(timings):.1f}ms over {args.runs} runs")
+
+    forbidden = sorted(
+        {name for name in imported for prefix in args.forbid if name.split(".")[0] == prefix}
+    )
+    if forbidden:
+        print(f"FAIL: {args.module} imports {', '.join(forbidden)} at startup")
+        return 1
+    if best > args.budget:
+        print(f"FAIL: {best:.1f}ms exceeds budget of {args.budget:.1f}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
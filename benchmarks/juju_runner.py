@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark `JujuRunner` against a stand-in Juju CLI.
+
+Runs the stand-in CLI of `fake_juju.py` through `JujuRunner` as a real
+subprocess, and checks that:
+
+* a batch of slow commands run with `run_all` finishes about as many
+  times faster as the runner's concurrency allows, that the speedup it
+  reports does not exceed the concurrency, and that the runner keeps
+  statistics about each of them;
+* a command that exits nonzero is recorded with its exit code, and raises
+  `ClusterDriverError` with its stderr when checked;
+* several MiB of output on stdout and stderr, on many lines or one, come
+  back intact from `run` and `stream`.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+from pluto.drivers.cluster import ClusterDriverError, JujuRunner
+
+FAKE_JUJU = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_juju.py")
+
+
+async def _parallel(commands: int, latency: float, concurrency: int) -> List[str]:
+    """Run a batch of slow commands in parallel."""
+    failures = []
+    runner = JujuRunner(concurrency, binary=FAKE_JUJU)
+    results = await runner.run_all(*(["sleep", str(latency)] for _ in range(commands)))
+    stats = runner.stats["sleep"]
+    print(
+        f"run_all of {commands} commands of {latency}s with concurrency {concurrency}: "
+        f"{runner.parallel_time:.2f}s ({runner.speedup:.1f}x faster than serially)"
+    )
+    if any(r.exit_code != 0 or r.stdout != f"slept {latency}\n" for r in results):
+        failures.append("run_all returned unexpected results")
+    if stats.calls != commands or stats.exit_codes != {0: commands}:
+        failures.append(f"runner recorded {stats.calls} calls with exit codes {stats.exit_codes}")
+    if stats.slowest < latency or stats.mean < latency:
+        failures.append(f"runner recorded mean {stats.mean:.2f}s below latency {latency}s")
+    if runner.speedup < min(commands, concurrency) / 2:
+        failures.append(f"run_all was only {runner.speedup:.1f}x faster than serially")
+    if runner.speedup > concurrency * 1.05:
+        failures.append(f"run_all claimed {runner.speedup:.1f}x with concurrency {concurrency}")
+    return failures
+
+
+async def _failure() -> List[str]:
+    """Run commands that exit nonzero, with and without checking them."""
+    failures = []
+    runner = JujuRunner(binary=FAKE_JUJU)
+    result = await runner.run("fail", "3", "ERROR model not found")
+    if result.exit_code != 3 or result.stderr != "ERROR model not found\n":
+        failures.append(f"unchecked failure returned {result}")
+    try:
+        await runner.run("fail", "3", "ERROR model not found", check=True)
+        failures.append("checked failure did not raise")
+    except ClusterDriverError as e:
+        if "ERROR model not found" not in e.message:
+            failures.append(f"checked failure raised without stderr: {e.message}")
+    try:
+        await runner.run_all(["sleep", "0"], ["fail", "2", "boom"], check=True)
+        failures.append("checked run_all with a failure did not raise")
+    except ClusterDriverError:
+        pass
+    try:
+        async with runner.stream("fail", "4", "broken pipe", check=True) as lines:
+            async for _ in lines:
+                pass
+        failures.append("checked stream failure did not raise")
+    except ClusterDriverError as e:
+        if "broken pipe" not in e.message:
+            failures.append(f"checked stream failure raised without stderr: {e.message}")
+    if (codes := runner.stats["fail"].exit_codes) != {2: 1, 3: 2, 4: 1}:
+        failures.append(f"runner recorded exit codes {dict(codes)} of failures")
+    if (await runner.run("deploy")).exit_code != 1:
+        failures.append("unknown subcommand did not fail")
+    print(f"Failing commands recorded with exit codes {dict(codes)}")
+    return failures
+
+
+async def _output(size: int) -> List[str]:
+    """Read large outputs on many lines and on one line."""
+    failures = []
+    runner = JujuRunner(binary=FAKE_JUJU)
+    for line_length in (1000, size + 1):
+        start = time.monotonic()
+        result = await runner.run("dump", str(size), str(line_length))
+        elapsed = time.monotonic() - start
+        if len(result.stdout) != size or len(result.stderr) != size:
+            failures.append(
+                f"run returned {len(result.stdout)} and {len(result.stderr)} bytes "
+                f"of {size} in lines of {line_length}"
+            )
+
+        start = time.monotonic()
+        async with runner.stream("dump", str(size), str(line_length), tail=5) as lines:
+            received = [line async for line in lines]
+        streamed = time.monotonic() - start
+        expected = -(-size // line_length)
+        if len(received) != expected or sum(len(line) + 1 for line in received) - 1 != size:
+            failures.append(
+                f"stream yielded {len(received)} lines of {expected} in lines of {line_length}"
+            )
+        if len(lines.stderr_tail) != min(expected, 5) or lines.exit_code != 0:
+            failures.append(f"stream kept {len(lines.stderr_tail)} lines of stderr")
+        print(
+            f"{size / 2**20:.0f} MiB in lines of {min(line_length, size)}: "
+            f"run {elapsed:.2f}s, stream {streamed:.2f}s"
+        )
+    return failures
+
+
+def main() -> int:
+    """Run the Juju runner benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commands", type=int, default=32, help="Commands to run in parallel.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds each command takes.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrency of the runner.")
+    parser.add_argument("--size", type=int, default=8 << 20, help="Bytes of large outputs.")
+    args = parser.parse_args()
+
+    failures = asyncio.run(_parallel(args.commands, args.latency, args.concurrency))
+    failures += asyncio.run(_failure())
+    failures += asyncio.run(_output(args.size))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark bootstraps with and without a package cache on a simulated cluster.
+
+Bootstraps simulated clusters (see `sim.py`) whose units install
+their packages from a stand-in mirror behind a 100Mbit/s link, and reports
+how long the bootstrap takes and how much is downloaded upstream, with
+each node fetching its packages upstream, and with a caching proxy on the
+control plane. 30% of the package bytes come from HTTPS sources, which the
+proxy cannot cache, as with the Slurm PPA. The hit rate only counts bytes
+that went through the proxy.
+
+Compute nodes wait for the cache, so small clusters bootstrap more slowly
+with it. The benchmark checks that the cache cuts upstream traffic from 10
+compute nodes on, and that it speeds up bootstraps of 100 compute nodes.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+from craft_cli import EmitterMode, emit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimMirror, SimModel
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import BATCH_MARKER
+from pluto.ops.bootstrap import NHC_URL, bootstrap_cluster
+from pluto.ops.packages import cache_stats, hit_rate
+from pluto.spec import ClusterSpec
+from pluto.utils import ArtifactCache
+
+
+def _proxy(mirror: SimMirror):
+    """Get SSH handler that answers for the transfer log of the caching proxy."""
+
+    async def _ssh(unit: Any, command: str) -> str:
+        if "apt-cacher.log" in command:
+            return f"pluto-cache: {mirror.fetched} {mirror.served}\n"
+        return "".join(
+            f"{BATCH_MARKER} {i} 0 \n" for i in range(command.count(f'"{BATCH_MARKER} '))
+        )
+
+    return _ssh
+
+
+async def _bootstrap(cloud: SimCloud, nodes: int, cached: bool, root: Path) -> Dict[str, Any]:
+    """Bootstrap a simulated cluster, and read the statistics of its package cache."""
+    spec = ClusterSpec.default()
+    spec.scale("compute", nodes)
+    if cached:
+        spec.cache_packages()
+    nhc = root / "lbnl-nhc-1.4.3.tar.gz"
+    nhc.write_bytes(b"nhc")
+    cache = ArtifactCache(root / "artifacts", offline=True)
+    cache.add(NHC_URL, nhc)
+
+    cluster = Cluster(
+        "bench-packages",
+        controller=SimController(cloud),
+        model=SimModel(cloud),
+        juju=SimJujuRunner(cloud),
+    )
+    async with cluster:
+        graph = await bootstrap_cluster(cluster, spec, cache)
+        stats = await cache_stats(cluster) if cached else None
+    return {"report": graph.report(), "stats": stats}
+
+
+def run(nodes: int, cached: bool, seed: int = 0) -> Dict[str, Any]:
+    """Bootstrap a simulated cluster and measure it."""
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    mirror = SimMirror()
+    cloud = SimCloud(seed=seed, ssh_handler=_proxy(mirror), mirror=mirror)
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["SNAP_USER_DATA"] = tmp
+        start = loop.time()
+        try:
+            result = loop.run_until_complete(_bootstrap(cloud, nodes, cached, Path(tmp)))
+            simulated = loop.time() - start
+        finally:
+            loop.close()
+    return {
+        "simulated": simulated,
+        "upstream": mirror.direct + mirror.fetched,
+        "hit_rate": hit_rate(result["stats"]) if result["stats"] else None,
+        "machines": cloud.machines,
+    }
+
+
+def main() -> int:
+    """Run the package cache benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--nodes", type=int, nargs="+", default=[10, 100], help="Compute node counts."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of simulated latencies.")
+    args = parser.parse_args()
+
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting package cache benchmark")
+    try:
+        results = [
+            (nodes, cached, run(nodes, cached, args.seed))
+            for nodes in args.nodes
+            for cached in (False, True)
+        ]
+    finally:
+        emit.ended_ok()
+
+    print(
+        f"{'Nodes':>6} {'Cache':>6} {'Machines':>8} {'Simulated':>10} "
+        f"{'Upstream':>10} {'Hit rate':>8}"
+    )
+    failed = False
+    for nodes, cached, r in results:
+        rate = f"{r['hit_rate']:.0%}" if r["hit_rate"] is not None else "-"
+        print(
+            f"{nodes:>6} {'yes' if cached else 'no':>6} {r['machines']:>8} "
+            f"{r['simulated']:>9.1f}s {r['upstream'] / 1e9:>8.1f}GB {rate:>8}"
+        )
+    for nodes in args.nodes:
+        direct, cached = (r for n, _, r in results if n == nodes)
+        if nodes >= 10 and cached["upstream"] >= direct["upstream"]:
+            print(f"FAIL: package cache did not reduce upstream traffic for {nodes} nodes")
+            failed = True
+        if nodes >= 100 and cached["simulated"] >= direct["simulated"]:
+            print(f"FAIL: package cache did not speed up the bootstrap of {nodes} nodes")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark `pluto scale` on a simulated cluster.
+
+Scales out the compute nodes of a simulated cluster (see `sim.py`) in
+batches of several sizes, and reports how long the scale-out takes, throughput in nodes per minute, and round trips.
+Batches are requested back to back, so small batches should be about as
+fast as requesting every node at once.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict
+
+from craft_cli import EmitterMode, emit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimModel
+
+from pluto.drivers import Cluster
+from pluto.ops.scale import ScaleReport, scale_out
+
+
+async def _scale(cloud: SimCloud, nodes: int, batch_size: int) -> ScaleReport:
+    """Scale out the compute nodes of a fresh simulated cluster."""
+    cluster = Cluster(
+        "bench-scale",
+        controller=SimController(cloud),
+        model=SimModel(cloud),
+        juju=SimJujuRunner(cloud),
+    )
+    async with cluster:
+        await cluster.deploy("slurmd", application_name="compute")
+        await cluster.wait_for(["compute"], timeout=1200)
+        cloud.round_trips.clear()
+        return await scale_out(cluster, "compute", nodes + 1, batch_size)
+
+
+def run(nodes: int, batch_size: int, seed: int = 0) -> Dict[str, Any]:
+    """Add compute nodes to a simulated cluster and measure it."""
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    cloud = SimCloud(seed=seed)
+    try:
+        report = loop.run_until_complete(_scale(cloud, nodes, batch_size))
+    finally:
+        loop.close()
+    return {
+        "elapsed": report.elapsed,
+        "started": len(report.started),
+        "failed": len(report.failed),
+        "round_trips": sum(cloud.round_trips.values()),
+    }
+
+
+def main() -> int:
+    """Run the scale-out benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nodes", type=int, default=100, help="Compute nodes to add.")
+    parser.add_argument(
+        "--batch-size", type=int, nargs="+", default=[1, 10, 100], help="Batch sizes."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of simulated latencies.")
+    args = parser.parse_args()
+
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting scale-out benchmark")
+    try:
+        results = [(size, run(args.nodes, size, args.seed)) for size in args.batch_size]
+    finally:
+        emit.ended_ok()
+
+    print(f"{'Nodes':>6} {'Batch':>6} {'Elapsed':>9} {'Nodes/min':>9} {'Started':>7} {'RTs':>5}")
+    for size, r in results:
+        print(
+            f"{args.nodes:>6} {size:>6} {r['elapsed']:>8.1f}s "
+            f"{r['started'] / r['elapsed'] * 60:>9.1f} {r['started']:>7} {r['round_trips']:>5}"
+        )
+
+    failed = False
+    fastest = min(r["elapsed"] for _, r in results)
+    for size, r in results:
+        if r["started"] != args.nodes:
+            print(f"FAIL: started {r['started']} of {args.nodes} nodes in batches of {size}")
+            failed = True
+        if r["elapsed"] > fastest * 1.25 + 10:
+            print(f"FAIL: scaling out in batches of {size} took {r['elapsed']:.1f}s")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
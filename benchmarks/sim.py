@@ -0,0 +1,842 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Simulated Juju controller for exercising pluto without a cloud.
+
+The simulation implements the parts of the libjuju `Controller`, `Model`,
+`Application` and `Unit` interface that pluto uses, plus a `JujuRunner`
+that understands the Juju CLI commands pluto runs. Every operation counts
+as one round trip and takes a latency drawn from a configurable
+distribution. Run the simulation on a `SimEventLoop` to skip over the
+simulated waits instead of sleeping through them.
+
+The Juju CLI is simulated in-process by `SimJujuRunner` rather than by a
+fake `juju` executable, since commands such as `juju deploy` must act on
+the simulated controller, and a subprocess would run outside simulated
+time. This has limits: only `deploy` of a bundle and `attach-resource` are
+understood, and process startup, pipes and output decoding are not
+exercised. `fake_juju.py` is a fake `juju` executable that `juju_runner.py`
+runs through a real `JujuRunner` to cover those.
+"""
+
+import asyncio
+import contextlib
+import math
+import os
+import random
+import selectors
+import time
+from collections import Counter, namedtuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+import yaml
+from juju.errors import JujuError
+
+from pluto.drivers.cluster import BATCH_MARKER, JujuRunner, Result
+
+
+class Latency:
+    """Log-normal distribution of how long an operation takes.
+
+    Args:
+        median: Median latency in seconds.
+        spread: Standard deviation of the logarithm of the latency. Default: 0, constant.
+    """
+
+    def __init__(self, median: float, spread: float = 0.0) -> None:
+        self.median = median
+        self.spread = spread
+
+    def sample(self, rng: random.Random) -> float:
+        """Draw a latency in seconds."""
+        if not self.spread:
+            return self.median
+        return self.median * math.exp(rng.gauss(0.0, self.spread))
+
+    def __repr__(self) -> str:
+        """String representation of the distribution."""
+        return f"<{type(self).__name__} median={self.median}s spread={self.spread}>"
+
+
+DEFAULT_LATENCIES = {
+    # Simple API calls such as reading config or adding units.
+    "api": Latency(0.05, 0.3),
+    "deploy": Latency(5.0, 0.3),
+    "integrate": Latency(0.5, 0.3),
+    # Provisioning a machine and installing the charm on it.
+    "settle": Latency(240.0, 0.25),
+    # Installing a subordinate charm once its principal unit is up.
+    "settle-subordinate": Latency(30.0, 0.3),
+    # Installing a charm on a machine that another unit already brought up.
+    "settle-colocated": Latency(60.0, 0.3),
+    "ssh": Latency(2.0, 0.4),
+    "scp": Latency(2.0, 0.4),
+    "action": Latency(8.0, 0.3),
+    # Starting the Juju CLI and logging in to the controller.
+    "juju": Latency(1.0, 0.2),
+}
+
+_Delta = namedtuple("_Delta", ["entity", "type", "data"])
+_Endpoint = namedtuple("_Endpoint", ["application_name", "name"])
+_ConfigValue = namedtuple("_ConfigValue", ["value"])
+_ModelInfo = namedtuple("_ModelInfo", ["name", "cloud_tag", "cloud_region"])
+
+
+class SimCloud:
+    """Shared state of a simulated Juju controller and the cloud behind it.
+
+    Args:
+        latencies: Latencies overriding `DEFAULT_LATENCIES`, keyed by operation.
+        error_rates:
+            Probability that an operation fails, keyed by "settle", "ssh" or "action".
+            Default: no failures.
+        machine_concurrency:
+            Maximum number of machines the cloud provisions at once.
+            If omitted, all machines are provisioned at once.
+        seed: Seed for drawing latencies and failures. Default: 0.
+        ssh_handler:
+            Coroutine function called with the unit and command of every SSH
+            command, that returns the output of the command. Default: None,
+            commands succeed without output.
+        mirror:
+            Package mirror that units download packages from while they come up.
+            Default: None, package downloads are part of bringing a unit up.
+    """
+
+    def __init__(
+        self,
+        latencies: Optional[Dict[str, Latency]] = None,
+        error_rates: Optional[Dict[str, float]] = None,
+        machine_concurrency: Optional[int] = None,
+        seed: int = 0,
+        ssh_handler: Optional[Callable[["SimUnit", str], Awaitable[str]]] = None,
+        mirror: Optional["SimMirror"] = None,
+    ) -> None:
+        self.latencies = {**DEFAULT_LATENCIES, **(latencies or {})}
+        self.error_rates = error_rates or {}
+        self.ssh_handler = ssh_handler
+        self.mirror = mirror
+        self.round_trips = Counter()
+        self.machines = 0
+        self.models: Dict[str, "_ModelState"] = {}
+        self._machines = asyncio.Semaphore(machine_concurrency) if machine_concurrency else None
+        self._rng = random.Random(seed)
+        self._addresses = 0
+
+    def delay(self, kind: str) -> float:
+        """Draw a latency for a kind of operation."""
+        return self.latencies[kind].sample(self._rng)
+
+    def fails(self, kind: str) -> bool:
+        """Decide whether an operation fails."""
+        return self._rng.random() < self.error_rates.get(kind, 0.0)
+
+    async def call(self, op: str, kind: str = "api") -> None:
+        """Count a round trip and wait out its latency.
+
+        Args:
+            op: Name of the operation, used to count round trips.
+            kind: Latency distribution to draw from. Default: "api".
+        """
+        self.round_trips[op] += 1
+        await asyncio.sleep(self.delay(kind))
+
+    async def provision(self) -> None:
+        """Wait for the cloud to provision a machine."""
+        self.machines += 1
+        if self._machines is None:
+            await asyncio.sleep(self.delay("settle"))
+            return
+        async with self._machines:
+            await asyncio.sleep(self.delay("settle"))
+
+    def address(self) -> str:
+        """Allocate an address for a new machine."""
+        self._addresses += 1
+        n = self._addresses
+        return f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}"
+
+
+class SimMachine:
+    """Simulated machine that bundle placement directives put units on."""
+
+    def __init__(self, cloud: SimCloud) -> None:
+        self.public_address: Optional[str] = None
+        self._cloud = cloud
+        self._up: Optional[asyncio.Future] = None
+        # Juju runs the hooks of units on the same machine one at a time.
+        self._hooks = asyncio.Lock()
+
+    async def _provision(self) -> None:
+        """Provision the machine."""
+        await self._cloud.provision()
+        self.public_address = self._cloud.address()
+
+    async def host(self) -> None:
+        """Bring up a unit on the machine, provisioning it for the first unit."""
+        first = self._up is None
+        if first:
+            self._up = asyncio.ensure_future(self._provision())
+        await self._up
+        if not first:
+            async with self._hooks:
+                await asyncio.sleep(self._cloud.delay("settle-colocated"))
+
+
+class SimMirror:
+    """Simulated package mirror behind a link of limited bandwidth.
+
+    Every principal unit downloads the packages of its charm while it comes
+    up, one download at a time over the upstream link. Units that come up
+    once the model has an `apt-http-proxy` download through the caching
+    proxy instead. The proxy fetches the packages of each charm upstream
+    once, and serves them over the LAN. Packages from HTTPS sources, such
+    as PPAs, cannot be cached and are still downloaded upstream.
+
+    Args:
+        size: Bytes of packages that each unit installs. Default: 100MB.
+        cacheable: Share of those bytes that come from plain HTTP sources. Default: 0.7.
+        upstream: Bandwidth of the upstream link in bytes per second. Default: 100Mbit/s.
+        lan: Bandwidth of the proxy's LAN link in bytes per second. Default: 10Gbit/s.
+    """
+
+    def __init__(
+        self,
+        size: int = 100_000_000,
+        cacheable: float = 0.7,
+        upstream: float = 12.5e6,
+        lan: float = 1.25e9,
+    ) -> None:
+        self.size = size
+        self.cacheable = cacheable
+        self.upstream = upstream
+        self.lan = lan
+        # Bytes downloaded upstream by units, and fetched upstream and served by the proxy.
+        self.direct = 0
+        self.fetched = 0
+        self.served = 0
+        self._upstream = asyncio.Lock()
+        self._lan = asyncio.Lock()
+        self._cache: Dict[str, asyncio.Future] = {}
+
+    async def _transfer(self, link: asyncio.Lock, size: int, bandwidth: float) -> None:
+        """Transfer bytes over a link once it is free."""
+        async with link:
+            await asyncio.sleep(size / bandwidth)
+
+    async def _fetch(self, size: int) -> None:
+        """Fetch packages upstream into the proxy."""
+        await self._transfer(self._upstream, size, self.upstream)
+        self.fetched += size
+
+    async def install(self, unit: "SimUnit") -> None:
+        """Download the packages of a unit's charm."""
+        proxy = unit.app._state.config.get("apt-http-proxy")
+        cached = int(self.size * self.cacheable) if proxy else 0
+        if direct := self.size - cached:
+            await self._transfer(self._upstream, direct, self.upstream)
+            self.direct += direct
+        if cached:
+            charm = unit.app.charm
+            if charm not in self._cache:
+                self._cache[charm] = asyncio.ensure_future(self._fetch(cached))
+            await self._cache[charm]
+            await self._transfer(self._lan, cached, self.lan)
+            self.served += cached
+
+
+class SimAction:
+    """Action enqueued on a simulated unit."""
+
+    def __init__(self, unit: "SimUnit", name: str, params: Dict[str, Any]) -> None:
+        self.unit = unit
+        self.name = name
+        self.params = params
+        self.status = "pending"
+        self.results: Dict[str, Any] = {}
+        self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self) -> None:
+        """Run action once the unit is up."""
+        await self.unit._settled.wait()
+        self.status = "running"
+        await asyncio.sleep(self.unit._cloud.delay("action"))
+        if self.unit._cloud.fails("action"):
+            self.status = "failed"
+            self.results = {"return-code": 1, "message": f"{self.name} failed"}
+        else:
+            self.status = "completed"
+            self.results = {"return-code": 0}
+
+    async def wait(self) -> "SimAction":
+        """Wait for action to finish."""
+        self.unit._cloud.round_trips["wait-action"] += 1
+        await self._task
+        return self
+
+
+class SimUnit:
+    """Simulated unit of an application."""
+
+    def __init__(self, app: "SimApplication", number: int) -> None:
+        self.app = app
+        self.application = app.name
+        self.name = f"{app.name}/{number}"
+        self.workload_status = "waiting"
+        self.workload_status_message = "waiting for machine"
+        self.agent_status = "allocating"
+        self.public_address: Optional[str] = None
+        self.principal: Optional[SimUnit] = None
+        self.machine: Optional[SimMachine] = None
+        self._cloud = app._cloud
+        self._settled = asyncio.Event()
+
+    async def _settle(self) -> None:
+        """Bring unit up, on its own or a placed machine, or next to its principal."""
+        if self.machine is not None:
+            await self.machine.host()
+            self.public_address = self.machine.public_address
+        elif self.principal is None:
+            await self._cloud.provision()
+            self.public_address = self._cloud.address()
+        else:
+            await asyncio.sleep(self._cloud.delay("settle-subordinate"))
+            self.public_address = self.principal.public_address
+        if self.principal is None and self._cloud.mirror is not None:
+            await self._cloud.mirror.install(self)
+
+        if self._cloud.fails("settle"):
+            self.workload_status = "error"
+            self.workload_status_message = "hook failed: install"
+        else:
+            self.workload_status = "active"
+            self.workload_status_message = ""
+        self.agent_status = "idle"
+        self._settled.set()
+        await self.app._state.notify("unit", data=self.safe_data)
+        await self.app._state.attach_subordinates(self)
+
+    @property
+    def safe_data(self) -> Dict[str, Any]:
+        """Get raw unit data as libjuju exposes it."""
+        return {
+            "name": self.name,
+            "application": self.application,
+            "public-address": self.public_address,
+            "workload-status": {
+                "current": self.workload_status,
+                "message": self.workload_status_message,
+            },
+            "agent-status": {"current": self.agent_status},
+        }
+
+    async def get_public_address(self) -> Optional[str]:
+        """Get public address of unit."""
+        await self._cloud.call("get-public-address")
+        return self.public_address
+
+    async def ssh(self, command: str, **_: Any) -> str:
+        """Execute command on unit.
+
+        Raises:
+            JujuError: Raised if the command fails.
+        """
+        await self._settled.wait()
+        await self._cloud.call("ssh", "ssh")
+        if self._cloud.fails("ssh"):
+            raise JujuError(f"command failed on {self.name}: {command}")
+        if self._cloud.ssh_handler is not None:
+            return await self._cloud.ssh_handler(self, command)
+        # Report that every command of a batch succeeded without output.
+        return "".join(
+            f"{BATCH_MARKER} {i} 0 \n" for i in range(command.count(f'"{BATCH_MARKER} '))
+        )
+
+    async def scp_to(self, source: str, destination: str, **_: Any) -> None:
+        """Copy file to unit."""
+        await self._settled.wait()
+        await self._cloud.call("scp", "scp")
+
+    async def run_action(self, action_name: str, **params: Any) -> SimAction:
+        """Enqueue action on unit."""
+        await self._cloud.call("run-action")
+        return SimAction(self, action_name, params)
+
+
+class SimApplication:
+    """Simulated application within a model."""
+
+    def __init__(
+        self,
+        state: "_ModelState",
+        name: str,
+        charm: str,
+        channel: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None,
+        subordinate: bool = False,
+    ) -> None:
+        self.name = name
+        self.charm = charm
+        self.channel = channel
+        self.subordinate = subordinate
+        self._config = {k: str(v) for k, v in (config or {}).items()}
+        self._units: List[SimUnit] = []
+        self._state = state
+        self._cloud = state.cloud
+
+    @property
+    def units(self) -> List[SimUnit]:
+        """Get units of application."""
+        return list(self._units)
+
+    @property
+    def status(self) -> str:
+        """Get status of application derived from its units."""
+        statuses = {unit.workload_status for unit in self._units}
+        for status in ("error", "blocked", "waiting", "maintenance"):
+            if status in statuses:
+                return status
+        return "active" if statuses else "unknown"
+
+    @property
+    def safe_data(self) -> Dict[str, Any]:
+        """Get raw application data as libjuju exposes it."""
+        return {"name": self.name, "charm-url": f"ch:{self.charm}", "status": self.status}
+
+    async def add_unit(self, count: int = 1, **_: Any) -> List[SimUnit]:
+        """Add units to application."""
+        await self._cloud.call("add-unit")
+        return self._state.add_units(self, count)
+
+    async def get_config(self) -> Dict[str, Dict[str, Any]]:
+        """Get config of application."""
+        await self._cloud.call("get-config")
+        return {k: {"value": v} for k, v in self._config.items()}
+
+    async def set_config(self, config: Dict[str, Any]) -> None:
+        """Set config of application."""
+        await self._cloud.call("set-config")
+        self._config.update({k: str(v) for k, v in config.items()})
+
+
+class SimRelation:
+    """Simulated relation between two application endpoints."""
+
+    def __init__(self, *endpoints: str) -> None:
+        self.endpoints = [_Endpoint(*(e.split(":", 1) + ["juju-info"])[:2]) for e in endpoints]
+
+
+class _ModelState:
+    """Applications, units and relations of a simulated model."""
+
+    def __init__(self, cloud: SimCloud, name: str) -> None:
+        self.cloud = cloud
+        self.name = name
+        self.config = {"update-status-hook-interval": "5m"}
+        self.applications: Dict[str, SimApplication] = {}
+        self.units: Dict[str, SimUnit] = {}
+        self.relations: List[SimRelation] = []
+        self.observers: List[Any] = []
+        self._tasks: Set[asyncio.Future] = set()
+        self._numbers: Counter = Counter()
+
+    async def notify(
+        self, entity: str, kind: str = "change", data: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """Deliver a delta to every observer."""
+        for observer, model in list(self.observers):
+            await observer(_Delta(entity, kind, data), None, None, model)
+
+    def _spawn(self, coro: Any) -> None:
+        """Run coroutine in the background, keeping a reference to it."""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def add_application(
+        self,
+        name: str,
+        charm: str,
+        units: int = 1,
+        to: Optional[List[SimMachine]] = None,
+        **kwargs: Any,
+    ) -> None:
+        """Add application with units. Applications without units are subordinates."""
+        if name in self.applications:
+            raise JujuError(f'application "{name}" already exists')
+        app = SimApplication(self, name, charm, subordinate=not units, **kwargs)
+        self.applications[name] = app
+        self.add_units(app, units, to)
+
+    def add_units(
+        self, app: SimApplication, count: int, to: Optional[List[SimMachine]] = None
+    ) -> List[SimUnit]:
+        """Add units to an application and start bringing them up.
+
+        Units are placed on the given machines in order, and on new machines
+        once those run out.
+        """
+        if app.subordinate and count:
+            raise JujuError(f"cannot add units to subordinate application {app.name}")
+        units = [self._new_unit(app) for _ in range(count)]
+        for unit, machine in zip(units, to or []):
+            unit.machine = machine
+        for unit in units:
+            self._spawn(unit._settle())
+        return units
+
+    def _new_unit(self, app: SimApplication) -> SimUnit:
+        """Create the next unit of an application."""
+        unit = SimUnit(app, self._numbers[app.name])
+        self._numbers[app.name] += 1
+        app._units.append(unit)
+        self.units[unit.name] = unit
+        self._spawn(self.notify("unit", "add", unit.safe_data))
+        return unit
+
+    def _subordinates(self, app: SimApplication) -> List[SimApplication]:
+        """Get subordinate applications related to a principal application."""
+        related = []
+        for relation in self.relations:
+            names = [e.application_name for e in relation.endpoints]
+            if app.name not in names:
+                continue
+            for name in names:
+                other = self.applications[name]
+                if other is not app and other.subordinate and other not in related:
+                    related.append(other)
+        return related
+
+    async def attach_subordinates(self, principal: SimUnit) -> None:
+        """Deploy subordinate units next to a principal unit that has come up."""
+        if principal.app.subordinate:
+            return
+        for app in self._subordinates(principal.app):
+            if any(u.principal is principal for u in app._units):
+                continue
+            unit = self._new_unit(app)
+            unit.principal = principal
+            self._spawn(unit._settle())
+
+    def relate(self, endpoint1: str, endpoint2: str) -> SimRelation:
+        """Relate two endpoints, deploying subordinates next to running principals."""
+        for endpoint in (endpoint1, endpoint2):
+            if endpoint.split(":")[0] not in self.applications:
+                raise JujuError(f'application "{endpoint.split(":")[0]}" not found')
+        relation = SimRelation(endpoint1, endpoint2)
+        self.relations.append(relation)
+        for endpoint in relation.endpoints:
+            app = self.applications[endpoint.application_name]
+            for unit in app._units:
+                if unit._settled.is_set():
+                    self._spawn(self.attach_subordinates(unit))
+        return relation
+
+    async def deploy_bundle(self, bundle: Dict[str, Any]) -> None:
+        """Deploy applications and relations of a bundle."""
+        await asyncio.sleep(self.cloud.delay("deploy"))
+        machines = {str(key): SimMachine(self.cloud) for key in bundle.get("machines", {})}
+        for name, app in bundle.get("applications", {}).items():
+            if unknown := [str(m) for m in app.get("to", []) if str(m) not in machines]:
+                raise JujuError(f"application {name} placed on unknown machines {unknown}")
+            self.add_application(
+                name,
+                app["charm"],
+                units=app.get("num_units", 0),
+                to=[machines[str(m)] for m in app.get("to", [])],
+                channel=app.get("channel"),
+                config=app.get("options"),
+            )
+        for endpoint1, endpoint2 in bundle.get("relations", []):
+            self.relate(endpoint1, endpoint2)
+        await self.notify("application")
+
+
+class SimController:
+    """Simulated Juju controller."""
+
+    def __init__(self, cloud: SimCloud) -> None:
+        self._cloud = cloud
+        self._connected = False
+
+    async def connect(self, *_: Any, **__: Any) -> None:
+        """Connect to controller."""
+        await self._cloud.call("connect")
+        self._connected = True
+
+    async def disconnect(self) -> None:
+        """Disconnect from controller."""
+        self._connected = False
+
+    def is_connected(self) -> bool:
+        """Determine if connected to controller."""
+        return self._connected
+
+    async def list_models(self) -> List[str]:
+        """Get names of models on controller."""
+        await self._cloud.call("list-models")
+        return list(self._cloud.models)
+
+    async def add_model(self, model_name: str, **_: Any) -> "SimModel":
+        """Add model to controller and connect to it."""
+        await self._cloud.call("add-model")
+        if model_name in self._cloud.models:
+            raise JujuError(f'model "{model_name}" already exists')
+        self._cloud.models[model_name] = _ModelState(self._cloud, model_name)
+        model = SimModel(self._cloud)
+        await model.connect(model_name)
+        return model
+
+
+class SimModel:
+    """Connection to a simulated model."""
+
+    def __init__(self, cloud: SimCloud) -> None:
+        self._cloud = cloud
+        self._state: Optional[_ModelState] = None
+
+    async def connect(self, model_name: str, **_: Any) -> None:
+        """Connect to model.
+
+        Raises:
+            JujuError: Raised if the model does not exist.
+        """
+        await self._cloud.call("connect")
+        if model_name not in self._cloud.models:
+            raise JujuError(f'model "{model_name}" not found')
+        self._state = self._cloud.models[model_name]
+
+    async def disconnect(self) -> None:
+        """Disconnect from model."""
+        if self._state is not None:
+            self._state.observers = [(o, m) for o, m in self._state.observers if m is not self]
+        self._state = None
+
+    def is_connected(self) -> bool:
+        """Determine if connected to model."""
+        return self._state is not None
+
+    @property
+    def name(self) -> Optional[str]:
+        """Get name of model."""
+        return self._state.name if self._state else None
+
+    @property
+    def info(self) -> Optional[_ModelInfo]:
+        """Get information about model."""
+        return _ModelInfo(self._state.name, "cloud-sim", None) if self._state else None
+
+    @property
+    def applications(self) -> Dict[str, SimApplication]:
+        """Get applications within model."""
+        return self._state.applications
+
+    @property
+    def units(self) -> Dict[str, SimUnit]:
+        """Get units within model."""
+        return self._state.units
+
+    @property
+    def relations(self) -> List[SimRelation]:
+        """Get relations within model."""
+        return self._state.relations
+
+    def add_observer(self, callable_: Any, *_: Any, **__: Any) -> None:
+        """Register coroutine function called with every model delta."""
+        self._state.observers.append((callable_, self))
+
+    async def get_config(self) -> Dict[str, _ConfigValue]:
+        """Get model config."""
+        await self._cloud.call("model-get-config")
+        return {k: _ConfigValue(v) for k, v in self._state.config.items()}
+
+    async def set_config(self, config: Dict[str, Any]) -> None:
+        """Set model config."""
+        await self._cloud.call("model-set-config")
+        self._state.config.update({k: str(v) for k, v in config.items()})
+
+    async def deploy(
+        self,
+        entity_url: str,
+        application_name: Optional[str] = None,
+        num_units: int = 1,
+        channel: Optional[str] = None,
+        config: Optional[Dict[str, Any]] = None,
+        **_: Any,
+    ) -> SimApplication:
+        """Deploy charm as an application."""
+        await self._cloud.call("deploy", "deploy")
+        name = application_name or entity_url
+        self._state.add_application(
+            name, entity_url, units=num_units, channel=channel, config=config
+        )
+        await self._state.notify("application")
+        return self._state.applications[name]
+
+    async def integrate(self, relation1: str, relation2: str) -> SimRelation:
+        """Relate two application endpoints."""
+        await self._cloud.call("integrate", "integrate")
+        return self._state.relate(relation1, relation2)
+
+    async def wait_for_idle(
+        self,
+        apps: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        timeout: Optional[float] = None,
+        idle_period: float = 15,
+        **_: Any,
+    ) -> None:
+        """Poll until units of applications are idle, like libjuju does."""
+
+        def _idle() -> bool:
+            for name in apps or self.applications:
+                app = self.applications.get(name)
+                if app is None or not app._units:
+                    return False
+                for unit in app._units:
+                    if unit.agent_status != "idle":
+                        return False
+                    if status is not None and unit.workload_status != status:
+                        return False
+            return True
+
+        async def _poll() -> None:
+            while not _idle():
+                await asyncio.sleep(0.5)
+            await asyncio.sleep(idle_period)
+
+        await asyncio.wait_for(_poll(), timeout)
+
+
+class _SimProcess:
+    """Process-like handle on a simulated Juju CLI command."""
+
+    def __init__(self, result: Awaitable[Result]) -> None:
+        self.stdout = asyncio.StreamReader()
+        self.stderr = asyncio.StreamReader()
+        self.returncode: Optional[int] = None
+        self._task = asyncio.ensure_future(self._run(result))
+
+    async def _run(self, result: Awaitable[Result]) -> None:
+        """Feed output of command into the pipes once it has finished."""
+        try:
+            result = await result
+        except asyncio.CancelledError:
+            self.returncode = -9
+            self.stdout.feed_eof()
+            self.stderr.feed_eof()
+            raise
+        except Exception as e:
+            result = Result(1, "", f"ERROR {e}\n")
+        self.stdout.feed_data(result.stdout.encode())
+        self.stderr.feed_data(result.stderr.encode())
+        self.stdout.feed_eof()
+        self.stderr.feed_eof()
+        self.returncode = result.exit_code
+
+    async def wait(self) -> int:
+        """Wait for command to exit."""
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        return self.returncode
+
+    def kill(self) -> None:
+        """Stop the command."""
+        self._task.cancel()
+
+
+class SimJujuRunner(JujuRunner):
+    """Juju CLI runner that acts on a simulated controller.
+
+    Understands the `deploy` (of a bundle) and `attach-resource` commands.
+    Other commands exit with an error. Commands run in-process; no `juju`
+    executable is started.
+    """
+
+    def __init__(self, cloud: SimCloud, concurrency: int = 8) -> None:
+        super().__init__(concurrency)
+        self._cloud = cloud
+
+    async def _spawn(self, args: List[str], cwd: Optional[Union[str, os.PathLike]]) -> Any:
+        """Simulate starting the Juju CLI."""
+        return _SimProcess(self._exec(args, cwd))
+
+    async def _exec(self, args: List[str], cwd: Optional[Union[str, os.PathLike]]) -> Result:
+        """Simulate running the Juju CLI."""
+        subcommand = args[0] if args else ""
+        self._cloud.round_trips[f"juju {subcommand}"] += 1
+        await asyncio.sleep(self._cloud.delay("juju"))
+
+        model_name = args[args.index("-m") + 1] if "-m" in args else None
+        state = self._cloud.models.get(model_name)
+        if state is None:
+            return Result(1, "", f'ERROR model "{model_name}" not found\n')
+
+        if subcommand == "deploy":
+            with open(os.path.join(str(cwd or "."), args[-1])) as f:
+                bundle = yaml.safe_load(f)
+            try:
+                await state.deploy_bundle(bundle)
+            except JujuError as e:
+                return Result(1, "", f"ERROR {e}\n")
+            return Result(0, "", "Deploy of bundle completed.\n")
+
+        if subcommand == "attach-resource":
+            if args[-2] not in state.applications:
+                return Result(1, "", f'ERROR application "{args[-2]}" not found\n')
+            await asyncio.sleep(self._cloud.delay("api"))
+            return Result(0, "", "")
+
+        return Result(1, "", f"ERROR simulated juju does not support {subcommand}\n")
+
+
+class _SkippingSelector:
+    """Selector that advances the loop's clock instead of blocking on a timeout."""
+
+    def __init__(self, selector: selectors.BaseSelector, loop: "SimEventLoop") -> None:
+        self._selector = selector
+        self._loop = loop
+
+    def select(self, timeout: Optional[float] = None) -> List[Any]:
+        """Poll for ready file objects, skipping ahead in time if there are none."""
+        events = self._selector.select(0)
+        if events or timeout == 0:
+            return events
+        if timeout is None:
+            return self._selector.select(None)
+        self._loop.skipped += timeout
+        return []
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything else to the wrapped selector."""
+        return getattr(self._selector, name)
+
+
+class SimEventLoop(asyncio.SelectorEventLoop):
+    """Event loop that jumps ahead to the next timer instead of sleeping.
+
+    Time spent running code still passes as normal, so `time()` reports
+    how long a workload would take against the simulated latencies.
+    """
+
+    def __init__(self) -> None:
+        self.skipped = 0.0
+        super().__init__(_SkippingSelector(selectors.DefaultSelector(), self))
+
+    def time(self) -> float:
+        """Get current time of the simulation."""
+        return time.monotonic() + self.skipped
+
+    def close(self) -> None:
+        """Cancel tasks still pending, as `asyncio.run` does, then close the loop.
+
+        Units on machines shared with others may still be waiting to run
+        their hooks once a workload finishes, and would otherwise be
+        destroyed pending.
+        """
+        if not self.is_running() and not self.is_closed():
+            if pending := asyncio.all_tasks(self):
+                for task in pending:
+                    task.cancel()
+                self.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        super().close()
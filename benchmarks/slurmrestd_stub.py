@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Stub of slurmrestd for trying out and benchmarking `pluto submit`.
+
+Answers `POST /slurm/<version>/job/submit` and `GET /slurm/<version>/ping`
+with the JSON slurmrestd would return, and `HEAD /slurm/<version>/ping`
+with the headers of the latter, without running any jobs. Submissions
+are handled one at a time, as slurmctld does, each taking `service` seconds,
+and every response is delayed by `rtt` seconds to simulate the network.
+Requests pipelined on a connection are answered in order.
+
+Like a real server, the stub can close keep-alive connections: those idle
+for `idle_timeout` seconds, and those that carried `max_requests` requests,
+announcing it with `Connection: close` on the last response if
+`announce_close` is set. With `chunked`, response bodies are sent with
+chunked transfer encoding instead of Content-Length.
+
+Run it on its own and point pluto at it:
+
+    python benchmarks/slurmrestd_stub.py --port 6820 &
+    pluto submit stub job.submit --url http://127.0.0.1:6820 --token x --count 1000
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from typing import Any, Dict, Optional, Set, Tuple
+
+
+class StubSlurmRestd:
+    """Stub slurmrestd server."""
+
+    def __init__(
+        self,
+        rtt: float = 0.0,
+        service: float = 0.0,
+        fail_every: int = 0,
+        chunked: bool = False,
+        idle_timeout: float = 0.0,
+        max_requests: int = 0,
+        announce_close: bool = True,
+    ) -> None:
+        self.rtt = rtt
+        self.service = service
+        self.fail_every = fail_every
+        self.chunked = chunked
+        self.idle_timeout = idle_timeout
+        self.max_requests = max_requests
+        self.announce_close = announce_close
+        self.jobs = 0
+        # Names of submitted jobs by job ID.
+        self.names: Dict[int, str] = {}
+        self.requests = 0
+        self.connections = 0
+        self._slurmctld = asyncio.Lock()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Set[asyncio.Task] = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start listening and get URL of the server."""
+        self._server = await asyncio.start_server(self._handle, host, port)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        """Stop listening, and wait for clients to hang up."""
+        self._server.close()
+        await self._server.wait_closed()
+        await asyncio.gather(*self._handlers)
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Any]]:
+        """Read method, path and decoded body of a request."""
+        line = await reader.readline()
+        if not line:
+            return None
+        method, path, _ = line.decode().split(" ", 2)
+        headers = {}
+        while (line := await reader.readline()).strip():
+            key, _, value = line.decode().partition(":")
+            headers[key.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        if "x-slurm-user-token" not in headers:
+            return method, path, None
+        return method, path, json.loads(body or b"{}")
+
+    async def _answer(self, method: str, path: str, body: Any) -> Tuple[int, Dict[str, Any]]:
+        """Get status and payload of the response to a request."""
+        self.requests += 1
+        if body is None:
+            return 401, {"errors": [{"description": "Authentication failure"}]}
+        if method in ("GET", "HEAD") and path.endswith("/ping"):
+            return 200, {"pings": [{"hostname": "stub", "pinged": "UP"}], "errors": []}
+        if method != "POST" or not path.endswith("/job/submit"):
+            return 404, {"errors": [{"description": f"Unknown path {path}"}]}
+        async with self._slurmctld:
+            if self.service:
+                await asyncio.sleep(self.service)
+            self.jobs += 1
+            job_id = self.jobs
+            self.names[job_id] = body.get("job", {}).get("name")
+        if self.fail_every and job_id % self.fail_every == 0:
+            return 500, {"errors": [{"description": "Job submission rejected"}]}
+        return 200, {"job_id": job_id, "step_id": "batch", "errors": [], "warnings": []}
+
+    def _encode(self, status: int, payload: Dict[str, Any], close: bool, bodiless: bool) -> bytes:
+        """Encode a response, in chunks of a few bytes if the stub sends chunked responses.
+
+        Responses to HEAD requests get the headers of a GET response, but no body.
+        """
+        data = json.dumps(payload).encode()
+        head = f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+        head += "Content-Type: application/json\r\n"
+        if close:
+            head += "Connection: close\r\n"
+        if not self.chunked:
+            head += f"Content-Length: {len(data)}\r\n\r\n"
+            return head.encode() + (b"" if bodiless else data)
+        if bodiless:
+            return f"{head}Transfer-Encoding: chunked\r\n\r\n".encode()
+        chunks = [data[i : i + 16] for i in range(0, len(data), 16)]
+        return (
+            f"{head}Transfer-Encoding: chunked\r\n\r\n".encode()
+            + b"".join(f"{len(c):x}\r\n".encode() + c + b"\r\n" for c in chunks)
+            + b"0\r\n\r\n"
+        )
+
+    async def _respond(
+        self, responses: "asyncio.Queue[Optional[asyncio.Future]]", writer: asyncio.StreamWriter
+    ) -> None:
+        """Write responses in the order their requests arrived."""
+        loop = asyncio.get_event_loop()
+        answered = 0
+        while (response := await responses.get()) is not None:
+            due, method, (status, payload) = await response
+            await asyncio.sleep(max(due - loop.time(), 0))
+            answered += 1
+            last = answered == self.max_requests and self.announce_close
+            writer.write(self._encode(status, payload, last, method == "HEAD"))
+            await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve pipelined requests of one connection."""
+        self.connections += 1
+        self._handlers.add(asyncio.current_task())
+        loop = asyncio.get_event_loop()
+        responses: "asyncio.Queue[Optional[asyncio.Future]]" = asyncio.Queue()
+        responder = asyncio.ensure_future(self._respond(responses, writer))
+
+        async def _timed(request: Tuple[str, str, Any]) -> Tuple[float, str, Tuple[int, Any]]:
+            arrived = loop.time()
+            return arrived + self.rtt, request[0], await self._answer(*request)
+
+        received = 0
+        try:
+            while not self.max_requests or received < self.max_requests:
+                request = await asyncio.wait_for(
+                    self._read_request(reader), self.idle_timeout or None
+                )
+                if request is None:
+                    break
+                received += 1
+                responses.put_nowait(asyncio.ensure_future(_timed(request)))
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass
+        finally:
+            responses.put_nowait(None)
+            await responder
+            await self._close(reader, writer)
+            self._handlers.discard(asyncio.current_task())
+
+    async def _close(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Close a connection without discarding responses the client has yet to read.
+
+        Closing a socket with unread requests resets the connection, so the
+        stub stops sending, and discards requests until the client hangs up.
+        """
+        try:
+            if writer.can_write_eof():
+                writer.write_eof()
+            await asyncio.wait_for(reader.read(), 1)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        writer.close()
+
+
+async def _serve(host: str, port: int, rtt: float, service: float) -> None:
+    """Serve until interrupted."""
+    stub = StubSlurmRestd(rtt, service)
+    print(f"Stub slurmrestd listening on {await stub.start(host, port)}", flush=True)
+    await asyncio.Event().wait()
+
+
+def main() -> int:
+    """Run stub slurmrestd."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on.")
+    parser.add_argument("--port", type=int, default=6820, help="Port to listen on.")
+    parser.add_argument("--rtt", type=float, default=0.0, help="Simulated round trip in seconds.")
+    parser.add_argument(
+        "--service", type=float, default=0.0, help="Seconds slurmctld takes per submission."
+    )
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, args.rtt, args.service))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark the status table behind `pluto status` with many units.
+
+Loads a status table from unit deltas, applies random status changes,
+and measures the time per delta, the time to draw the whole screen and
+to redraw only what changed, and the memory held by the table compared
+with the raw unit data libjuju keeps per unit.
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from pluto.drivers.status import StatusTable
+from pluto.ops.status import StatusScreen
+
+_STATUSES = [("waiting", "allocating"), ("maintenance", "executing"), ("active", "idle")]
+
+
+def _unit(i: int, workload: str, agent: str) -> Dict[str, Any]:
+    """Get raw data of a compute unit as found in a model delta."""
+    return {
+        "name": f"compute/{i}",
+        "application": "compute",
+        "public-address": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+        "workload-status": {"current": workload, "message": ""},
+        "agent-status": {"current": agent},
+    }
+
+
+def _timed(func: Any, *args: Any) -> float:
+    """Get how long a function call takes in seconds."""
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    """Run the status table benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--units", type=int, default=10000, help="Number of units.")
+    parser.add_argument("--changes", type=int, default=100, help="Changes per redraw.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of random changes.")
+    args = parser.parse_args()
+    os.environ.setdefault("COLUMNS", "120")
+    os.environ.setdefault("LINES", "50")
+    rng = random.Random(args.seed)
+
+    adds = [_unit(i, *_STATUSES[0]) for i in range(args.units)]
+    changes = [_unit(rng.randrange(args.units), *rng.choice(_STATUSES)) for _ in range(args.units)]
+
+    tracemalloc.start()
+    table = StatusTable()
+    load = _timed(lambda: [table.apply("unit", "add", data) for data in adds])
+    table_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    raw: List[Dict[str, Any]] = [_unit(i, *_STATUSES[0]) for i in range(args.units)]
+    raw_memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del raw
+
+    update = _timed(lambda: [table.apply("unit", "change", data) for data in changes])
+
+    out = io.StringIO()
+    screen = StatusScreen(table, "bench", out)
+    draw = _timed(screen.draw)
+    full_bytes = out.tell()
+
+    redraws = []
+    for offset in range(0, len(changes), args.changes):
+        for data in changes[offset : offset + args.changes]:
+            table.apply("unit", "change", _unit(int(data["name"][8:]), *rng.choice(_STATUSES)))
+        out.seek(0)
+        out.truncate()
+        redraws.append((_timed(screen.refresh), out.tell()))
+
+    mean_redraw = sum(t for t, _ in redraws) / len(redraws)
+    mean_bytes = sum(n for _, n in redraws) / len(redraws)
+    print(f"Units:              {args.units}")
+    print(f"Load:               {load * 1e6 / args.units:.2f}us per delta ({load:.3f}s)")
+    print(f"Update:             {update * 1e6 / args.units:.2f}us per delta ({update:.3f}s)")
+    print(f"Full draw:          {draw * 1e3:.2f}ms, {full_bytes} bytes")
+    print(
+        f"Redraw:             {mean_redraw * 1e3:.2f}ms, {mean_bytes:.0f} bytes "
+        f"per {args.changes} changes"
+    )
+    print(
+        f"Memory:             {table_memory / 2**20:.2f}MB table versus "
+        f"{raw_memory / 2**20:.2f}MB of raw unit data"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
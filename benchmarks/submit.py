@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark job submission behind `pluto submit` against a stub slurmrestd.
+
+Submits parametrized jobs to a local stub of slurmrestd (see
+`slurmrestd_stub.py`) with several connection pool sizes and pipeline
+depths, and reports submission throughput and latency percentiles for
+each, plus the throughput achieved under a rate limit. Jobs are also
+submitted to a stub that closes connections mid-pipeline, and the jobs
+reported as failed are resubmitted by index until all are submitted.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, Optional, Set
+
+from craft_cli import EmitterMode, emit
+from slurmrestd_stub import StubSlurmRestd
+
+from pluto.drivers.slurm import SlurmRestClient
+from pluto.ops.submit import expand_jobs, format_indexes, parse_indexes, submit_jobs
+from pluto.utils.stats import summarize
+
+_SCRIPT = "#!/bin/bash\n#SBATCH --ntasks=1\nsrun hostname\n"
+
+
+async def _run(
+    jobs: int,
+    connections: int,
+    pipeline: int,
+    rtt: float,
+    service: float,
+    rate: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Submit jobs to a fresh stub slurmrestd and measure them."""
+    stub = StubSlurmRestd(rtt, service)
+    url = await stub.start()
+    params = [("INDEX", [str(i) for i in range(jobs)])]
+    try:
+        async with SlurmRestClient(
+            url, "bench", "token", connections=connections, pipeline=pipeline
+        ) as client:
+            report = await submit_jobs(
+                client,
+                _SCRIPT,
+                expand_jobs("bench", "/tmp", 1, params),
+                connections * pipeline,
+                rate,
+            )
+            opened = client.connections
+    finally:
+        await stub.stop()
+    return {
+        "connections": connections,
+        "pipeline": pipeline,
+        "rate": rate,
+        "submitted": len(report.job_ids),
+        "failed": len(report.failures),
+        "throughput": len(report.job_ids) / report.elapsed,
+        "opened": opened,
+        **summarize(report.latencies),
+    }
+
+
+async def _resubmit(jobs: int, max_requests: int) -> Dict[str, Any]:
+    """Submit jobs to a stub that closes connections, resubmitting failures by index."""
+    stub = StubSlurmRestd(max_requests=max_requests, announce_close=False)
+    url = await stub.start()
+    params = [("INDEX", [str(i) for i in range(jobs)])]
+    indexes: Optional[Set[int]] = None
+    rounds, submitted = 0, 0
+    try:
+        async with SlurmRestClient(url, "bench", "token") as client:
+            while rounds < 10 and indexes != set():
+                rounds += 1
+                report = await submit_jobs(
+                    client, _SCRIPT, expand_jobs("bench", "/tmp", 1, params, indexes=indexes)
+                )
+                submitted += len(report.job_ids)
+                # Read back failed indexes the way a user passes them to --index.
+                failed = format_indexes(failure.index for failure in report.failures)
+                indexes = parse_indexes(failed) if failed else set()
+    finally:
+        await stub.stop()
+    return {"rounds": rounds, "submitted": submitted, "received": stub.jobs, "left": indexes}
+
+
+def main() -> int:
+    """Run the job submission benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000, help="Number of jobs to submit.")
+    parser.add_argument(
+        "--rtt", type=float, default=0.005, help="Simulated network round trip in seconds."
+    )
+    parser.add_argument(
+        "--service", type=float, default=0.0002, help="Seconds slurmctld takes per submission."
+    )
+    parser.add_argument(
+        "--rate", type=float, default=500, help="Rate limit to check, in jobs per second."
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=50, help="Requests per connection of the stub."
+    )
+    args = parser.parse_args()
+
+    configs = [(1, 1, None), (4, 1, None), (1, 8, None), (4, 8, None), (4, 8, args.rate)]
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting job submission benchmark")
+    try:
+        results = [
+            asyncio.run(_run(args.jobs, conns, depth, args.rtt, args.service, rate))
+            for conns, depth, rate in configs
+        ]
+        resubmitted = asyncio.run(_resubmit(args.jobs, args.max_requests))
+    finally:
+        emit.ended_ok()
+
+    print(
+        f"{'Conns':>5} {'Pipeline':>8} {'Rate':>6} {'Jobs/s':>8} "
+        f"{'p50':>8} {'p95':>8} {'p99':>8} {'Failed':>6} {'Opened':>6}"
+    )
+    for r in results:
+        rate = f"{r['rate']:.0f}" if r["rate"] else "-"
+        print(
+            f"{r['connections']:>5} {r['pipeline']:>8} {rate:>6} {r['throughput']:>8.1f} "
+            f"{r['p50'] * 1e3:>6.1f}ms {r['p95'] * 1e3:>6.1f}ms {r['p99'] * 1e3:>6.1f}ms "
+            f"{r['failed']:>6} {r['opened']:>6}"
+        )
+
+    # The token bucket lets a second's worth of jobs through at once before
+    # settling at the limit, so the average over the run is somewhat higher.
+    failed = any(r["failed"] or r["submitted"] != args.jobs for r in results)
+    burst = min(args.rate, args.jobs - 1)
+    limit = args.rate * args.jobs / (args.jobs - burst) * 1.1
+    if results[-1]["throughput"] > limit:
+        print(f"FAIL: {results[-1]['throughput']:.1f} jobs/s exceeds rate limit of {args.rate}")
+        failed = True
+
+    r = resubmitted
+    print(
+        f"Closing connections after {args.max_requests} requests: {r['submitted']} of "
+        f"{args.jobs} jobs submitted in {r['rounds']} rounds of resubmission by index"
+    )
+    if r["left"] or r["submitted"] != args.jobs or r["received"] != args.jobs:
+        print(
+            f"FAIL: {r['submitted']} jobs reported and {r['received']} received, "
+            f"{len(r['left'])} left to resubmit"
+        )
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
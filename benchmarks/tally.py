@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark the counting engine behind `pluto tally` on large datasets.
+
+Generates vote datasets shaped like `demo/distro_name_dataset.csv` with
+millions of rows, and measures how fast they are counted with one worker,
+with every CPU, and split across simulated Slurm array tasks whose partial
+counts are merged. Smaller datasets are also counted row by row with the
+csv module, the way the original demo reads its dataset, for comparison.
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Callable, Dict, List
+
+from pluto.tally import count, default_workers, merge
+
+_VOTES = ["Mantic Minotaur", "Mantic Manatee", "Mantic Macaw", "Boisterous Barracuda"]
+_COUNTRIES = ["Andorra", "Belize", "Cambodia", "Honduras", "Trinidad and Tobago", "Uzbekistan"]
+_BLOCK_ROWS = 10000
+
+
+def generate(path: str, rows: int, seed: int = 0) -> Dict[str, int]:
+    """Write a vote dataset by repeating a block of random rows.
+
+    Returns:
+        Expected count of each vote.
+    """
+    rng = random.Random(seed)
+    block = [
+        f'"user{i}@example.com","{rng.choice(_COUNTRIES)}","{rng.choice(_VOTES)}"\n'
+        for i in range(_BLOCK_ROWS)
+    ]
+    data = "".join(block).encode()
+    expected: Counter = Counter()
+    votes = Counter(line.rsplit(",", 1)[1].strip().strip('"') for line in block)
+    with open(path, "wb") as f:
+        for _ in range(rows // _BLOCK_ROWS):
+            f.write(data)
+        f.writelines(line.encode() for line in block[: rows % _BLOCK_ROWS])
+    for vote, n in votes.items():
+        expected[vote] = n * (rows // _BLOCK_ROWS)
+    expected.update(
+        line.rsplit(",", 1)[1].strip().strip('"') for line in block[: rows % _BLOCK_ROWS]
+    )
+    return dict(expected)
+
+
+def _row_by_row(path: str) -> Dict[str, int]:
+    """Count votes by parsing every row with the csv module."""
+    with open(path, newline="") as f:
+        return dict(Counter(row[-1] for row in csv.reader(f)))
+
+
+def _timed(func: Callable[[], Dict[str, int]]) -> "tuple[float, Dict[str, int]]":
+    """Get how long a function call takes in seconds, and its result."""
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main() -> int:
+    """Run the tally benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[1_000_000, 10_000_000],
+        help="Dataset sizes in rows.",
+    )
+    parser.add_argument("--workers", type=int, default=default_workers(), help="Worker processes.")
+    parser.add_argument("--shards", type=int, default=4, help="Simulated Slurm array tasks.")
+    parser.add_argument(
+        "--row-by-row-max",
+        type=int,
+        default=1_000_000,
+        help="Largest dataset to also count row by row.",
+    )
+    args = parser.parse_args()
+
+    print(f"{'Rows':>12} {'Size':>9} {'Method':<22} {'Time':>8} {'Rows/s':>12}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            path = os.path.join(tmp, f"votes-{rows}.csv")
+            expected = generate(path, rows)
+            size = os.path.getsize(path)
+            methods: List["tuple[str, Callable[[], Dict[str, int]]]"] = [
+                ("1 worker", lambda: count(path, 1))
+            ]
+            # On a single CPU, counting with every CPU would repeat the run above.
+            if args.workers > 1:
+                methods.append((f"{args.workers} workers", lambda: count(path, args.workers)))
+            methods.append(
+                (
+                    f"{args.shards} array tasks",
+                    lambda: merge(
+                        count(path, args.workers, (i, args.shards)) for i in range(args.shards)
+                    ),
+                )
+            )
+            if rows <= args.row_by_row_max:
+                methods.append(("csv row by row", lambda: _row_by_row(path)))
+            for label, method in methods:
+                elapsed, counts = _timed(method)
+                print(
+                    f"{rows:>12} {size / 2**20:>7.0f}MB {label:<22} "
+                    f"{elapsed:>7.2f}s {rows / elapsed:>12,.0f}"
+                )
+                if counts != expected:
+                    print(f"FAIL: {label} miscounted {rows} rows: {counts} != {expected}")
+                    failed = True
+            os.remove(path)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Benchmark `pluto users import` with thousands of users.
+
+Generates CSV files of users and measures how long reading them, planning
+the import against the last applied GLAuth config, and rendering the new
+config take. The planned import is then applied to a simulated cluster
+(see `sim.py`), and compared with creating home directories with one
+SSH command per user, in simulated time and round trips.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+from craft_cli import EmitterMode, emit
+from sim import SimCloud, SimController, SimEventLoop, SimJujuRunner, SimModel
+
+from pluto.drivers import Cluster
+from pluto.identity import ImportPlan, plan_import, read_users
+from pluto.ops.users import apply_import
+from pluto.utils import Journal
+
+_GROUPS = ["researchers", "physics", "chemistry", "biology"]
+
+
+def generate(path: str, users: int, changed: int = 0) -> None:
+    """Write a CSV file of users, with the mail address of some of them changed."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "group", "mail", "givenname", "sn", "password"])
+        for i in range(users):
+            domain = "example.org" if i < changed else "example.com"
+            writer.writerow(
+                [f"user{i}", _GROUPS[i % len(_GROUPS)], f"user{i}@{domain}", "Ada", "User", "pw"]
+            )
+
+
+async def _import(cloud: SimCloud, plan: ImportPlan, per_user: bool, concurrency: int) -> float:
+    """Apply an import of users to a fresh simulated cluster.
+
+    Returns:
+        Simulated seconds the import took, after the cluster came up.
+    """
+    cluster = Cluster(
+        "bench-users",
+        controller=SimController(cloud),
+        model=SimModel(cloud),
+        juju=SimJujuRunner(cloud),
+    )
+    async with cluster:
+        await cluster.deploy("glauth", application_name="glauth")
+        await cluster.deploy("nfs-server", application_name="nfs-server")
+        await cluster.wait_for(["glauth", "nfs-server"], timeout=1200)
+        cloud.round_trips.clear()
+        start = asyncio.get_event_loop().time()
+        if per_user:
+            semaphore = asyncio.Semaphore(concurrency)
+            server = cluster.units("nfs-server")[0]
+
+            async def _home(name: str) -> None:
+                async with semaphore:
+                    await server.ssh(f"sudo mkdir -p /home/{name}")
+                    await server.ssh(f"sudo chown {name} /home/{name}")
+
+            await asyncio.gather(*(_home(name) for name in plan.users))
+        else:
+            await apply_import(cluster, plan, Journal.for_cluster(cluster.name), concurrency)
+        return asyncio.get_event_loop().time() - start
+
+
+def simulate(plan: ImportPlan, per_user: bool, concurrency: int = 16) -> Dict[str, Any]:
+    """Apply an import of users to a simulated cluster and measure it."""
+    loop = SimEventLoop()
+    asyncio.set_event_loop(loop)
+    cloud = SimCloud()
+    try:
+        simulated = loop.run_until_complete(_import(cloud, plan, per_user, concurrency))
+    finally:
+        loop.close()
+    return {"simulated": simulated, "round_trips": sum(cloud.round_trips.values())}
+
+
+def main() -> int:
+    """Run the user import benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--users", type=int, nargs="+", default=[1000, 10000], help="Numbers of users."
+    )
+    parser.add_argument(
+        "--changed", type=float, default=0.01, help="Share of users changed by a re-import."
+    )
+    parser.add_argument("--concurrency", type=int, default=16, help="SSH sessions at once.")
+    args = parser.parse_args()
+
+    print(
+        f"{'Users':>6} {'Read':>7} {'Plan':>7} {'Re-plan':>7} {'Changed':>7} "
+        f"{'Batched':>16} {'Per user':>18}"
+    )
+    failed = False
+    emit.init(EmitterMode.QUIET, "pluto-bench", "Starting user import benchmark")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["SNAP_USER_DATA"] = tmp
+            for count in args.users:
+                path = os.path.join(tmp, f"users-{count}.csv")
+                generate(path, count)
+                start = time.perf_counter()
+                users = read_users(path)
+                read = time.perf_counter() - start
+                plan = plan_import(users)
+                planned = time.perf_counter() - start - read
+
+                generate(path, count, int(count * args.changed))
+                start = time.perf_counter()
+                replan = plan_import(read_users(path), plan.config)
+                replanned = time.perf_counter() - start
+
+                batched = simulate(plan, False, args.concurrency)
+                per_user = simulate(plan, True, args.concurrency)
+                print(
+                    f"{count:>6} {read:>6.2f}s {planned:>6.2f}s {replanned:>6.2f}s "
+                    f"{len(replan.changed):>7} "
+                    f"{batched['simulated']:>7.1f}s {batched['round_trips']:>4} RTs "
+                    f"{per_user['simulated']:>7.1f}s {per_user['round_trips']:>6} RTs"
+                )
+                if len(replan.changed) != int(count * args.changed) or replan.added:
+                    print(f"FAIL: re-import of {count} users changed {len(replan.changed)}")
+                    failed = True
+                # Removing users, then adding one, must not hand it a removed user's uid.
+                removed = plan_import(users[: count // 2], plan.config)
+                newcomer = users[0]._replace(name="newcomer", uid=None)
+                added = plan_import([*users[: count // 2], newcomer], removed.config)
+                if added.users["newcomer"][0] in {uid for uid, _ in plan.users.values()}:
+                    print(f"FAIL: newcomer got uid {added.users['newcomer'][0]} of a removed user")
+                    failed = True
+                if read + planned > 0.001 * count + 1:
+                    print(f"FAIL: planning import of {count} users took {read + planned:.1f}s")
+                    failed = True
+    finally:
+        emit.ended_ok()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
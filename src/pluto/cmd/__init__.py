@@ -3,4 +3,11 @@
 
 """Pluto commands."""
 
+from .agent import AgentCommand
 from .bootstrap import BootstrapCommand
+from .health import HealthCommand
+from .scale import ScaleCommand
+from .status import StatusCommand
+from .submit import SubmitCommand
+from .tally import TallyCommand
+from .users import UsersCommand
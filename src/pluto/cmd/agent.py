@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Run a persistent controller session for other pluto commands.
+
+`pluto agent ...`
+"""
+
+import argparse
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class AgentCommand(BaseCommand):
+    """Run a persistent controller session."""
+
+    name = "agent"
+    help_msg = "Keep a warm connection to the Juju controller for other pluto commands."
+    overview = textwrap.dedent(
+        """
+        Keep a warm connection to the Juju controller for other pluto commands.
+
+        While the agent is running, pluto commands ask it to look up and create
+        cluster models over its existing controller connection instead of
+        connecting to the controller themselves. The agent runs in the
+        foreground until interrupted.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to agent."""
+        parser.add_argument(
+            "--socket",
+            type=str,
+            default=None,
+            help="Unix socket to listen on. Defaults to $PLUTO_AGENT_SOCKET or agent.sock "
+            "in the pluto data directory.",
+        )
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Run pluto agent."""
+        import asyncio
+
+        from pluto.ops.agent import agent
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(agent(parsed_args.socket))
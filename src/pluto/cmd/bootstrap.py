@@ -8,81 +8,11 @@
 """
 
 import argparse
-import asyncio
-import pathlib
-import tempfile
 import textwrap
-from pathlib import Path
 from typing import Any, Dict, Optional
-from urllib import request
-from zipfile import ZipFile
 
 from craft_cli import BaseCommand, emit
 
-from pluto.drivers import Cluster
-
-glauth_cfg = """
-[ldap]
-  enabled = true
-  listen = "0.0.0.0:363"
-
-[ldaps]
-  enabled = true
-  listen = "0.0.0.0:636"
-  cert = "glauth.crt"
-  key = "glauth.key"
-
-[backend]
-  datastore = "config"
-  baseDN = "dc=glauth,dc=com"
-  nameformat = "cn"
-  groupformat = "ou"
-  anonymousdse = true
-
-[behaviors]
-  IgnoreCapabilities = false
-  LimitFailedBinds = true
-  NumberOfFailedBinds = 3
-  PeriodOfFailedBinds = 10
-  BlockFailedBindsFor = 60
-  PruneSourceTableEvery = 600
-  PruneSourcesOlderThan = 600
-
-[[users]]
-  name = "researcher"
-  givenname="Researcher"
-  sn="Science"
-  mail = "researcher@ubuntu.com"
-  uidnumber = 5002
-  primarygroup = 5501
-  loginShell = "/bin/bash"
-  homeDir = "/home/researcher"
-  passsha256 = "6478579e37aff45f013e14eeb30b3cc56c72ccdc310123bcdf53e0333e3f416a" # dogood
-  passappsha256 = [
-    "c32255dbf6fd6b64883ec8801f793bccfa2a860f2b1ae1315cd95cdac1338efa", # TestAppPw1
-    "c9853d5f2599e90497e9f8cc671bd2022b0fb5d1bd7cfff92f079e8f8f02b8d3", # TestAppPw2
-    "4939efa7c87095dacb5e7e8b8cfb3a660fa1f5edcc9108f6d7ec20ea4d6b3a88", # TestAppPw3
-  ]
-
-[[users]]
-  name = "serviceuser"
-  mail = "serviceuser@example.com"
-  uidnumber = 5003
-  primarygroup = 5502
-  passsha256 = "652c7dc687d98c9889304ed2e408c74b611e86a40caa51c4b43f1dd5913c5cd0" # mysecret
-    [[users.capabilities]]
-    action = "search"
-    object = "*"
-
-[[groups]]
-  name = "researchers"
-  gidnumber = 5501
-
-[[groups]]
-  name = "svcaccts"
-  gidnumber = 5502
-"""
-
 
 def _parse_constraints(constraints: str) -> Dict[str, Any]:
     """Parse Juju constraints and return as dict.
@@ -92,189 +22,66 @@ def _parse_constraints(constraints: str) -> Dict[str, Any]:
 
     Yields:
         Parsed constraint values.
+
+    Raises:
+        ValueError: Raised if a constraint is not of the form key=value.
     """
     for constraint in constraints.split(","):
-        key, value = constraint.split("=")
+        key, sep, value = constraint.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid constraint {constraint}. Expected key=value")
         yield key.replace("-", "_"), value
 
 
-async def _bootstrap(
-    name: str,
-    num_compute: int,
-    compute_constraint: Optional[Dict[str, str]] = None,
-    control_constraint: Optional[Dict[str, str]] = None,
-) -> None:
-    """Bootstrap a new HPC cluster using Juju.
+def _load_specs(parsed_args: argparse.Namespace) -> Dict[str, Any]:
+    """Load the specification of each cluster to bootstrap.
 
     Args:
-        name: Name to use for the new HPC cluster.
-        num_compute: Number of compute nodes to deploy.
-        compute_constraint: Constraints to apply to compute plane nodes.
-        control_constraint: Constraints to apply to control plane nodes.
-    """
-    async with Cluster(name) as cluster:
-        emit.progress("Deploying HPC services...")
-        await asyncio.gather(
-            cluster.deploy(
-                "slurmctld",
-                application_name="slurm-controller",
-                channel="edge",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-                config={"custom-slurm-repo": "ppa:ubuntu-hpc/slurm-wlm-23.02"},
-            ),
-            cluster.deploy(
-                "slurmd",
-                application_name="compute",
-                channel="edge",
-                num_units=num_compute,
-                base="ubuntu@22.04",
-                constraints=compute_constraint,
-                config={"custom-slurm-repo": "ppa:ubuntu-hpc/slurm-wlm-23.02"},
-            ),
-            cluster.deploy(
-                "slurmdbd",
-                application_name="slurm-database",
-                channel="edge",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-                config={"custom-slurm-repo": "ppa:ubuntu-hpc/slurm-wlm-23.02"},
-            ),
-            cluster.deploy(
-                "slurmrestd",
-                application_name="slurm-restapi",
-                channel="edge",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-                config={"custom-slurm-repo": "ppa:ubuntu-hpc/slurm-wlm-23.02"},
-            ),
-            cluster.deploy(
-                "mysql",
-                channel="8.0/edge",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-            ),
-            cluster.deploy(
-                "mysql-router",
-                application_name="slurm-database-mysql-router",
-                channel="dpe/edge",
-                num_units=0,
-                base="ubuntu@22.04",
-            ),
-            cluster.deploy("sssd", channel="edge", num_units=0, base="ubuntu@22.04"),
-            cluster.deploy(
-                "glauth",
-                config={"ldap-search-base": "dc=glauth,dc=com", "tls": "true"},
-                channel="edge",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-            ),
-            cluster.deploy(
-                "nfs-client",
-                application_name="home",
-                config={"mountpoint": "/home"},
-                channel="edge",
-                num_units=0,
-                base="ubuntu@22.04",
-            ),
-            cluster.deploy(
-                "nfs-server-proxy",
-                application_name="home-nfs-proxy",
-                channel="edge",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-            ),
-            cluster.deploy(
-                "ubuntu",
-                application_name="nfs-server",
-                num_units=1,
-                base="ubuntu@22.04",
-                constraints=control_constraint,
-            ),
-        )
-
-        emit.progress("Attaching NHC to compute nodes...")
-        with tempfile.TemporaryDirectory() as tmpdir:
-            nhc = Path(tmpdir) / "lbnl-nhc-1.4.3.tar.gz"
-            request.urlretrieve(
-                f"https://github.com/mej/nhc/releases/download/1.4.3/{nhc.name}", nhc
-            )
-            await cluster.attach_resource("compute", {"nhc": nhc})
+        parsed_args: Parsed arguments of bootstrap.
 
-        emit.progress("Integrating deployed HPC services...")
-        await asyncio.gather(
-            cluster.integrate("compute:slurmd", "slurm-controller:slurmd"),
-            cluster.integrate("slurm-restapi:slurmrestd", "slurm-controller:slurmrestd"),
-            cluster.integrate("slurm-database:slurmdbd", "slurm-controller:slurmdbd"),
-            cluster.integrate("slurm-database-mysql-router:backend-database", "mysql:database"),
-            cluster.integrate("slurm-database:database", "slurm-database-mysql-router:database"),
-            cluster.integrate("compute:juju-info", "home:juju-info"),
-            cluster.integrate("slurm-controller:juju-info", "home:juju-info"),
-            cluster.integrate("compute:juju-info", "sssd:juju-info"),
-            cluster.integrate("slurm-controller:juju-info", "sssd:juju-info"),
-            cluster.integrate("nfs-server:juju-info", "sssd:juju-info"),
-        )
-
-        emit.progress("Provisioning NFS server...")
-        async with cluster.quick_fire():
-            await cluster.wait(apps=["nfs-server"], status="active", timeout=1200)
-        for unit in cluster.units("nfs-server"):
-            await unit.ssh("sudo apt -y install nfs-kernel-server")
-            with tempfile.NamedTemporaryFile() as exports:
-                pathlib.Path(exports.name).write_text(
-                    textwrap.dedent(
-                        """
-                        /srv     *(ro,sync,subtree_check)
-                        /home    *(rw,sync,no_subtree_check)
-                        """
-                    ).strip("\n")
-                )
-                await unit.scp_to(exports.name, "~/exports")
-            await unit.ssh("sudo mv ~/exports /etc/exports")
-            await unit.ssh("sudo exportfs -a")
-            await unit.ssh("sudo systemctl restart nfs-kernel-server")
-            endpoint = f"nfs://{await unit.get_public_address()}/home"
-
-        emit.progress("Integrating cluster filesystem")
-        await cluster.get_app("home-nfs-proxy").set_config({"endpoint": endpoint})
-        await cluster.integrate("home-nfs-proxy:nfs-share", "home:nfs-share")
-
-        emit.progress("Provisioning identity management service...")
-        async with cluster.quick_fire():
-            await cluster.wait(apps=["glauth"], status="active", timeout=1200)
-        with tempfile.NamedTemporaryFile(suffix=".zip") as cfg:
-            with ZipFile(cfg.name, "w") as cfg_zip:
-                cfg_zip.writestr("microhpc.cfg", glauth_cfg)
-            await cluster.attach_resource("glauth", {"config": cfg.name})
-        for unit in cluster.units("glauth"):
-            result = await unit.run_action(
-                "set-confidential",
-                **{
-                    "ldap-password": "mysecret",
-                    "ldap-default-bind-dn": "cn=serviceuser,ou=svcaccts,dc=glauth,dc=com",
-                },
-            )
-            await result.wait()
-
-        emit.progress("Integrating identity management service...")
-        await cluster.integrate("glauth:ldap-client", "sssd:ldap-client")
-
-        emit.progress("Provisioning default user 'researcher'...")
-        async with cluster.quick_fire():
-            await cluster.wait(apps=["sssd"], status="active", raise_on_error=False, timeout=1200)
-        for unit in cluster.units("nfs-server"):
-            await unit.ssh("sudo mkdir -p /home/researcher")
-            await unit.ssh("sudo chown -R researcher /home/researcher")
-
-        emit.progress("Starting compute nodes...")
-        for unit in cluster.units("compute"):
-            await unit.run_action("node-configured")
+    Raises:
+        OSError: Raised if a matrix or specification file cannot be read.
+        yaml.YAMLError: Raised if a matrix or specification file is malformed.
+        SpecError: Raised if a matrix or specification is invalid.
+        ValueError: Raised if a node count or constraint is malformed.
+    """
+    import yaml
+
+    from pluto.ops.bootstrap import REQUIRED_APPLICATIONS
+    from pluto.spec import ClusterSpec, SpecError
+
+    clusters = {name: {} for name in parsed_args.names}
+    if parsed_args.matrix:
+        with open(parsed_args.matrix) as f:
+            matrix = yaml.safe_load(f) or {}
+        if not isinstance(matrix, dict):
+            raise SpecError("Matrix must map cluster names to their settings")
+        for name, settings in matrix.items():
+            if not isinstance(settings or {}, dict):
+                raise SpecError(f"Cluster {name} must map to its settings")
+            if unknown := set(settings or {}) - {"spec", "compute"}:
+                raise SpecError(f"Cluster {name} has unknown keys {sorted(unknown)}")
+            clusters[name] = settings or {}
+
+    specs = {}
+    for name, settings in clusters.items():
+        if path := settings.get("spec", parsed_args.spec):
+            spec = ClusterSpec.from_yaml(path)
+        else:
+            spec = ClusterSpec.default()
+        spec.require(*REQUIRED_APPLICATIONS)
+        if (compute := settings.get("compute", parsed_args.compute)) is not None:
+            spec.scale("compute", int(compute))
+        if c := parsed_args.compute_plane_constraints:
+            spec.constrain("compute", dict(_parse_constraints(c)))
+        if c := parsed_args.control_plane_constraints:
+            spec.constrain("control", dict(_parse_constraints(c)))
+        if parsed_args.placement:
+            spec.place(parsed_args.placement)
+        if parsed_args.package_cache:
+            spec.cache_packages()
+        specs[name] = spec
+    return specs
 
 
 class BootstrapCommand(BaseCommand):
@@ -289,15 +96,44 @@ class BootstrapCommand(BaseCommand):
         A Juju controller needs to be initialized before
         pluto can bootstrap a new HPC cluster or `bootstrap` will fail.
 
+        Several clusters can be bootstrapped at once by passing several names,
+        or a matrix file that maps cluster names to their own `spec` and
+        `compute` settings. They share one controller connection and are
+        bootstrapped concurrently.
+
+        With `--package-cache`, an apt proxy on a control plane node caches
+        the packages that nodes install from the Ubuntu archive, and compute
+        nodes are deployed once it is in place, so that each of those
+        packages is only fetched upstream once. Packages from HTTPS sources,
+        including the Slurm PPA, are not cached. Since compute nodes wait for
+        the cache, it only speeds up bootstraps of large clusters.
+
         The command will return after the relevant HPC nodes have been deployed.
         """
     )
 
     def fill_parser(self, parser: argparse.ArgumentParser) -> None:
         """Define arguments and flags to pass to bootstrap."""
-        parser.add_argument("name", type=str, help="Name for deployed cluster.")
         parser.add_argument(
-            "--compute", type=int, default=1, help="Number of compute nodes to bootstrap."
+            "names", type=str, nargs="*", metavar="name", help="Name for deployed cluster."
+        )
+        parser.add_argument(
+            "--matrix",
+            type=str,
+            required=False,
+            help="YAML file mapping names of clusters to bootstrap to their settings.",
+        )
+        parser.add_argument(
+            "--compute",
+            type=int,
+            required=False,
+            help="Number of compute nodes to bootstrap. Overrides the cluster specification.",
+        )
+        parser.add_argument(
+            "--spec",
+            type=str,
+            required=False,
+            help="YAML file describing cluster topology. Defaults to pluto's micro-HPC cluster.",
         )
         parser.add_argument(
             "--compute-plane-constraints",
@@ -311,21 +147,71 @@ class BootstrapCommand(BaseCommand):
             required=False,
             help="Constraints to pass to control plane nodes.",
         )
+        parser.add_argument(
+            "--placement",
+            type=str,
+            choices=["spread", "dense"],
+            required=False,
+            help="Give every unit a machine, or pack control plane services onto fewer machines.",
+        )
+        parser.add_argument(
+            "--package-cache",
+            action="store_true",
+            help="Cache packages that nodes install from the Ubuntu archive on a control "
+            "plane node. Speeds up bootstraps of about 50 or more compute nodes.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Maximum number of units to operate on at once.",
+        )
+        parser.add_argument(
+            "--offline",
+            action="store_true",
+            help="Only use artifacts already present in pluto's local cache.",
+        )
+        parser.add_argument(
+            "--trace",
+            type=str,
+            required=False,
+            help="Write a Chrome trace-event timing trace of the bootstrap to file.",
+        )
 
     def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
-        """Bootstrap new HPC cluster."""
-        compute_constraints = None
-        control_constraints = None
-        if c := parsed_args.compute_plane_constraints:
-            compute_constraints = dict(_parse_constraints(c))
-        if c := parsed_args.control_plane_constraints:
-            control_constraints = dict(_parse_constraints(c))
-
-        name = parsed_args.name
-        num_compute = parsed_args.compute
-        emit.message(f"Deploying cluster {name}. This will take several minutes...")
+        """Bootstrap new HPC clusters."""
+        import asyncio
+
+        import yaml
+        from craft_cli import ArgumentParsingError
+
+        from pluto.ops.bootstrap import bootstrap
+        from pluto.spec import SpecError
+
+        try:
+            specs = _load_specs(parsed_args)
+        except OSError as e:
+            raise ArgumentParsingError(f"Cannot read {e.filename}: {e.strerror}")
+        except yaml.YAMLError as e:
+            raise ArgumentParsingError(f"Malformed YAML: {e}")
+        except SpecError as e:
+            raise ArgumentParsingError(e.message)
+        except ValueError as e:
+            raise ArgumentParsingError(str(e))
+        if not specs:
+            raise ArgumentParsingError("Provide at least one cluster name or a --matrix file")
+
+        names = ", ".join(specs)
+        emit.message(f"Deploying {names}. This will take several minutes...")
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(
-            _bootstrap(name, num_compute, compute_constraints, control_constraints)
+        failed = loop.run_until_complete(
+            bootstrap(
+                specs,
+                parsed_args.concurrency,
+                parsed_args.offline,
+                parsed_args.trace,
+            )
         )
-        emit.message(f"{name} cluster deployed. Cluster will stabilize soon...")
+        if deployed := [name for name in specs if name not in failed]:
+            emit.message(f"{', '.join(deployed)} deployed. Clusters will stabilize soon...")
+        return 1 if failed else 0
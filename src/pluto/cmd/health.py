@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Check the health of an HPC cluster.
+
+`pluto health ...`
+"""
+
+import argparse
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class HealthCommand(BaseCommand):
+    """Check the health of an HPC cluster."""
+
+    name = "health"
+    help_msg = "Run health checks on the compute nodes of an HPC cluster."
+    overview = textwrap.dedent(
+        """
+        Run the Node Health Check (NHC) attached at bootstrap on every
+        compute node of an HPC cluster at once.
+
+        Unhealthy nodes are reported as soon as their check finishes, and
+        a summary of pass and fail counts and check latency percentiles is
+        shown at the end. Each node has --timeout seconds to finish its
+        check. With --drain, unhealthy nodes are drained in Slurm so that
+        no new jobs are scheduled on them.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to health."""
+        parser.add_argument("name", type=str, help="Name of cluster to check.")
+        parser.add_argument(
+            "--timeout", type=float, default=60, help="Seconds each node may take to check."
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=256,
+            help="Maximum number of nodes to check at once.",
+        )
+        parser.add_argument(
+            "--drain",
+            default=False,
+            action="store_true",
+            help="Drain unhealthy nodes in Slurm.",
+        )
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Check health of HPC cluster."""
+        import asyncio
+
+        from craft_cli import ArgumentParsingError
+
+        from pluto.ops.health import health
+
+        if parsed_args.timeout <= 0:
+            raise ArgumentParsingError("--timeout must be positive")
+
+        loop = asyncio.get_event_loop()
+        report = loop.run_until_complete(
+            health(
+                parsed_args.name,
+                parsed_args.timeout,
+                parsed_args.concurrency,
+                parsed_args.drain,
+            )
+        )
+        return 1 if any(not result.healthy for result in report.results) else 0
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Scale out an HPC cluster.
+
+`pluto scale ...`
+"""
+
+import argparse
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class ScaleCommand(BaseCommand):
+    """Scale out an HPC cluster."""
+
+    name = "scale"
+    help_msg = "Scale out the compute nodes of an HPC cluster."
+    overview = textwrap.dedent(
+        """
+        Scale out the compute nodes of an existing HPC cluster.
+
+        New nodes are requested in batches, one after another, without
+        waiting for earlier batches to come up. Each node is started as soon
+        as it comes up, and the command reports throughput in nodes per minute.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to scale."""
+        parser.add_argument("name", type=str, help="Name of cluster to scale.")
+        parser.add_argument(
+            "application", type=str, choices=["compute"], help="Part of cluster to scale."
+        )
+        parser.add_argument("units", type=int, help="Total number of nodes to scale to.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=10,
+            help="Number of nodes to request from the cloud at once.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Maximum number of nodes to start at once.",
+        )
+        parser.add_argument(
+            "--timeout",
+            type=float,
+            default=1200,
+            help="Seconds to wait for each node to come up.",
+        )
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Scale out HPC cluster."""
+        import asyncio
+
+        from craft_cli import ArgumentParsingError
+
+        from pluto.ops.scale import scale
+
+        if parsed_args.batch_size < 1:
+            raise ArgumentParsingError("--batch-size must be at least 1")
+        if parsed_args.concurrency < 1:
+            raise ArgumentParsingError("--concurrency must be at least 1")
+
+        loop = asyncio.get_event_loop()
+        report = loop.run_until_complete(
+            scale(
+                parsed_args.name,
+                parsed_args.application,
+                parsed_args.units,
+                parsed_args.batch_size,
+                parsed_args.concurrency,
+                parsed_args.timeout,
+            )
+        )
+        return 1 if report.failed else 0
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Show the status of an HPC cluster.
+
+`pluto status ...`
+"""
+
+import argparse
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class StatusCommand(BaseCommand):
+    """Show the status of an HPC cluster."""
+
+    name = "status"
+    help_msg = "Show the status of the applications and units of an HPC cluster."
+    overview = textwrap.dedent(
+        """
+        Show the status of the applications and units of an HPC cluster.
+
+        With --watch, the status is kept up to date as the cluster changes,
+        redrawing only the rows that changed.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to status."""
+        parser.add_argument("name", type=str, help="Name of cluster to show.")
+        parser.add_argument(
+            "--watch",
+            default=False,
+            action="store_true",
+            help="Keep updating the status until interrupted.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds between redraws when watching.",
+        )
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Show status of HPC cluster."""
+        import asyncio
+
+        from pluto.ops.status import status
+
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(status(parsed_args.name, parsed_args.watch, parsed_args.interval))
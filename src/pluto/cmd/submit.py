@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Submit batch jobs to an HPC cluster.
+
+`pluto submit ...`
+"""
+
+import argparse
+import os
+import pathlib
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class SubmitCommand(BaseCommand):
+    """Submit batch jobs to an HPC cluster."""
+
+    name = "submit"
+    help_msg = "Submit batch jobs to an HPC cluster through the Slurm REST API."
+    overview = textwrap.dedent(
+        """
+        Submit a batch script to an HPC cluster through slurmrestd.
+
+        Use --count to submit the script several times, and --param to
+        sweep over parameters. One job is submitted for every combination
+        of parameter values, with the parameters set in its environment.
+        Jobs are sent over a pool of keep-alive connections with several
+        requests in flight per connection, optionally at a limited rate.
+        Throughput and latency percentiles are reported at the end.
+
+        Use --url and --token to submit to another slurmrestd, such as a
+        local stub server, without looking up the cluster.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to submit."""
+        parser.add_argument("name", type=str, help="Name of cluster to submit jobs to.")
+        parser.add_argument("script", type=pathlib.Path, help="Batch script to submit.")
+        parser.add_argument(
+            "--count", type=int, default=1, help="Times to submit each parameter combination."
+        )
+        parser.add_argument(
+            "--param",
+            action="append",
+            default=[],
+            metavar="KEY=VALUE1,VALUE2,...",
+            help="Parameter to sweep over. Can be repeated.",
+        )
+        parser.add_argument("--partition", type=str, help="Partition to submit jobs to.")
+        parser.add_argument("--array", type=str, help="Slurm job array, e.g. 0-99.")
+        parser.add_argument("--workdir", type=str, help="Working directory of the jobs.")
+        parser.add_argument(
+            "--user", type=str, default="researcher", help="User to submit jobs as."
+        )
+        parser.add_argument("--url", type=str, help="URL of slurmrestd.")
+        parser.add_argument(
+            "--token",
+            type=str,
+            default=os.getenv("SLURM_JWT"),
+            help="Slurm JWT of user. Default: $SLURM_JWT, or requested from the cluster.",
+        )
+        parser.add_argument("--rate", type=float, help="Maximum number of jobs per second.")
+        parser.add_argument(
+            "--connections", type=int, default=4, help="Connections to slurmrestd."
+        )
+        parser.add_argument(
+            "--pipeline", type=int, default=8, help="Requests in flight per connection."
+        )
+        parser.add_argument(
+            "--index",
+            type=str,
+            metavar="N-M,...",
+            help="Only submit jobs with these PLUTO_JOB_INDEX values, e.g. to resubmit failures.",
+        )
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Submit batch jobs to HPC cluster."""
+        import asyncio
+
+        from craft_cli import ArgumentParsingError
+
+        from pluto.ops.submit import parse_indexes, parse_params, submit
+
+        if not parsed_args.script.is_file():
+            raise ArgumentParsingError(f"Batch script {parsed_args.script} does not exist")
+        if parsed_args.count < 1:
+            raise ArgumentParsingError("--count must be at least 1")
+        if parsed_args.rate is not None and parsed_args.rate <= 0:
+            raise ArgumentParsingError("--rate must be positive")
+        if parsed_args.connections < 1:
+            raise ArgumentParsingError("--connections must be at least 1")
+        if parsed_args.pipeline < 1:
+            raise ArgumentParsingError("--pipeline must be at least 1")
+        try:
+            parse_params(parsed_args.param)
+            if parsed_args.index:
+                parse_indexes(parsed_args.index)
+        except ValueError as e:
+            raise ArgumentParsingError(str(e))
+
+        loop = asyncio.get_event_loop()
+        failed = loop.run_until_complete(
+            submit(
+                parsed_args.name,
+                parsed_args.script,
+                parsed_args.user,
+                parsed_args.count,
+                parsed_args.param,
+                parsed_args.partition,
+                parsed_args.array,
+                parsed_args.workdir,
+                parsed_args.url,
+                parsed_args.token,
+                parsed_args.rate,
+                parsed_args.connections,
+                parsed_args.pipeline,
+                parsed_args.index,
+            )
+        )
+        return 1 if failed else 0
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Count categories in CSV datasets.
+
+`pluto tally ...`
+"""
+
+import argparse
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class TallyCommand(BaseCommand):
+    """Count categories in CSV datasets."""
+
+    name = "tally"
+    help_msg = "Count categories, such as votes, in CSV datasets of any size."
+    overview = textwrap.dedent(
+        """
+        Count categories, such as votes, in CSV datasets of any size.
+
+        Datasets are memory-mapped and counted in parallel by worker
+        processes. Within a Slurm job array, each task only counts its
+        share of a dataset. Save partial counts with --output, and pass
+        the saved JSON files to tally again to merge them.
+
+        The counting engine is a single file using only the Python standard
+        library, so it can also be copied onto the cluster and run with
+        python3. See demo/tally.submit.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to tally."""
+        from pluto.tally import add_arguments
+
+        add_arguments(parser)
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Count categories in CSV datasets."""
+        from craft_cli import ArgumentParsingError
+
+        from pluto.tally import run
+
+        if parsed_args.shard:
+            index, _, shards = parsed_args.shard.partition("/")
+            if not (index.isdigit() and shards.isdigit() and int(index) < int(shards)):
+                raise ArgumentParsingError(f"Invalid shard {parsed_args.shard}. Expected I/N")
+        return run(parsed_args)
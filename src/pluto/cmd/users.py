@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Manage users of an HPC cluster.
+
+`pluto users ...`
+"""
+
+import argparse
+import pathlib
+import textwrap
+from typing import Optional
+
+from craft_cli import BaseCommand
+
+
+class UsersCommand(BaseCommand):
+    """Manage users of an HPC cluster."""
+
+    name = "users"
+    help_msg = "Import users into an HPC cluster from a CSV file."
+    overview = textwrap.dedent(
+        """
+        Import users into an HPC cluster from a CSV file.
+
+        The CSV file needs a header row with a `name` column. Optional
+        columns are `uid`, `group`, `mail`, `givenname`, `sn`, `shell`,
+        and either `password` or `passsha256`.
+
+        Imported users replace those imported before. The identity
+        configuration is diffed against the last one applied, and only
+        re-attached if it changed. Users keep their uid across imports,
+        and home directories of new users are created on the NFS server
+        in a single batch. Home directories of removed users are kept.
+        """
+    )
+
+    def fill_parser(self, parser: argparse.ArgumentParser) -> None:
+        """Define arguments and flags to pass to users."""
+        parser.add_argument("action", type=str, choices=["import"], help="Action to perform.")
+        parser.add_argument("name", type=str, help="Name of cluster to manage users of.")
+        parser.add_argument("csv", type=pathlib.Path, help="CSV file of users to import.")
+        parser.add_argument(
+            "--dry-run",
+            default=False,
+            action="store_true",
+            help="Only show which users would be added, changed or removed.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=16,
+            help="Maximum number of NFS servers to update at once.",
+        )
+
+    def run(self, parsed_args: argparse.Namespace) -> Optional[int]:
+        """Import users into HPC cluster."""
+        import asyncio
+
+        from craft_cli import ArgumentParsingError
+
+        from pluto.identity import IdentityError
+        from pluto.ops.users import import_users
+
+        if not parsed_args.csv.is_file():
+            raise ArgumentParsingError(f"CSV file {parsed_args.csv} does not exist")
+
+        loop = asyncio.get_event_loop()
+        try:
+            loop.run_until_complete(
+                import_users(
+                    parsed_args.name,
+                    parsed_args.csv,
+                    parsed_args.dry_run,
+                    parsed_args.concurrency,
+                )
+            )
+        except IdentityError as e:
+            raise ArgumentParsingError(e.message)
@@ -1,4 +1,4 @@
 # Copyright 2023 Canonical Ltd.
 # See LICENSE for licensing details.
 
-from .cluster import Cluster
+from .cluster import Cluster, JujuRunner
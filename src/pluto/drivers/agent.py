@@ -0,0 +1,218 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Persistent controller session shared by pluto commands.
+
+`pluto agent` keeps warm connections to the Juju controller and to the
+models of the clusters it has been asked about, and answers requests
+from other pluto commands over a unix socket. Requests and responses
+are single lines of JSON. Commands fall back to connecting to Juju
+directly when no agent is listening.
+
+The agent answers controller requests and status snapshots over its warm
+connections. Commands that change a cluster, such as `pluto bootstrap`,
+still open their own connection to its model, since they act on the
+libjuju objects of the model.
+"""
+
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from juju.controller import Controller
+from juju.model import Model
+
+from pluto.utils.paths import data_dir
+
+# Snapshots of large models are sent as a single line.
+_LINE_LIMIT = 1 << 26
+
+
+def socket_path() -> Path:
+    """Get path of the agent's unix socket.
+
+    Uses `$PLUTO_AGENT_SOCKET` if set, otherwise `agent.sock` in the pluto data directory.
+    """
+    if path := os.getenv("PLUTO_AGENT_SOCKET"):
+        return Path(path)
+    return data_dir() / "agent.sock"
+
+
+def model_snapshot(model: Model) -> Dict[str, Any]:
+    """Get compact snapshot of application and unit state within a model.
+
+    Args:
+        model: Connected model to take snapshot of.
+    """
+    applications = {
+        name: {"charm": app.safe_data.get("charm-url"), "status": app.status, "units": {}}
+        for name, app in model.applications.items()
+    }
+    for name, unit in model.units.items():
+        if unit.application not in applications:
+            continue
+        applications[unit.application]["units"][name] = {
+            "workload": unit.workload_status,
+            "agent": unit.agent_status,
+            "message": unit.workload_status_message,
+            "address": unit.public_address,
+        }
+    return {"applications": applications}
+
+
+class AgentError(Exception):
+    """Raise if pluto agent encounters an error."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+class AgentServer:
+    """Serve requests from pluto commands using warm Juju connections."""
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None) -> None:
+        self.path = Path(path) if path else socket_path()
+        self._controller = Controller()
+        self._models: Dict[str, Model] = {}
+        self._lock = asyncio.Lock()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        """Connect to the controller and start listening on the unix socket."""
+        await self._controller.connect()
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.path.exists():
+            if (other := await AgentClient.open(self.path)) is not None:
+                await other.close()
+                raise AgentError(f"Another pluto agent is listening on {self.path}")
+            self.path.unlink()
+        # Create the socket accessible to its owner only, rather than
+        # restricting it after other users had a chance to connect.
+        umask = os.umask(0o077)
+        try:
+            self._server = await asyncio.start_unix_server(self._handle, path=str(self.path))
+        finally:
+            os.umask(umask)
+
+    async def stop(self) -> None:
+        """Stop listening and close all Juju connections."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.path.exists():
+            self.path.unlink()
+        for model in self._models.values():
+            await model.disconnect()
+        await self._controller.disconnect()
+
+    async def _model(self, name: str) -> Model:
+        """Get warm connection to a model, connecting if necessary."""
+        async with self._lock:
+            if name not in self._models:
+                model = Model()
+                await model.connect(name)
+                self._models[name] = model
+            return self._models[name]
+
+    async def _dispatch(self, request: Dict[str, Any]) -> Any:
+        """Handle a single request."""
+        op = request.get("op")
+        if op == "ping":
+            return "pong"
+        if op == "list-models":
+            return await self._controller.list_models()
+        if op == "ensure-model":
+            name = request["name"]
+            if name in await self._controller.list_models():
+                return {"created": False}
+            if not request.get("create", True):
+                raise AgentError(f"Cluster {name} does not exist")
+            async with self._lock:
+                self._models[name] = await self._controller.add_model(name)
+            return {"created": True}
+        if op == "snapshot":
+            return model_snapshot(await self._model(request["name"]))
+        raise AgentError(f"Unknown request {op}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer requests from one client until it disconnects."""
+        try:
+            while line := await reader.readline():
+                try:
+                    response = {"ok": True, "result": await self._dispatch(json.loads(line))}
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+
+class AgentClient:
+    """Send requests to a running pluto agent."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(
+        cls, path: Optional[Union[str, os.PathLike]] = None, timeout: float = 0.5
+    ) -> Optional["AgentClient"]:
+        """Connect to the agent.
+
+        Args:
+            path: Unix socket of the agent. Default: `socket_path()`.
+            timeout: Seconds to wait for the agent to respond. Default: 0.5.
+
+        Returns:
+            Connected client, or None if no agent is running.
+        """
+        path = Path(path) if path else socket_path()
+        if not path.exists():
+            return None
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(str(path), limit=_LINE_LIMIT), timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return None
+        return cls(reader, writer)
+
+    async def request(self, op: str, **params: Any) -> Any:
+        """Send request to the agent and wait for its result.
+
+        Args:
+            op: Operation to request.
+            **params: Parameters of the operation.
+
+        Raises:
+            AgentError: Raised if the agent failed to handle the request.
+            OSError: Raised if the connection to the agent was lost.
+        """
+        self._writer.write(json.dumps({"op": op, **params}).encode() + b"\n")
+        await self._writer.drain()
+        if not (line := await self._reader.readline()):
+            raise ConnectionResetError("pluto agent closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise AgentError(response.get("error", "pluto agent failed"))
+        return response["result"]
+
+    async def close(self) -> None:
+        """Disconnect from the agent."""
+        self._writer.close()
+        await self._writer.wait_closed()
@@ -4,16 +4,44 @@
 """Juju driver for pluto."""
 
 import asyncio
+import base64
+import codecs
 import contextlib
 import os
-from collections import namedtuple
-from typing import Any, Dict, List, Optional, Union
+import posixpath
+import shlex
+import tempfile
+import time
+from collections import Counter, defaultdict, deque, namedtuple
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
+import yaml
 from juju.application import Application
 from juju.controller import Controller
 from juju.model import Model
 from juju.unit import Unit
 
+from pluto.spec import ClusterSpec, SpecDiff
+from pluto.utils import tracer
+from pluto.utils.payload import MEMBER, pack
+
+from .agent import AgentClient, AgentError
+from .status import StatusTable
+from .watcher import ModelWatcher
+
 
 class ClusterDriverError(Exception):
     """Raise if cluster driver encounters an error."""
@@ -34,44 +62,446 @@ class ClusterDriverError(Exception):
 
 
 Result = namedtuple("Result", ["exit_code", "stdout", "stderr"])
+UnitResult = namedtuple("UnitResult", ["unit", "result", "error"])
+CommandResult = namedtuple("CommandResult", ["command", "exit_code", "output"])
+
+# Marks the line that reports the exit code and output of a command in a batch.
+BATCH_MARKER = "pluto-batch"
+
+
+class CommandBatch:
+    """Commands to run on a unit one after another over a single SSH session.
+
+    Queued commands are sent as one remote script that stops at the first
+    command that fails. The script reports the exit code and base64-encoded
+    output of each command that ran, and always exits 0 itself, so that a
+    failing command does not lose the output of the others.
+    """
+
+    def __init__(self, commands: Iterable[str] = ()) -> None:
+        self.commands: List[str] = list(commands)
+
+    def add(self, command: str) -> "CommandBatch":
+        """Queue command to run after the commands already queued."""
+        self.commands.append(command)
+        return self
+
+    def script(self) -> str:
+        """Get shell script that runs the queued commands."""
+        lines = ["out=$(mktemp)", """trap 'rm -f "$out"' EXIT"""]
+        for i, command in enumerate(self.commands):
+            lines += [
+                f'sh -c {shlex.quote(command)} </dev/null >"$out" 2>&1; code=$?',
+                f'printf "{BATCH_MARKER} {i} %d " "$code"; base64 -w0 "$out"; echo',
+                '[ "$code" -eq 0 ] || exit 0',
+            ]
+        return "\n".join(lines)
+
+    def parse(self, output: str) -> List[CommandResult]:
+        """Get exit code and output of each command that ran from the output of the script."""
+        results = []
+        for line in output.splitlines():
+            fields = line.split()
+            if len(fields) < 3 or fields[0] != BATCH_MARKER:
+                continue
+            data = base64.b64decode(fields[3]) if len(fields) > 3 else b""
+            results.append(
+                CommandResult(
+                    self.commands[int(fields[1])],
+                    int(fields[2]),
+                    data.decode(errors="replace"),
+                )
+            )
+        return results
+
+    async def run(self, unit: Unit, check: bool = True) -> List[CommandResult]:
+        """Run queued commands on a unit.
+
+        Args:
+            unit: Unit to run commands on.
+            check: Raise if a command failed. Default: True.
+
+        Returns:
+            Exit code and output of each command that ran, in order.
+
+        Raises:
+            ClusterDriverError: Raised if a command failed and `check` is set.
+        """
+        with tracer.span("ssh", cat="unit", unit=unit.name, command="batch", commands=len(self)):
+            results = self.parse(await unit.ssh(f"sh -c {shlex.quote(self.script())}"))
+        if check and (failed := [r for r in results if r.exit_code != 0]):
+            raise ClusterDriverError(
+                f"Command {failed[0].command!r} exited with {failed[0].exit_code} "
+                f"on {unit.name}: {failed[0].output.strip()}"
+            )
+        if check and len(results) < len(self.commands):
+            raise ClusterDriverError(f"Batch of commands did not finish on {unit.name}")
+        return results
+
+    def __len__(self) -> int:
+        """Get number of queued commands."""
+        return len(self.commands)
+
+
+class CommandStats:
+    """Latency and exit code statistics for a Juju subcommand."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.exit_codes = Counter()
+
+    @property
+    def mean(self) -> float:
+        """Get mean latency of the subcommand in seconds."""
+        return self.total / self.calls if self.calls else 0.0
+
+    def record(self, latency: float, exit_code: int) -> None:
+        """Record the outcome of one invocation.
+
+        Args:
+            latency: How long the invocation took in seconds.
+            exit_code: Exit code of the invocation.
+        """
+        self.calls += 1
+        self.total += latency
+        self.slowest = max(self.slowest, latency)
+        self.exit_codes[exit_code] += 1
+
+
+_CHUNK_SIZE = 1 << 16
+
+
+async def _read_lines(reader: asyncio.StreamReader) -> AsyncIterator[str]:
+    """Decode a stream in chunks and yield it line by line, without line endings.
+
+    Unlike `StreamReader.readline`, lines of any length are supported,
+    such as the single line of `juju status --format=json`.
+    """
+    decoder = codecs.getincrementaldecoder("utf8")(errors="replace")
+    partial: List[str] = []
+    while True:
+        chunk = await reader.read(_CHUNK_SIZE)
+        text = decoder.decode(chunk, final=not chunk)
+        *lines, rest = text.split("\n")
+        if lines:
+            lines[0] = "".join(partial) + lines[0]
+            partial = []
+            for line in lines:
+                yield line
+        if rest:
+            partial.append(rest)
+        if not chunk:
+            break
+    if partial:
+        yield "".join(partial)
+
+
+class JujuStream:
+    """Output of a running Juju command, delivered line by line.
+
+    Iterate over the stream to receive lines of stdout as they arrive.
+    Only the last lines of stderr are kept. Leaving the stream's context
+    before the command has finished kills the command.
+    """
+
+    def __init__(
+        self,
+        runner: "JujuRunner",
+        cmd: Sequence[str],
+        cwd: Optional[Union[str, os.PathLike]],
+        forward: Optional[Callable[[str], Any]],
+        tail: int,
+        check: bool,
+    ) -> None:
+        self._runner = runner
+        self._cmd = [str(c) for c in cmd]
+        self._cwd = cwd
+        self._forward = forward
+        self._check = check
+        self._proc = None
+        self._stderr_task: Optional[asyncio.Future] = None
+        self._start = 0.0
+        self.exit_code: Optional[int] = None
+        self.stderr_tail: Deque[str] = deque(maxlen=tail)
+
+    async def __aenter__(self) -> "JujuStream":
+        """Start the command."""
+        await self._spawn()
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        """Kill the command if it is still running."""
+        await self.aclose()
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        """Iterate over lines of stdout."""
+        return self._stdout()
 
+    async def _spawn(self) -> None:
+        """Start the command if not already started."""
+        if self._proc is None:
+            self._start = time.monotonic()
+            self._proc = await self._runner._spawn(self._cmd, self._cwd)
+            self._stderr_task = asyncio.ensure_future(self._drain_stderr())
 
-async def _juju(
-    *cmd: str, cwd: Optional[Union[str, os.PathLike]] = None, check: bool = False
-) -> Result:
-    """Asynchronously execute a Juju command.
+    async def _drain_stderr(self) -> None:
+        """Keep the tail of stderr, forwarding each line."""
+        async for line in _read_lines(self._proc.stderr):
+            self.stderr_tail.append(line)
+            if self._forward is not None:
+                self._forward(line)
 
-    Args:
-        *cmd: Juju command to execute.
-        cwd: Directory to execute Juju command from. Default: None.
-        check: Check if Juju command succeeded. Default: False.
+    async def _stdout(self) -> AsyncIterator[str]:
+        """Yield lines of stdout, then wait for the command to exit."""
+        await self._spawn()
+        async for line in _read_lines(self._proc.stdout):
+            if self._forward is not None:
+                self._forward(line)
+            yield line
+
+        await self._stderr_task
+        self.exit_code = await self._proc.wait()
+        self._record()
+        if self._check and self.exit_code != 0:
+            raise ClusterDriverError(
+                f"Juju command {self._cmd} failed. Reason:\n" + "\n".join(self.stderr_tail)
+            )
+
+    def _record(self) -> None:
+        """Record the outcome of the command in the runner's statistics."""
+        subcommand = self._cmd[0] if self._cmd else ""
+        self._runner.stats[subcommand].record(time.monotonic() - self._start, self.exit_code)
+
+    async def aclose(self) -> None:
+        """Kill the command if it is still running."""
+        if self._stderr_task is not None and not self._stderr_task.done():
+            self._stderr_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._stderr_task
+        if self._proc is not None and self.exit_code is None:
+            if self._proc.returncode is None:
+                self._proc.kill()
+            self.exit_code = await self._proc.wait()
+            self._record()
+
+
+class JujuRunner:
+    """Run Juju CLI commands concurrently and keep statistics about them."""
+
+    def __init__(self, concurrency: int = 8, binary: str = "juju") -> None:
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._binary = binary
+        self.stats: Dict[str, CommandStats] = defaultdict(CommandStats)
+        # Wall-clock time of parallel batches versus the sum of their latencies.
+        self.parallel_time = 0.0
+        self.serial_time = 0.0
+
+    async def run(
+        self, *cmd: str, cwd: Optional[Union[str, os.PathLike]] = None, check: bool = False
+    ) -> Result:
+        """Asynchronously execute a Juju command.
+
+        Args:
+            *cmd: Juju command to execute.
+            cwd: Directory to execute Juju command from. Default: None.
+            check: Check if Juju command succeeded. Default: False.
+        """
+        result, _ = await self._timed(cmd, cwd)
+        if check:
+            self._check(cmd, result)
+        return result
+
+    async def _timed(
+        self, cmd: Sequence[str], cwd: Optional[Union[str, os.PathLike]]
+    ) -> Tuple[Result, float]:
+        """Execute a Juju command within the concurrency limit, and get how long it ran.
+
+        Time spent waiting for the concurrency limit is not counted.
+        """
+        subcommand = str(cmd[0]) if cmd else ""
+        async with self._semaphore:
+            with tracer.span(f"juju {subcommand}", cat="juju"):
+                start = time.monotonic()
+                result = await self._exec([str(c) for c in cmd], cwd)
+                latency = time.monotonic() - start
+                self.stats[subcommand].record(latency, result.exit_code)
+        return result, latency
+
+    @staticmethod
+    def _check(cmd: Sequence[str], result: Result) -> None:
+        """Raise if a Juju command failed."""
+        if result.exit_code != 0:
+            raise ClusterDriverError(
+                f"Juju command {list(cmd)} failed. Reason:\n{(result.stderr or result.stdout)}"
+            )
+
+    async def _spawn(
+        self, args: List[str], cwd: Optional[Union[str, os.PathLike]]
+    ) -> asyncio.subprocess.Process:
+        """Start the Juju binary with arguments, piping its output."""
+        return await asyncio.create_subprocess_exec(
+            self._binary,
+            *args,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=str(cwd or "."),
+        )
+
+    async def _exec(self, args: List[str], cwd: Optional[Union[str, os.PathLike]]) -> Result:
+        """Execute the Juju binary with arguments and capture its output."""
+        proc = await self._spawn(args, cwd)
+        stdout, stderr = await proc.communicate()
+        return Result(proc.returncode, stdout.decode("utf8"), stderr.decode("utf8"))
+
+    def stream(
+        self,
+        *cmd: str,
+        cwd: Optional[Union[str, os.PathLike]] = None,
+        forward: Optional[Callable[[str], Any]] = None,
+        tail: int = 50,
+        check: bool = False,
+    ) -> JujuStream:
+        """Execute a Juju command, streaming its output instead of buffering it.
+
+        Use for commands with large or long-running output, such as `juju status`
+        on large models or `juju debug-log`. Streams do not count against the
+        runner's concurrency limit, as they may run indefinitely.
+
+        ```python
+        async with runner.stream("debug-log", "-m", name, forward=emit.progress) as lines:
+            async for line in lines:
+                ...
+        ```
+
+        Args:
+            *cmd: Juju command to execute.
+            cwd: Directory to execute Juju command from. Default: None.
+            forward: Callback invoked with every line of stdout and stderr. Default: None.
+            tail: Number of trailing stderr lines to keep. Default: 50.
+            check:
+                Raise once the command has finished if it failed. Default: False.
+        """
+        return JujuStream(self, cmd, cwd, forward, tail, check)
+
+    async def run_all(self, *cmds: Sequence[str], check: bool = False) -> List[Result]:
+        """Execute independent Juju commands in parallel.
+
+        Args:
+            *cmds: Juju commands to execute.
+            check: Check if every Juju command succeeded, once all have finished. Default: False.
+        """
+        start = time.monotonic()
+        timed = await asyncio.gather(*(self._timed(cmd, None) for cmd in cmds))
+        self.parallel_time += time.monotonic() - start
+        self.serial_time += sum(latency for _, latency in timed)
+        results = [result for result, _ in timed]
+        if check:
+            for cmd, result in zip(cmds, results):
+                self._check(cmd, result)
+        return results
+
+    @property
+    def speedup(self) -> float:
+        """Get how much faster parallel batches ran than if run one after another."""
+        return self.serial_time / self.parallel_time if self.parallel_time else 1.0
+
+    def report(self) -> List[str]:
+        """Summarize command statistics as printable lines."""
+        lines = []
+        for name, stats in sorted(self.stats.items(), key=lambda i: -i[1].total):
+            codes = ", ".join(f"{code}x{n}" for code, n in sorted(stats.exit_codes.items()))
+            lines.append(
+                f"juju {name:<20} calls={stats.calls} mean={stats.mean:.2f}s "
+                f"max={stats.slowest:.2f}s exit={codes}"
+            )
+        if self.parallel_time:
+            lines.append(
+                f"Parallel juju batches took {self.parallel_time:.2f}s versus "
+                f"{self.serial_time:.2f}s serially ({self.speedup:.1f}x faster)"
+            )
+        return lines
+
+
+def _config_str(value: Any) -> Optional[str]:
+    """Render a live config value the way cluster specifications write it."""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return str(value).lower()
+    return str(value)
+
+
+def _digest_script(dest: str, directory: bool) -> str:
+    """Get shell script that prints the content digest of a file or directory tree.
+
+    Prints nothing if there is nothing at the destination.
     """
-    proc = await asyncio.create_subprocess_exec(
-        *(["juju"] + [str(c) for c in cmd]),
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-        cwd=str(cwd or "."),
-    )
-    _stdout, _stderr = await proc.communicate()
-    stdout, stderr = _stdout.decode("utf8"), _stderr.decode("utf8")
-    if check and proc.returncode != 0:
-        raise ClusterDriverError(f"Juju command {list(cmd)} failed. Reason:\n{(stderr or stdout)}")
+    if directory:
+        return (
+            f"cd {shlex.quote(dest)} 2>/dev/null && find . -type f -print0 "
+            "| LC_ALL=C sort -z | xargs -0r sha256sum | sha256sum | cut -d' ' -f1 || true"
+        )
+    return f"sha256sum {shlex.quote(dest)} 2>/dev/null | cut -d' ' -f1"
 
-    return Result(proc.returncode, stdout, stderr)
+
+def _install_script(
+    dest: str, directory: bool, owner: Optional[str], on_change: Optional[str]
+) -> str:
+    """Get shell script that installs the payload passed as its first argument.
+
+    The payload is unpacked next to the destination, so that it replaces what
+    is there with a rename. A file is replaced atomically. A directory tree is
+    moved aside just before its replacement is moved into place.
+    """
+    target, parent = shlex.quote(dest), shlex.quote(posixpath.dirname(dest) or "/")
+    lines = [
+        "set -e",
+        f"mkdir -p {parent}",
+        f"stage=$(mktemp -d {parent}/.pluto-push.XXXXXX)",
+        """trap 'rm -rf "$stage" "$1"' EXIT""",
+        'tar -xzmf "$1" -C "$stage" --no-same-owner',
+    ]
+    if owner:
+        lines.append(f'chown -R {shlex.quote(owner)} "$stage/{MEMBER}"')
+    if directory:
+        lines.append(f'if [ -e {target} ]; then mv -T {target} "$stage/old"; fi')
+    lines.append(f'mv -fT "$stage/{MEMBER}" {target}')
+    if on_change:
+        lines.append(on_change)
+    return "\n".join(lines)
 
 
 class Cluster:
-    """Control an HPC cluster using Juju from pluto."""
+    """Control an HPC cluster using Juju from pluto.
 
-    def __init__(self, cluster: str) -> None:
-        self._name = cluster
-        self._controller = Controller()
-        self._model = Model()
+    The controller, model and Juju runner can be swapped out, for example
+    for the simulated ones in `benchmarks/sim.py`. A controller, Juju runner
+    and `limit` semaphore can also be shared between clusters, in which case
+    the controller is left connected when the cluster is closed.
+    """
 
-        # Alias Model methods to Cluster object.
-        self.deploy = self._model.deploy
-        self.integrate = self._model.integrate
-        self.wait = self._model.wait_for_idle
+    def __init__(
+        self,
+        cluster: str,
+        create: bool = True,
+        controller: Optional[Controller] = None,
+        model: Optional[Model] = None,
+        juju: Optional[JujuRunner] = None,
+        limit: Optional[asyncio.Semaphore] = None,
+    ) -> None:
+        self._name = cluster
+        self._create = create
+        self.created = False
+        # An explicitly provided controller, such as a shared or simulated one,
+        # belongs to the caller and bypasses the agent.
+        self._owns_controller = controller is None
+        self._controller = controller or Controller()
+        self._model = model or Model()
+        self.juju = juju or JujuRunner()
+        self._limit = limit
+        self._watcher = ModelWatcher(self._model)
 
     async def __aenter__(self) -> "Cluster":
         """Get instance of Cluster for controlling Juju."""
@@ -83,44 +513,141 @@ class Cluster:
         await self.close()
 
     async def connect(self) -> None:
-        """Connect to HPC cluster."""
-        await self._controller.connect()
+        """Connect to HPC cluster.
+
+        If a pluto agent is running, it checks for and creates the cluster's
+        model over its warm controller connection. Otherwise, or if the agent
+        cannot be reached, pluto connects to the controller directly. Either
+        way, pluto then connects to the model itself.
+        """
+        if self._owns_controller:
+            result = await self._ask_agent("ensure-model", name=self.name, create=self._create)
+            if result is not None:
+                self.created = result["created"]
+                await self._model.connect(self.name)
+                return
+
+        if not self._controller.is_connected():
+            await self._controller.connect()
         if not await self.exists():
+            if not self._create:
+                if self._owns_controller:
+                    await self._controller.disconnect()
+                raise ClusterDriverError(f"Cluster {self.name} does not exist")
             await self._controller.add_model(self.name)
+            self.created = True
         await self._model.connect(self.name)
 
+    async def _ask_agent(self, op: str, **params: Any) -> Optional[Any]:
+        """Send request to the pluto agent, if one is running.
+
+        Returns:
+            Result of the request, or None if no agent could be reached.
+
+        Raises:
+            ClusterDriverError: Raised if the agent failed to handle the request.
+        """
+        if (agent := await AgentClient.open()) is None:
+            return None
+        try:
+            return await agent.request(op, **params)
+        except AgentError as e:
+            raise ClusterDriverError(e.message)
+        except (OSError, ValueError):
+            # A stale socket, or an agent that went away mid-request.
+            return None
+        finally:
+            with contextlib.suppress(OSError):
+                await agent.close()
+
     async def close(self) -> None:
         """Close connection to HPC cluster."""
         await self._model.disconnect()
-        await self._controller.disconnect()
+        if self._owns_controller and self._controller.is_connected():
+            await self._controller.disconnect()
+
+    async def set_model_config(self, config: Dict[str, Any]) -> None:
+        """Set config of the cluster's model.
+
+        Args:
+            config: Model config to set, such as "apt-http-proxy".
+        """
+        with tracer.span("model-config", cat="model", keys=",".join(sorted(config))):
+            await self._model.set_config(config)
+
+    async def deploy(self, entity_url: str, **kwargs: Any) -> Application:
+        """Deploy charm to the cluster.
+
+        Args:
+            entity_url: Charm to deploy.
+            **kwargs: Arguments to pass to `juju.model.Model.deploy`.
+        """
+        with tracer.span("deploy", cat="model", app=kwargs.get("application_name", entity_url)):
+            return await self._model.deploy(entity_url, **kwargs)
 
-    @contextlib.asynccontextmanager
-    async def quick_fire(self, interval: str = "10s") -> None:
-        """Increase the rate of fire for update-status events.
+    async def deploy_bundle(
+        self, bundle: Dict[str, Any], forward: Optional[Callable[[str], Any]] = None
+    ) -> None:
+        """Deploy a bundle to the cluster with a single `juju deploy`.
 
         Args:
-            interval: Interval to set update-status firing rate.
+            bundle: Bundle to deploy.
+            forward: Callback invoked with each line of progress from Juju. Default: None.
         """
-        if not self.connected():
-            raise ClusterDriverError(f"Connection to {self.name} not established")
+        with tempfile.NamedTemporaryFile("w", suffix=".yaml") as f:
+            yaml.safe_dump(bundle, f)
+            f.flush()
+            with tracer.span("deploy-bundle", cat="model", apps=len(bundle["applications"])):
+                async with self.juju.stream(
+                    "deploy", "-m", self.name, f.name, forward=forward, check=True
+                ) as lines:
+                    async for _ in lines:
+                        pass
 
-        old_interval = (await self._model.get_config())["update-status-hook-interval"]
-        await self._model.set_config({"update-status-hook-interval": interval})
-        yield
-        await self._model.set_config({"update-status-hook-interval": old_interval})
+    async def integrate(self, relation1: str, relation2: str) -> Any:
+        """Integrate two applications within the cluster.
+
+        Args:
+            relation1: First endpoint of the integration.
+            relation2: Second endpoint of the integration.
+        """
+        with tracer.span("integrate", cat="model", relation=f"{relation1} {relation2}"):
+            return await self._model.integrate(relation1, relation2)
+
+    async def wait(self, **kwargs: Any) -> None:
+        """Wait for cluster to become idle by polling.
+
+        Args:
+            **kwargs: Arguments to pass to `juju.model.Model.wait_for_idle`.
+        """
+        with tracer.span("wait", cat="model", apps=kwargs.get("apps")):
+            await self._model.wait_for_idle(**kwargs)
 
     @property
     def name(self) -> str:
         """Get name of HPC cluster."""
         return self._name
 
+    @property
+    def cloud(self) -> str:
+        """Get name of the cloud that the HPC cluster runs on, once connected."""
+        info = self._model.info
+        if info is None:
+            return "unknown"
+        cloud = info.cloud_tag[len("cloud-") :]
+        return f"{cloud}/{info.cloud_region}" if info.cloud_region else cloud
+
     def connected(self) -> bool:
         """Determine if pluto is connected to the HPC cluster."""
-        return True if self._model.is_connected() and self._controller.is_connected() else False
+        return self._model.is_connected()
 
     async def exists(self) -> bool:
         """Determine if cluster exists or not."""
-        models = await self._controller.list_models()
+        models = None
+        if self._owns_controller and not self._controller.is_connected():
+            models = await self._ask_agent("list-models")
+        if models is None:
+            models = await self._controller.list_models()
         return True if self.name in models else False
 
     def units(self, application_name: Optional[str]) -> List[Unit]:
@@ -135,6 +662,137 @@ class Cluster:
             return self._model.applications[application_name].units
         return list(self._model.units.values())
 
+    async def wait_for(
+        self,
+        apps: List[str],
+        status: str = "active",
+        agent_status: str = "idle",
+        timeout: Optional[float] = None,
+        raise_on_error: bool = True,
+    ) -> None:
+        """Wait until every unit of the given applications reaches a status.
+
+        Unlike `wait`, this resolves as soon as a model delta satisfies the
+        target status instead of polling, and does not rely on update-status.
+
+        Args:
+            apps: Applications to wait on.
+            status: Workload status units must reach. Default: "active".
+            agent_status: Agent status units must reach. Default: "idle".
+            timeout: Seconds to wait before giving up. Default: None.
+            raise_on_error: Raise if a unit enters error status. Default: True.
+        """
+
+        def _ready() -> bool:
+            for name in apps:
+                app = self._model.applications.get(name)
+                if app is None or not (units := app.units):
+                    return False
+                for unit in units:
+                    if raise_on_error and unit.workload_status == "error":
+                        raise ClusterDriverError(
+                            f"Unit {unit.name} is in error state: {unit.workload_status_message}"
+                        )
+                    if unit.workload_status != status or unit.agent_status != agent_status:
+                        return False
+            return True
+
+        try:
+            with tracer.span("wait", cat="model", apps=apps):
+                await self._watcher.wait(_ready, timeout)
+        except asyncio.TimeoutError:
+            raise ClusterDriverError(
+                f"Timed out after {timeout}s waiting for {apps} to reach {status}/{agent_status}"
+            )
+
+    async def wait_for_unit(
+        self,
+        unit_name: str,
+        status: Optional[str] = None,
+        agent_status: str = "idle",
+        timeout: Optional[float] = None,
+    ) -> Unit:
+        """Wait until a unit reaches a status.
+
+        Args:
+            unit_name: Name of unit to wait on.
+            status:
+                Workload status unit must reach. If omitted, wait until the unit
+                has settled into any status other than maintenance or unknown.
+            agent_status: Agent status unit must reach. Default: "idle".
+            timeout: Seconds to wait before giving up. Default: None.
+
+        Raises:
+            ClusterDriverError: Raised if unit enters error status or timeout expires.
+        """
+
+        def _ready() -> bool:
+            unit = self._model.units.get(unit_name)
+            if unit is None:
+                return False
+            if unit.workload_status == "error":
+                raise ClusterDriverError(
+                    f"Unit {unit_name} is in error state: {unit.workload_status_message}"
+                )
+            if status is None:
+                settled = unit.workload_status not in ("maintenance", "unknown")
+            else:
+                settled = unit.workload_status == status
+            return settled and unit.agent_status == agent_status
+
+        try:
+            with tracer.span("wait", cat="unit", unit=unit_name):
+                await self._watcher.wait(_ready, timeout)
+        except asyncio.TimeoutError:
+            raise ClusterDriverError(f"Timed out after {timeout}s waiting for {unit_name}")
+        return self._model.units[unit_name]
+
+    async def diff(self, spec: ClusterSpec) -> SpecDiff:
+        """Compare cluster specification with the live model.
+
+        Args:
+            spec: Desired topology of the cluster.
+
+        Returns:
+            Applications, units, relations and config missing from the live model.
+        """
+        live = self._model.applications
+        missing_apps = [name for name in spec.applications if name not in live]
+        missing_units = {
+            name: app.units - len(live[name].units)
+            for name, app in spec.applications.items()
+            if name in live and app.units > len(live[name].units)
+        }
+
+        related = {
+            frozenset(f"{e.application_name}:{e.name}" for e in relation.endpoints)
+            for relation in self._model.relations
+        }
+        missing_relations = [r for r in spec.relations if frozenset(r) not in related]
+
+        config_changes = {}
+        for name, app in spec.applications.items():
+            if name not in live or not app.config:
+                continue
+            current = await live[name].get_config()
+            changes = {
+                k: v
+                for k, v in app.config.items()
+                if _config_str(current.get(k, {}).get("value")) != v
+            }
+            if changes:
+                config_changes[name] = changes
+
+        return SpecDiff(missing_apps, missing_units, missing_relations, config_changes)
+
+    def status_table(self) -> StatusTable:
+        """Get table of unit states that is kept up to date from model deltas."""
+        table = StatusTable()
+        for unit in self._model.units.values():
+            table.apply("unit", "add", unit.safe_data)
+        self._watcher.listen(lambda delta: table.apply(delta.entity, delta.type, delta.data))
+        return table
+
     def get_app(self, application_name: str) -> Application:
         """Get application with cluster model.
 
@@ -152,5 +810,239 @@ class Cluster:
             application_name: Application to upload resource to.
             resources: Resources to attach to application.
         """
-        for k, v in resources.items():
-            await _juju("attach-resource", application_name, f"{k}={v}")
+        await self.juju.run_all(
+            *(
+                ("attach-resource", "-m", self.name, application_name, f"{k}={v}")
+                for k, v in resources.items()
+            ),
+            check=True,
+        )
+
+    async def _call(
+        self, unit: Unit, func: Callable[[Unit], Awaitable[Any]], semaphore: asyncio.Semaphore
+    ) -> UnitResult:
+        """Run a coroutine function against a unit within the concurrency limits."""
+
+        async def _call() -> UnitResult:
+            try:
+                return UnitResult(unit, await func(unit), None)
+            except Exception as e:
+                return UnitResult(unit, None, e)
+
+        async with semaphore:
+            if self._limit is None:
+                return await _call()
+            async with self._limit:
+                return await _call()
+
+    async def fan_out_as_completed(
+        self,
+        application_name: str,
+        func: Callable[[Unit], Awaitable[Any]],
+        concurrency: int = 16,
+    ) -> AsyncIterator[UnitResult]:
+        """Run a coroutine function against every unit of an application.
+
+        Unlike `fan_out`, results are yielded as soon as each unit finishes,
+        rather than once the slowest unit has. Operations still running when
+        iteration stops early are cancelled.
+
+        Args:
+            application_name: Application whose units to operate on.
+            func: Coroutine function called with each unit.
+            concurrency: Maximum number of units operated on at once. Default: 16.
+
+        Yields:
+            Result or error of operation for each unit, in order of completion.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [
+            asyncio.ensure_future(self._call(unit, func, semaphore))
+            for unit in self.units(application_name)
+        ]
+        try:
+            for done in asyncio.as_completed(tasks):
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def fan_out(
+        self,
+        application_name: str,
+        func: Callable[[Unit], Awaitable[Any]],
+        concurrency: int = 16,
+        batch_size: Optional[int] = None,
+        check: bool = False,
+    ) -> List[UnitResult]:
+        """Run a coroutine function against every unit of an application.
+
+        Args:
+            application_name: Application whose units to operate on.
+            func: Coroutine function called with each unit.
+            concurrency: Maximum number of units operated on at once. Default: 16.
+            batch_size:
+                Number of units to operate on before starting the next batch.
+                If omitted, all units are part of the same batch.
+            check: Raise if operation failed on any unit. Default: False.
+
+        Returns:
+            Result or error of operation for each unit, in unit order.
+        """
+        units = list(self.units(application_name))
+        batch_size = batch_size or len(units) or 1
+        semaphore = asyncio.Semaphore(concurrency)
+
+        results = []
+        for i in range(0, len(units), batch_size):
+            results.extend(
+                await asyncio.gather(
+                    *(self._call(unit, func, semaphore) for unit in units[i : i + batch_size])
+                )
+            )
+
+        if check and (failed := [r for r in results if r.error is not None]):
+            reasons = "\n".join(f"{r.unit.name}: {r.error}" for r in failed)
+            raise ClusterDriverError(
+                f"Operation failed on {len(failed)} of {len(results)} units "
+                f"of {application_name}. Reason:\n{reasons}"
+            )
+
+        return results
+
+    async def run_action_on(
+        self,
+        application_name: str,
+        action_name: str,
+        concurrency: int = 16,
+        batch_size: Optional[int] = None,
+        check: bool = False,
+        **params: Any,
+    ) -> List[UnitResult]:
+        """Run action on every unit of an application and wait for it to complete.
+
+        Args:
+            application_name: Application whose units to run action on.
+            action_name: Name of action to run.
+            concurrency: Maximum number of actions in flight at once. Default: 16.
+            batch_size: Number of units to run action on before starting the next batch.
+            check: Raise if action failed on any unit. Default: False.
+            **params: Parameters to pass to action.
+        """
+
+        async def _action(unit: Unit) -> Any:
+            with tracer.span("action", cat="unit", unit=unit.name, action=action_name):
+                action = await (await unit.run_action(action_name, **params)).wait()
+            if action.status != "completed":
+                raise ClusterDriverError(
+                    f"Action {action_name} {action.status} on {unit.name}: {action.results}"
+                )
+            return action
+
+        return await self.fan_out(application_name, _action, concurrency, batch_size, check)
+
+    async def ssh_on(
+        self,
+        application_name: str,
+        command: str,
+        concurrency: int = 16,
+        batch_size: Optional[int] = None,
+        check: bool = False,
+    ) -> List[UnitResult]:
+        """Execute command over SSH on every unit of an application.
+
+        Args:
+            application_name: Application whose units to execute command on.
+            command: Command to execute.
+            concurrency: Maximum number of SSH sessions open at once. Default: 16.
+            batch_size: Number of units to execute command on before starting the next batch.
+            check: Raise if command failed on any unit. Default: False.
+        """
+
+        async def _ssh(unit: Unit) -> str:
+            with tracer.span("ssh", cat="unit", unit=unit.name, command=command):
+                return await unit.ssh(command)
+
+        return await self.fan_out(application_name, _ssh, concurrency, batch_size, check)
+
+    async def batch_on(
+        self,
+        application_name: str,
+        batch: CommandBatch,
+        concurrency: int = 16,
+        check: bool = False,
+    ) -> List[UnitResult]:
+        """Run a batch of commands over a single SSH session on every unit of an application.
+
+        Args:
+            application_name: Application whose units to run commands on.
+            batch: Commands to run, one after another, stopping at the first that fails.
+            concurrency: Maximum number of SSH sessions open at once. Default: 16.
+            check: Raise if a command failed on any unit. Default: False.
+
+        Returns:
+            Exit code and output of each command that ran, or the error, for each unit.
+        """
+
+        async def _run(unit: Unit) -> List[CommandResult]:
+            return await batch.run(unit, check=check)
+
+        return await self.fan_out(application_name, _run, concurrency, check=check)
+
+    async def push(
+        self,
+        application_name: str,
+        source: Union[str, os.PathLike, bytes],
+        dest: str,
+        owner: Optional[str] = None,
+        on_change: Optional[str] = None,
+        concurrency: int = 16,
+        check: bool = True,
+        prepare: Iterable[str] = (),
+    ) -> List[UnitResult]:
+        """Copy a file or directory tree to every unit of an application.
+
+        The source is packed once into a compressed tarball. Units whose copy
+        already has the same content are skipped after a single round trip
+        that hashes it. Others receive the tarball, unpack it next to the
+        destination and move it into place.
+
+        Args:
+            application_name: Application whose units to copy to.
+            source: Content of a file, or path to a local file or directory.
+            dest: Absolute path to install the file or directory at on each unit.
+            owner: Owner to give installed files, e.g. "root:root". Default: None, root.
+            on_change: Command to run as root on units where the content changed,
+                such as one that reloads a service. Default: None.
+            concurrency: Maximum number of units copied to at once. Default: 16.
+            check: Raise if copying failed on any unit. Default: True.
+            prepare: Commands to run on each unit first, such as one that installs
+                the service the content is for. They share an SSH session with
+                the content check. Default: none.
+
+        Returns:
+            Whether the content changed, or the error, for each unit.
+        """
+        payload = pack(source)
+        batch = CommandBatch(prepare)
+        batch.add(f"sudo sh -c {shlex.quote(_digest_script(dest, payload.directory))}")
+        install = (
+            f"sudo sh -c {shlex.quote(_install_script(dest, payload.directory, owner, on_change))}"
+        )
+        remote = f".pluto-push-{payload.digest[:16]}.tar.gz"
+
+        with tempfile.NamedTemporaryFile(suffix=".tar.gz") as f:
+            f.write(payload.data)
+            f.flush()
+
+            async def _push(unit: Unit) -> bool:
+                results = await batch.run(unit)
+                if results[-1].output.strip() == payload.digest:
+                    return False
+                with tracer.span("scp", cat="unit", unit=unit.name, dest=remote):
+                    await unit.scp_to(f.name, remote)
+                with tracer.span("ssh", cat="unit", unit=unit.name, command="install " + dest):
+                    await unit.ssh(f'{install} sh "$HOME/{remote}"')
+                return True
+
+            return await self.fan_out(application_name, _push, concurrency, check=check)
@@ -0,0 +1,124 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Slurm REST API driver for pluto."""
+
+import json
+from typing import Any, Dict, Optional
+
+from pluto.utils.http import HTTPError, HTTPPool
+
+# Port slurmrestd listens on when deployed by the slurm-restapi charm.
+SLURMRESTD_PORT = 6820
+API_VERSION = "v0.0.39"
+
+
+class SlurmRestError(Exception):
+    """Raise if the Slurm REST API rejects a request."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+def _errors(payload: Dict[str, Any]) -> str:
+    """Get error messages reported in a response of slurmrestd."""
+    return "; ".join(
+        e.get("description") or e.get("error") or str(e) for e in payload.get("errors") or []
+    )
+
+
+class SlurmRestClient:
+    """Submit jobs through slurmrestd over a pool of keep-alive connections.
+
+    Requests are authenticated with a Slurm JWT, as issued by
+    `scontrol token`, on behalf of `user`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        user: str,
+        token: str,
+        version: str = API_VERSION,
+        connections: int = 4,
+        pipeline: int = 8,
+        timeout: float = 30.0,
+    ) -> None:
+        self.url = url
+        self._version = version
+        self._pool = HTTPPool(
+            url,
+            connections,
+            pipeline,
+            timeout,
+            headers={
+                "Content-Type": "application/json",
+                "X-SLURM-USER-NAME": user,
+                "X-SLURM-USER-TOKEN": token,
+            },
+        )
+
+    async def __aenter__(self) -> "SlurmRestClient":
+        """Get client of the Slurm REST API."""
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        """Close connections to slurmrestd."""
+        await self.close()
+
+    @property
+    def connections(self) -> int:
+        """Get number of connections opened so far."""
+        return self._pool.opened
+
+    async def _request(self, method: str, path: str, body: Optional[Dict[str, Any]] = None) -> Any:
+        """Send request to slurmrestd and decode its response."""
+        data = json.dumps(body).encode() if body is not None else None
+        try:
+            response = await self._pool.request(method, f"/slurm/{self._version}{path}", data)
+        except HTTPError as e:
+            raise SlurmRestError(f"Failed to reach slurmrestd at {self.url}. Reason:\n{e.message}")
+        try:
+            payload = json.loads(response.body or b"{}")
+        except ValueError:
+            payload = {}
+        if response.status >= 400 or payload.get("errors"):
+            reason = _errors(payload) or f"{response.status} {response.reason}"
+            raise SlurmRestError(f"slurmrestd rejected {method} {path}: {reason}")
+        return payload
+
+    async def ping(self) -> Any:
+        """Check that slurmrestd can reach slurmctld."""
+        return (await self._request("GET", "/ping")).get("pings")
+
+    async def submit(self, script: str, job: Dict[str, Any]) -> int:
+        """Submit batch job.
+
+        Args:
+            script: Batch script of the job.
+            job: Job description, e.g. name, partition, environment and
+                current working directory of the job.
+
+        Returns:
+            ID of the submitted job.
+
+        Raises:
+            SlurmRestError: Raised if the job could not be submitted.
+        """
+        payload = await self._request("POST", "/job/submit", {"script": script, "job": job})
+        return int(payload["job_id"])
+
+    async def close(self) -> None:
+        """Close connections to slurmrestd."""
+        await self._pool.close()
@@ -0,0 +1,250 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Compact table of unit states, kept up to date from model deltas."""
+
+from array import array
+from collections import Counter
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+_NO_ADDRESS = "-"
+_APP_HEADER = f"{'App':<30} {'Units':>6}  Status"
+_UNIT_HEADER = f"{'Unit':<30} {'Workload':<12} {'Agent':<12} {'Address':<16} Message"
+
+
+class StatusTable:
+    """Status of every unit within a cluster.
+
+    Each unit occupies a row. Application names, statuses and messages are
+    interned, and rows store their integer codes in arrays, so thousands of
+    units cost a few bytes each instead of a full libjuju `Unit` apiece.
+    Per-application status counts are kept incrementally, and the rows
+    and applications changed since the last call to `take_dirty` are tracked
+    so that only those need to be redrawn.
+    """
+
+    __slots__ = (
+        "_strings",
+        "_codes",
+        "_names",
+        "_rows",
+        "_free",
+        "_app",
+        "_workload",
+        "_agent",
+        "_message",
+        "_addresses",
+        "_counts",
+        "_dirty_rows",
+        "_dirty_apps",
+    )
+
+    def __init__(self) -> None:
+        self._strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+        self._names: List[Optional[str]] = []
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._app = array("I")
+        self._workload = array("I")
+        self._agent = array("I")
+        self._message = array("I")
+        self._addresses: List[str] = []
+        self._counts: Dict[str, Counter] = {}
+        self._dirty_rows: Set[int] = set()
+        self._dirty_apps: Set[str] = set()
+
+    def __len__(self) -> int:
+        """Get number of units within the table."""
+        return len(self._rows)
+
+    def _intern(self, value: Optional[str]) -> int:
+        """Get code of a string, assigning one if needed."""
+        value = value or ""
+        if (code := self._codes.get(value)) is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+        return code
+
+    def update(
+        self,
+        name: str,
+        application: str,
+        workload: str,
+        agent: str,
+        message: str = "",
+        address: Optional[str] = None,
+    ) -> bool:
+        """Add or update the row of a unit.
+
+        Args:
+            name: Name of the unit.
+            application: Application the unit belongs to.
+            workload: Workload status of the unit.
+            agent: Agent status of the unit.
+            message: Workload status message. Default: "".
+            address: Public address of the unit. Default: None.
+
+        Returns:
+            True if the row changed.
+        """
+        codes = (
+            self._intern(application),
+            self._intern(workload),
+            self._intern(agent),
+            self._intern(message),
+        )
+        address = address or _NO_ADDRESS
+        row = self._rows.get(name)
+        if row is None:
+            row = self._allocate(name)
+        elif self._row_codes(row) == codes and self._addresses[row] == address:
+            return False
+        else:
+            self._count(row, -1)
+
+        self._app[row], self._workload[row], self._agent[row], self._message[row] = codes
+        self._addresses[row] = address
+        self._count(row, 1)
+        self._dirty_rows.add(row)
+        return True
+
+    def remove(self, name: str) -> bool:
+        """Remove the row of a unit.
+
+        Returns:
+            True if the unit was in the table.
+        """
+        row = self._rows.pop(name, None)
+        if row is None:
+            return False
+        self._count(row, -1)
+        self._names[row] = None
+        self._free.append(row)
+        self._dirty_rows.add(row)
+        return True
+
+    def _allocate(self, name: str) -> int:
+        """Get a row for a new unit, reusing rows of removed units."""
+        if self._free:
+            row = self._free.pop()
+            self._names[row] = name
+        else:
+            row = len(self._names)
+            self._names.append(name)
+            self._addresses.append(_NO_ADDRESS)
+            for column in (self._app, self._workload, self._agent, self._message):
+                column.append(0)
+        self._rows[name] = row
+        return row
+
+    def _row_codes(self, row: int) -> Tuple[int, int, int, int]:
+        """Get interned codes of a row."""
+        return self._app[row], self._workload[row], self._agent[row], self._message[row]
+
+    def _count(self, row: int, n: int) -> None:
+        """Adjust the status count of the application of a row."""
+        app, status = self._strings[self._app[row]], self._strings[self._workload[row]]
+        counts = self._counts.setdefault(app, Counter())
+        counts[status] += n
+        if counts[status] <= 0:
+            del counts[status]
+        self._dirty_apps.add(app)
+
+    def apply(self, entity: str, kind: str, data: Optional[Dict[str, Any]]) -> bool:
+        """Apply a model delta to the table.
+
+        Args:
+            entity: Kind of entity the delta is about, e.g. "unit".
+            kind: Kind of delta, e.g. "add", "change" or "remove".
+            data: Raw data of the entity, as found in `Unit.safe_data`.
+
+        Returns:
+            True if the table changed.
+        """
+        if entity != "unit" or not data:
+            return False
+        if kind == "remove":
+            return self.remove(data["name"])
+        return self.update(
+            data["name"],
+            data["application"],
+            (data.get("workload-status") or {}).get("current", "unknown"),
+            (data.get("agent-status") or {}).get("current", "unknown"),
+            (data.get("workload-status") or {}).get("message", ""),
+            data.get("public-address"),
+        )
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> "StatusTable":
+        """Build table from a model snapshot served by the pluto agent.
+
+        Args:
+            snapshot: Snapshot as returned by `pluto.drivers.agent.model_snapshot`.
+        """
+        table = cls()
+        for app_name, app in snapshot["applications"].items():
+            for name, unit in app["units"].items():
+                table.update(
+                    name,
+                    app_name,
+                    unit["workload"],
+                    unit["agent"],
+                    unit["message"],
+                    unit["address"],
+                )
+        return table
+
+    def row(self, row: int) -> Optional[Tuple[str, str, str, str, str, str]]:
+        """Get unit, application, workload, agent, address and message of a row.
+
+        Returns:
+            None if the row belongs to a removed unit.
+        """
+        name = self._names[row]
+        if name is None:
+            return None
+        app, workload, agent, message = (self._strings[c] for c in self._row_codes(row))
+        return name, app, workload, agent, self._addresses[row], message
+
+    def rows(self) -> Iterator[int]:
+        """Iterate over rows of units in the table."""
+        return (row for row, name in enumerate(self._names) if name is not None)
+
+    @property
+    def applications(self) -> Dict[str, Counter]:
+        """Get count of units in each workload status, per application."""
+        return self._counts
+
+    def take_dirty(self) -> Tuple[Set[int], Set[str]]:
+        """Get rows and applications changed since the last call, and reset them."""
+        rows, apps = self._dirty_rows, self._dirty_apps
+        self._dirty_rows, self._dirty_apps = set(), set()
+        return rows, apps
+
+    def format_row(self, row: int) -> str:
+        """Render the row of a unit as a line of text."""
+        if (values := self.row(row)) is None:
+            return ""
+        name, _, workload, agent, address, message = values
+        return f"{name:<30} {workload:<12} {agent:<12} {address:<16} {message}".rstrip()
+
+    def format_app(self, app: str) -> str:
+        """Render the status counts of an application as a line of text."""
+        counts = self._counts.get(app) or Counter()
+        summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+        return f"{app:<30} {sum(counts.values()):>6}  {summary}"
+
+    def render(self, limit: Optional[int] = None) -> List[str]:
+        """Render the table as lines of text.
+
+        Args:
+            limit: Maximum number of lines to render. Default: None, render all lines.
+        """
+        lines = [_APP_HEADER]
+        lines.extend(self.format_app(app) for app in sorted(self._counts))
+        lines.extend(["", _UNIT_HEADER])
+        rows = self.rows() if limit is None else islice(self.rows(), max(limit - len(lines), 0))
+        lines.extend(self.format_row(row) for row in rows)
+        return lines[:limit]
@@ -0,0 +1,81 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Wait on Juju model state using the model delta stream."""
+
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+from juju.model import Model
+
+_WATCHED_ENTITIES = frozenset({"application", "unit"})
+
+
+class ModelWatcher:
+    """Resolve waiters as soon as model deltas satisfy them.
+
+    All waiters and listeners share a single observer on the model, which
+    is registered the first time something waits on or listens to the model.
+    """
+
+    def __init__(self, model: Model) -> None:
+        self._model = model
+        self._subscribed = False
+        self._waiters: List[Tuple[Callable[[], bool], asyncio.Future]] = []
+        self._listeners: List[Callable[[Any], Any]] = []
+
+    def _subscribe(self) -> None:
+        """Register observer with the model if not already done."""
+        if not self._subscribed:
+            self._model.add_observer(self._on_change)
+            self._subscribed = True
+
+    async def _on_change(self, delta: Any, *_: Any) -> None:
+        """Notify listeners and re-evaluate waiters when an application or unit changes."""
+        if delta.entity in _WATCHED_ENTITIES:
+            for listener in self._listeners:
+                listener(delta)
+            self._evaluate()
+
+    def listen(self, callback: Callable[[Any], Any]) -> None:
+        """Call a function with every application or unit delta.
+
+        Args:
+            callback: Function called with each delta. It must not block.
+        """
+        self._subscribe()
+        self._listeners.append(callback)
+
+    def _evaluate(self) -> None:
+        """Resolve every waiter whose condition now holds or has failed."""
+        pending = []
+        for condition, future in self._waiters:
+            if future.done():
+                continue
+            try:
+                if condition():
+                    future.set_result(None)
+                    continue
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            pending.append((condition, future))
+        self._waiters = pending
+
+    async def wait(self, condition: Callable[[], bool], timeout: Optional[float] = None) -> None:
+        """Wait until condition holds for the current model state.
+
+        Args:
+            condition:
+                Callable evaluated after each application or unit delta. Exceptions
+                raised by the condition are propagated to the waiter.
+            timeout: Seconds to wait before raising `asyncio.TimeoutError`. Default: None.
+        """
+        self._subscribe()
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.append((condition, future))
+        self._evaluate()
+        try:
+            await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiters = [(c, f) for c, f in self._waiters if f is not future]
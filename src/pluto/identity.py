@@ -0,0 +1,361 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Identities of HPC cluster users, as served by GLAuth."""
+
+import csv
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from pluto.utils.paths import data_dir
+
+GLAUTH_SETTINGS = """
+[ldap]
+  enabled = true
+  listen = "0.0.0.0:363"
+
+[ldaps]
+  enabled = true
+  listen = "0.0.0.0:636"
+  cert = "glauth.crt"
+  key = "glauth.key"
+
+[backend]
+  datastore = "config"
+  baseDN = "dc=glauth,dc=com"
+  nameformat = "cn"
+  groupformat = "ou"
+  anonymousdse = true
+
+[behaviors]
+  IgnoreCapabilities = false
+  LimitFailedBinds = true
+  NumberOfFailedBinds = 3
+  PeriodOfFailedBinds = 10
+  BlockFailedBindsFor = 60
+  PruneSourceTableEvery = 600
+  PruneSourcesOlderThan = 600
+
+"""
+
+# Users and groups that every cluster has. Imported users cannot replace them.
+DEFAULT_ENTRIES = """\
+[[users]]
+  name = "researcher"
+  givenname="Researcher"
+  sn="Science"
+  mail = "researcher@ubuntu.com"
+  uidnumber = 5002
+  primarygroup = 5501
+  loginShell = "/bin/bash"
+  homeDir = "/home/researcher"
+  passsha256 = "6478579e37aff45f013e14eeb30b3cc56c72ccdc310123bcdf53e0333e3f416a" # dogood
+  passappsha256 = [
+    "c32255dbf6fd6b64883ec8801f793bccfa2a860f2b1ae1315cd95cdac1338efa", # TestAppPw1
+    "c9853d5f2599e90497e9f8cc671bd2022b0fb5d1bd7cfff92f079e8f8f02b8d3", # TestAppPw2
+    "4939efa7c87095dacb5e7e8b8cfb3a660fa1f5edcc9108f6d7ec20ea4d6b3a88", # TestAppPw3
+  ]
+
+[[users]]
+  name = "serviceuser"
+  mail = "serviceuser@example.com"
+  uidnumber = 5003
+  primarygroup = 5502
+  passsha256 = "652c7dc687d98c9889304ed2e408c74b611e86a40caa51c4b43f1dd5913c5cd0" # mysecret
+    [[users.capabilities]]
+    action = "search"
+    object = "*"
+
+[[groups]]
+  name = "researchers"
+  gidnumber = 5501
+
+[[groups]]
+  name = "svcaccts"
+  gidnumber = 5502
+"""
+
+DEFAULT_GROUP = "researchers"
+DEFAULT_GROUPS = {"researchers": 5501, "svcaccts": 5502}
+RESERVED_USERS = frozenset({"researcher", "serviceuser"})
+# uid and gid of the default user, researcher.
+RESEARCHER = (5002, 5501)
+DEFAULT_UIDS = (RESEARCHER[0], 5003)
+FIRST_UID = 10000
+FIRST_GID = 6000
+
+_NAME = re.compile(r"^[a-z_][a-z0-9_-]{0,31}$")
+_ENTRY_NAME = re.compile(r'^  name = "((?:[^"\\]|\\.)*)"$', re.MULTILINE)
+_NUMBER = re.compile(r"^  (uidnumber|gidnumber) = (\d+)$", re.MULTILINE)
+# Highest uid and gid ever assigned, so that those of removed users and
+# groups are not handed to new ones, who would own their files.
+_HIGHEST = re.compile(r"^# pluto: highest (uidnumber|gidnumber) = (\d+)$", re.MULTILINE)
+
+User = namedtuple(
+    "User", ["name", "uid", "group", "mail", "givenname", "sn", "shell", "passsha256"]
+)
+ImportPlan = namedtuple(
+    "ImportPlan", ["config", "users", "groups", "added", "changed", "removed", "unchanged"]
+)
+
+
+class IdentityError(Exception):
+    """Raise if user identities are invalid."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+def read_users(path: Union[str, os.PathLike]) -> List[User]:
+    """Read users from a CSV file with a header row.
+
+    Only the `name` column is required. Optional columns are `uid`, `group`,
+    `mail`, `givenname`, `sn`, `shell`, and either `password` or `passsha256`.
+
+    Args:
+        path: Path to the CSV file.
+
+    Raises:
+        IdentityError: Raised if a user is invalid or listed twice.
+    """
+    users, seen = [], set()
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.DictReader(f), start=2):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            name = row.get("name", "")
+            if not _NAME.match(name):
+                raise IdentityError(f"Line {line}: invalid user name {name!r}")
+            if name in RESERVED_USERS or name in seen:
+                raise IdentityError(f"Line {line}: user {name} is reserved or listed twice")
+            if row.get("uid") and not row["uid"].isdigit():
+                raise IdentityError(f"Line {line}: invalid uid {row['uid']!r} of {name}")
+            group = row.get("group") or DEFAULT_GROUP
+            if not _NAME.match(group):
+                raise IdentityError(f"Line {line}: invalid group name {group!r}")
+            password = row.get("passsha256") or (
+                hashlib.sha256(row["password"].encode()).hexdigest() if row.get("password") else ""
+            )
+            seen.add(name)
+            users.append(
+                User(
+                    name,
+                    int(row["uid"]) if row.get("uid") else None,
+                    group,
+                    row.get("mail") or "",
+                    row.get("givenname") or "",
+                    row.get("sn") or "",
+                    row.get("shell") or "/bin/bash",
+                    password,
+                )
+            )
+    return users
+
+
+def _entries(config: str, kind: str) -> Dict[str, Tuple[str, int]]:
+    """Get entries of a kind generated into a config, by name, with their ID number."""
+    entries = {}
+    for block in config.rstrip("\n").split("\n\n"):
+        if block.startswith(f"[[{kind}]]") and (name := _ENTRY_NAME.search(block)):
+            number = _NUMBER.search(block)
+            entries[json.loads(f'"{name.group(1)}"')] = (
+                block,
+                int(number.group(2)) if number else 0,
+            )
+    return entries
+
+
+def _highest(config: str) -> Dict[str, int]:
+    """Get highest uid and gid ever assigned in a config."""
+    highest = {
+        "uidnumber": max((n for _, n in _entries(config, "users").values()), default=0),
+        "gidnumber": max((n for _, n in _entries(config, "groups").values()), default=0),
+    }
+    for key, number in _HIGHEST.findall(config):
+        highest[key] = max(highest[key], int(number))
+    return highest
+
+
+def _toml(value: str) -> str:
+    """Quote value as a TOML basic string."""
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _user_entry(user: User, uid: int, gid: int) -> str:
+    """Render GLAuth entry of a user."""
+    lines = ["[[users]]", f"  name = {_toml(user.name)}"]
+    for key in ("givenname", "sn", "mail"):
+        if value := getattr(user, key):
+            lines.append(f"  {key} = {_toml(value)}")
+    lines += [
+        f"  uidnumber = {uid}",
+        f"  primarygroup = {gid}",
+        f"  loginShell = {_toml(user.shell)}",
+        f"  homeDir = {_toml('/home/' + user.name)}",
+    ]
+    if user.passsha256:
+        lines.append(f"  passsha256 = {_toml(user.passsha256)}")
+    return "\n".join(lines)
+
+
+def _allocate(
+    wanted: Dict[str, Optional[int]],
+    previous: Dict[str, int],
+    first: int,
+    taken: Iterable[int],
+    highest: int = 0,
+) -> Dict[str, int]:
+    """Assign ID numbers, keeping previously assigned ones and filling in the rest.
+
+    New ID numbers are assigned above `highest`, the highest ever assigned,
+    so that ID numbers freed by removed entries are not reused.
+
+    Raises:
+        IdentityError: Raised if two entries want the same ID number.
+    """
+    ids = {
+        name: number if number is not None else previous.get(name)
+        for name, number in wanted.items()
+    }
+    used: Dict[int, str] = dict.fromkeys(taken, "")
+    for name, number in ids.items():
+        if number is None:
+            continue
+        if number in used:
+            raise IdentityError(
+                f"ID number {number} of {name} is already used by {used[number] or 'a default entry'}"
+            )
+        used[number] = name
+    following = max([first - 1, highest, *used]) + 1
+    for name in sorted(name for name, number in ids.items() if number is None):
+        ids[name] = following
+        following += 1
+    return ids
+
+
+def render_config(entries: Iterable[str] = (), highest: Optional[Dict[str, int]] = None) -> str:
+    """Render GLAuth config of the default users and groups, plus extra entries.
+
+    Args:
+        entries: Entries of imported users and groups. Default: none.
+        highest: Highest uid and gid ever assigned, keyed by "uidnumber"
+            and "gidnumber", to record in the config. Default: None.
+    """
+    marks = "".join(
+        f"# pluto: highest {key} = {number}\n" for key, number in sorted((highest or {}).items())
+    )
+    return (
+        GLAUTH_SETTINGS
+        + DEFAULT_ENTRIES
+        + (f"\n{marks}" if marks else "")
+        + "".join(f"\n{entry}\n" for entry in entries)
+    )
+
+
+def plan_import(users: List[User], applied: Optional[str] = None) -> ImportPlan:
+    """Plan import of users, given the last applied config.
+
+    Users and groups keep the ID numbers they were given before. New users
+    without a uid, and new groups, get the next one above the highest ever
+    assigned, so that they do not inherit files of removed users.
+
+    Args:
+        users: Users to import, replacing all previously imported users.
+        applied: Last applied config. Default: None, the default config.
+
+    Returns:
+        Plan with the new config, the uid and gid of each user, the gid of
+        each group, and which users were added, changed, removed or unchanged.
+    """
+    old_users = _entries(applied or "", "users")
+    old_groups = {name: number for name, (_, number) in _entries(applied or "", "groups").items()}
+    highest = _highest(applied or "")
+    for name in RESERVED_USERS:
+        old_users.pop(name, None)
+
+    extra = sorted({user.group for user in users} - set(DEFAULT_GROUPS))
+    gids = {
+        **DEFAULT_GROUPS,
+        **_allocate(
+            dict.fromkeys(extra),
+            old_groups,
+            FIRST_GID,
+            DEFAULT_GROUPS.values(),
+            highest["gidnumber"],
+        ),
+    }
+    uids = _allocate(
+        {user.name: user.uid for user in users},
+        {name: number for name, (_, number) in old_users.items()},
+        FIRST_UID,
+        DEFAULT_UIDS,
+        highest["uidnumber"],
+    )
+    highest = {
+        "uidnumber": max([highest["uidnumber"], *uids.values()]),
+        "gidnumber": max([highest["gidnumber"], *(gids[g] for g in extra)]),
+    }
+
+    group_entries = [f"[[groups]]\n  name = {_toml(g)}\n  gidnumber = {gids[g]}" for g in extra]
+    user_entries = {
+        user.name: _user_entry(user, uids[user.name], gids[user.group])
+        for user in sorted(users, key=lambda user: user.name)
+    }
+    added = sorted(set(user_entries) - set(old_users))
+    removed = sorted(set(old_users) - set(user_entries))
+    changed = sorted(
+        name
+        for name in set(user_entries) & set(old_users)
+        if user_entries[name] != old_users[name][0]
+    )
+    return ImportPlan(
+        render_config([*group_entries, *user_entries.values()], highest),
+        {user.name: (uids[user.name], gids[user.group]) for user in users},
+        {g: gids[g] for g in extra},
+        added,
+        changed,
+        removed,
+        len(user_entries) - len(added) - len(changed),
+    )
+
+
+def applied_config_path(cluster: str) -> Path:
+    """Get path of the GLAuth config last applied to a cluster."""
+    return data_dir() / "journal" / cluster / "glauth.cfg"
+
+
+def load_applied(cluster: str) -> Optional[str]:
+    """Get GLAuth config last applied to a cluster, if any."""
+    try:
+        return applied_config_path(cluster).read_text()
+    except FileNotFoundError:
+        return None
+
+
+def save_applied(cluster: str, config: str) -> None:
+    """Record GLAuth config applied to a cluster."""
+    path = applied_config_path(cluster)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(config)
+    os.replace(tmp, path)
+
+
+def forget_applied(cluster: str) -> None:
+    """Forget GLAuth config applied to a cluster, such as when it is recreated."""
+    applied_config_path(cluster).unlink(missing_ok=True)
@@ -21,13 +21,29 @@ from craft_cli import (
     emit,
 )
 
-from pluto.cmd import BootstrapCommand
+from pluto.cmd import (
+    AgentCommand,
+    BootstrapCommand,
+    HealthCommand,
+    ScaleCommand,
+    StatusCommand,
+    SubmitCommand,
+    TallyCommand,
+    UsersCommand,
+)
 
 
 def main() -> None:
     """Entry point for pluto program."""
     emit.init(EmitterMode.BRIEF, "pluto", f"Starting pluto version {__version__}")
-    command_groups = [CommandGroup("Cluster Management", [BootstrapCommand])]
+    command_groups = [
+        CommandGroup(
+            "Cluster Management",
+            [BootstrapCommand, HealthCommand, ScaleCommand, StatusCommand, UsersCommand],
+        ),
+        CommandGroup("Workloads", [SubmitCommand, TallyCommand]),
+        CommandGroup("Session", [AgentCommand]),
+    ]
 
     try:
         dispatcher = Dispatcher(
@@ -0,0 +1,9 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Operations performed by pluto commands.
+
+Command classes in `pluto.cmd` only describe their arguments so that
+the CLI can start without importing Juju. Each command imports its
+operation from this package when it runs.
+"""
@@ -0,0 +1,35 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Serve pluto commands from a persistent controller session."""
+
+import asyncio
+import signal
+from typing import Optional
+
+from craft_cli import emit
+
+from pluto.drivers.agent import AgentServer
+
+
+async def agent(path: Optional[str] = None) -> None:
+    """Run pluto agent until interrupted.
+
+    Args:
+        path: Unix socket to listen on. Default: `socket_path()`.
+    """
+    server = AgentServer(path)
+    await server.start()
+    emit.message(f"pluto agent listening on {server.path}")
+
+    stop = asyncio.Event()
+    loop = asyncio.get_event_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        await server.stop()
+        emit.message("pluto agent stopped")
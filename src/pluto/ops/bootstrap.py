@@ -0,0 +1,397 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Bootstrap a new HPC cluster."""
+
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional
+
+from craft_cli import emit
+from juju.controller import Controller
+
+from pluto.drivers import Cluster, JujuRunner
+from pluto.identity import RESEARCHER, forget_applied, load_applied, render_config
+from pluto.ops.packages import cache_stats, format_stats, provision_cache
+from pluto.ops.users import attach_identity_config
+from pluto.placement import format_layout
+from pluto.spec import PACKAGE_CACHE, ClusterSpec, SpecDiff
+from pluto.utils import ArtifactCache, History, Journal, StepGraph, StepMonitor, tracer
+from pluto.utils.dag import Step
+
+NHC_URL = "https://github.com/mej/nhc/releases/download/1.4.3/lbnl-nhc-1.4.3.tar.gz"
+
+NFS_EXPORTS = """\
+/srv     *(ro,sync,subtree_check)
+/home    *(rw,sync,no_subtree_check)
+"""
+
+
+class _Bootstrap:
+    """Steps that bootstrap a new HPC cluster."""
+
+    def __init__(
+        self,
+        cluster: Cluster,
+        cache: ArtifactCache,
+        spec: ClusterSpec,
+        concurrency: int = 16,
+        label: Optional[str] = None,
+        journal: Optional[Journal] = None,
+    ) -> None:
+        self._cluster = cluster
+        self._cache = cache
+        self._spec = spec
+        self._concurrency = concurrency
+        self._label = label
+        self._journal = journal
+        self._nhc = None
+        self._status: Optional[str] = None
+        self._eta: Optional[float] = None
+
+    def _progress(self, message: str) -> None:
+        """Report progress, labelled with the cluster it belongs to."""
+        self._status = message
+        if self._eta is not None:
+            message = f"{message} (about {int(self._eta // 60)}m{int(self._eta % 60):02d}s left)"
+        emit.progress(f"{self._label}: {message}" if self._label else message)
+
+    def estimate(self, eta: Optional[float]) -> None:
+        """Update how long the bootstrap has left to run in progress reports."""
+        self._eta = eta
+        if self._status is not None:
+            self._progress(self._status)
+
+    def stalled(self, step: Step, elapsed: float, p95: float) -> None:
+        """Warn that a step is taking far longer than it did before."""
+        message = (
+            f"Step {step.name} has been running for {elapsed:.0f}s, but it took at most "
+            f"{p95:.0f}s in 95% of earlier bootstraps. It may be stalled"
+        )
+        emit.message(f"{self._label}: {message}" if self._label else message)
+
+    @property
+    def _caching(self) -> bool:
+        """Determine if the cluster caches the packages its units install."""
+        return PACKAGE_CACHE in self._spec.applications
+
+    def graph(self) -> StepGraph:
+        """Get graph of bootstrap steps and their dependencies.
+
+        With a package cache, compute nodes are only deployed once the
+        cache is in place, so that they install their packages through it.
+        """
+        graph = StepGraph()
+        graph.add("deploy", self.deploy)
+        # Steps that need compute nodes, or the package cache, in the model.
+        compute, packages = ["deploy"], ["deploy"]
+        if self._caching:
+            graph.add("provision-cache", self.provision_cache, requires=["deploy"])
+            graph.add("deploy-compute", self.deploy_compute, requires=["provision-cache"])
+            compute, packages = ["deploy-compute"], ["provision-cache"]
+        graph.add("fetch-nhc", self.fetch_nhc)
+        graph.add("attach-nhc", self.attach_nhc, requires=[*compute, "fetch-nhc"])
+        graph.add("provision-nfs", self.provision_nfs, requires=packages)
+        graph.add("integrate-filesystem", self.integrate_filesystem, requires=["provision-nfs"])
+        graph.add("provision-identity", self.provision_identity, requires=["deploy"])
+        graph.add("integrate-identity", self.integrate_identity, requires=["provision-identity"])
+        graph.add(
+            "provision-users",
+            self.provision_users,
+            requires=["integrate-identity", "integrate-filesystem", *compute],
+        )
+        graph.add("start-compute", self.start_compute, requires=["provision-users", "attach-nhc"])
+        if self._caching:
+            graph.add("report-cache", self.report_cache, requires=["start-compute"])
+        return graph
+
+    async def deploy(self) -> None:
+        """Deploy whatever part of the cluster specification is missing from the model.
+
+        Missing applications and the relations between them are deployed as one
+        bundle. Remaining relations, units and config drift are applied directly.
+        With a package cache, compute nodes are left for `deploy_compute`.
+        """
+        await self._deploy(exclude=["compute"] if self._caching else ())
+
+    async def deploy_compute(self) -> None:
+        """Deploy compute nodes, and whatever else is still missing from the model."""
+        await self._deploy()
+
+    async def _deploy(self, exclude: Iterable[str] = ()) -> None:
+        """Deploy what is missing from the model, except for some applications."""
+        diff = await self._cluster.diff(self._spec)
+        if exclude := set(exclude):
+            diff = SpecDiff(
+                [name for name in diff.missing_apps if name not in exclude],
+                {k: v for k, v in diff.missing_units.items() if k not in exclude},
+                [
+                    r
+                    for r in diff.missing_relations
+                    if not any(e.split(":")[0] in exclude for e in r)
+                ],
+                {k: v for k, v in diff.config_changes.items() if k not in exclude},
+            )
+        if diff.empty:
+            self._progress("HPC services already deployed")
+            return
+
+        self._progress("Deploying HPC services...")
+        if diff.missing_apps:
+            for line in format_layout(self._spec.layout(diff.missing_apps)):
+                emit.message(f"{self._label}: {line}" if self._label else line)
+            await self._cluster.deploy_bundle(
+                self._spec.to_bundle(diff.missing_apps), forward=self._progress
+            )
+        bundled = set(diff.missing_apps)
+        await asyncio.gather(
+            *(
+                self._cluster.integrate(*relation)
+                for relation in diff.missing_relations
+                if not all(e.split(":")[0] in bundled for e in relation)
+            ),
+            *(
+                self._cluster.get_app(name).add_unit(count=count)
+                for name, count in diff.missing_units.items()
+            ),
+            *(
+                self._cluster.get_app(name).set_config(config)
+                for name, config in diff.config_changes.items()
+            ),
+        )
+
+    async def provision_cache(self) -> None:
+        """Provision package cache, and point apt on every machine of the model at it."""
+        self._progress("Provisioning package cache...")
+        url = await provision_cache(self._cluster, self._concurrency)
+        self._progress(f"Caching packages through {url}")
+
+    async def report_cache(self) -> None:
+        """Report how much of what the package cache served it did not fetch upstream."""
+        if (stats := await cache_stats(self._cluster)) is None:
+            line = "Package cache statistics are not available"
+        else:
+            line = format_stats(stats)
+        emit.message(f"{self._label}: {line}" if self._label else line)
+
+    async def fetch_nhc(self) -> None:
+        """Fetch NHC tarball into the local artifact cache."""
+        self._nhc = await self._cache.fetch(NHC_URL)
+
+    async def attach_nhc(self) -> None:
+        """Attach NHC to compute nodes."""
+        self._progress("Attaching NHC to compute nodes...")
+        await self._cluster.attach_resource("compute", {"nhc": self._nhc})
+
+    async def provision_nfs(self) -> None:
+        """Provision NFS server.
+
+        The NFS server is installed, and the home of the default user created,
+        in the same SSH session that checks the exports file. The exports file
+        is only replaced, and exports reloaded, on units where it differs.
+        """
+        self._progress("Provisioning NFS server...")
+        await self._cluster.wait_for(["nfs-server"], status="active", timeout=1200)
+        # Numeric ids do not need the default user to resolve through sssd yet.
+        uid, gid = RESEARCHER
+        await self._cluster.push(
+            "nfs-server",
+            NFS_EXPORTS.encode(),
+            "/etc/exports",
+            on_change="exportfs -a && systemctl restart nfs-kernel-server",
+            concurrency=self._concurrency,
+            prepare=[
+                "sudo apt -y install nfs-kernel-server",
+                f"sudo mkdir -p /home/researcher && sudo chown -R {uid}:{gid} /home/researcher",
+            ],
+        )
+
+    async def integrate_filesystem(self) -> None:
+        """Integrate cluster filesystem."""
+        self._progress("Integrating cluster filesystem")
+        server = self._cluster.units("nfs-server")[-1]
+        endpoint = f"nfs://{await server.get_public_address()}/home"
+        await self._cluster.get_app("home-nfs-proxy").set_config({"endpoint": endpoint})
+        await self._cluster.integrate("home-nfs-proxy:nfs-share", "home:nfs-share")
+
+    async def provision_identity(self) -> None:
+        """Provision identity management service."""
+        self._progress("Provisioning identity management service...")
+        await self._cluster.wait_for(["glauth"], status="active", timeout=1200)
+        # Keep users imported with `pluto users import` when resuming a bootstrap.
+        config = load_applied(self._cluster.name) or render_config()
+        if not await attach_identity_config(self._cluster, config, self._journal):
+            self._progress("Identity configuration unchanged")
+        await self._cluster.run_action_on(
+            "glauth",
+            "set-confidential",
+            concurrency=self._concurrency,
+            check=True,
+            **{
+                "ldap-password": "mysecret",
+                "ldap-default-bind-dn": "cn=serviceuser,ou=svcaccts,dc=glauth,dc=com",
+            },
+        )
+
+    async def integrate_identity(self) -> None:
+        """Integrate identity management service."""
+        self._progress("Integrating identity management service...")
+        await self._cluster.integrate("glauth:ldap-client", "sssd:ldap-client")
+
+    async def provision_users(self) -> None:
+        """Wait for users to resolve on cluster nodes.
+
+        The home of the default user is created while provisioning the NFS server.
+        """
+        self._progress("Provisioning default user 'researcher'...")
+        await self._cluster.wait_for(["sssd"], status="active", raise_on_error=False, timeout=1200)
+
+    async def start_compute(self) -> None:
+        """Start compute nodes."""
+        self._progress("Starting compute nodes...")
+        await self._cluster.run_action_on(
+            "compute", "node-configured", concurrency=self._concurrency, check=True
+        )
+
+
+# Applications that bootstrap provisions after deploying the cluster specification.
+REQUIRED_APPLICATIONS = ("compute", "glauth", "home", "home-nfs-proxy", "nfs-server", "sssd")
+
+# Steps that check their own progress against the live model, so they always run.
+_ALWAYS_RUN = frozenset({"deploy", "deploy-compute", "fetch-nhc"})
+
+
+async def bootstrap_cluster(
+    cluster: Cluster,
+    spec: ClusterSpec,
+    cache: ArtifactCache,
+    concurrency: int = 16,
+    label: Optional[str] = None,
+    history: Optional[History] = None,
+) -> StepGraph:
+    """Run the bootstrap steps against a connected cluster.
+
+    Completed steps are recorded in a journal. If an earlier bootstrap of
+    the same cluster was interrupted, only the remaining steps run.
+
+    How long each step takes is recorded in a history shared by clusters
+    on the same cloud with a similar topology. Once steps have a history,
+    progress reports estimate how long the bootstrap has left, and steps
+    that run far longer than before are reported as possibly stalled.
+
+    Args:
+        cluster: Connected cluster to bootstrap.
+        spec: Topology of the cluster.
+        cache: Cache to fetch artifacts through.
+        concurrency: Maximum number of units to operate on at once. Default: 16.
+        label: Prefix for progress messages, if any. Default: None.
+        history: History of step durations. Default: the one in pluto's data directory.
+
+    Returns:
+        Graph of bootstrap steps, with timings of the steps that ran.
+    """
+    journal = Journal.for_cluster(cluster.name)
+    if cluster.created:
+        journal.reset()
+        forget_applied(cluster.name)
+    skip = journal.completed - _ALWAYS_RUN
+    if skip:
+        emit.message(f"Resuming bootstrap of {cluster.name}. Skipping {', '.join(sorted(skip))}")
+
+    steps = _Bootstrap(cluster, cache, spec, concurrency, label, journal)
+    graph = steps.graph()
+    monitor = StepMonitor(graph, history or History(), f"{cluster.cloud}/{spec.topology()}")
+
+    def _complete(step: Step) -> None:
+        journal.complete(step.name)
+        # Steps of a resumed bootstrap pick up after work done earlier.
+        if not skip:
+            monitor.complete(step)
+
+    watch = asyncio.ensure_future(monitor.watch(steps.estimate, steps.stalled))
+    try:
+        await graph.run(skip=skip, on_complete=_complete)
+    finally:
+        watch.cancel()
+        await asyncio.gather(watch, return_exceptions=True)
+    return graph
+
+
+async def _bootstrap_one(
+    name: str,
+    spec: ClusterSpec,
+    cache: ArtifactCache,
+    concurrency: int,
+    shared: Dict[str, Any],
+    label: Optional[str],
+    history: History,
+) -> None:
+    """Bootstrap a single cluster using shared connections."""
+    async with Cluster(name, **shared) as cluster:
+        graph = await bootstrap_cluster(cluster, spec, cache, concurrency, label, history)
+    for line in graph.report():
+        emit.message(f"{label}: {line}" if label else line)
+
+
+async def bootstrap(
+    specs: Dict[str, ClusterSpec],
+    concurrency: int = 16,
+    offline: bool = False,
+    trace: Optional[str] = None,
+) -> List[str]:
+    """Bootstrap one or more HPC clusters using Juju.
+
+    Clusters are bootstrapped concurrently. They share one controller
+    connection, one Juju runner and one artifact cache, so each artifact is
+    downloaded once, and `concurrency` bounds unit operations across all of
+    them. Each cluster keeps its own model connection and journal, and
+    records how long its steps took in a history they share.
+
+    Args:
+        specs: Topology of each HPC cluster to bootstrap, keyed by cluster name.
+        concurrency: Maximum number of units to operate on at once.
+        offline: Only use artifacts that are already cached locally.
+        trace: File to write a Chrome trace of the bootstrap to. Default: None.
+
+    Returns:
+        Names of clusters that failed to bootstrap. A failure to bootstrap
+        a lone cluster is raised instead.
+    """
+    if trace:
+        tracer.enable()
+    cache = ArtifactCache(offline=offline)
+    history = History()
+    juju = JujuRunner()
+    multiple = len(specs) > 1
+    # A lone cluster connects on its own, so it can go through the pluto agent.
+    controller = Controller() if multiple else None
+    shared = {"juju": juju, "limit": asyncio.Semaphore(concurrency)}
+    try:
+        if controller is not None:
+            await controller.connect()
+            shared["controller"] = controller
+        results = await asyncio.gather(
+            *(
+                _bootstrap_one(
+                    name, spec, cache, concurrency, shared, name if multiple else None, history
+                )
+                for name, spec in specs.items()
+            ),
+            return_exceptions=multiple,
+        )
+        for line in juju.report():
+            emit.verbose(line)
+    finally:
+        if controller is not None:
+            await controller.disconnect()
+        if trace:
+            tracer.write(trace)
+            for line in tracer.summary():
+                emit.message(line)
+            emit.message(f"Trace written to {trace}")
+
+    failed = []
+    for name, result in zip(specs, results):
+        if isinstance(result, Exception):
+            emit.message(f"Failed to bootstrap {name}. Reason:\n{result}")
+            failed.append(name)
+    return failed
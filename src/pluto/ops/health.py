@@ -0,0 +1,209 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Check the health of compute nodes of an HPC cluster."""
+
+import asyncio
+import shlex
+from collections import defaultdict, namedtuple
+from typing import Callable, Dict, List, Optional, Tuple
+
+from craft_cli import emit
+from juju.unit import Unit
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import CommandBatch
+from pluto.utils import tracer
+from pluto.utils.stats import summarize
+
+HealthResult = namedtuple("HealthResult", ["unit", "host", "healthy", "message", "latency"])
+HealthReport = namedtuple("HealthReport", ["results", "elapsed", "drained"])
+
+# Marks the line after the output of NHC with its exit code and the node's hostname.
+_MARKER = "pluto-nhc:"
+
+# Seconds allowed on top of the check timeout for the SSH session itself.
+_GRACE = 15
+
+# Make the SSH client give up on its own on nodes that do not answer, since
+# cancelling `Unit.ssh` does not stop the client. NHC itself runs under a
+# remote timeout, so the client exits within the grace period in any case.
+_SSH_OPTS = (
+    "-o BatchMode=yes -o ConnectTimeout=5 -o ServerAliveInterval=3 -o ServerAliveCountMax=2"
+)
+
+
+def nhc_command(timeout: float) -> str:
+    """Get command that runs NHC and always exits 0, so that SSH does not raise.
+
+    NHC is told not to mark the node offline itself, since pluto drains
+    failing nodes in one batch when asked to.
+    """
+    return (
+        f"sudo timeout -k 5 {timeout:g} nhc -t {timeout:g} MARK_OFFLINE=0 2>&1; "
+        f'echo "{_MARKER} $? $(hostname -s)"'
+    )
+
+
+def parse_nhc(output: str, timeout: float) -> Tuple[Optional[str], bool, str]:
+    """Get hostname, health and reason from the output of `nhc_command`.
+
+    Returns:
+        Hostname of the node if known, whether it is healthy, and why not.
+    """
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    if not lines or not lines[-1].startswith(_MARKER):
+        return None, False, "NHC produced no result"
+    _, code, *host = lines[-1].split()
+    if code == "0":
+        return (host or [None])[0], True, ""
+    if code == "124":
+        message = f"NHC timed out after {timeout:g}s"
+    elif code == "127":
+        message = "NHC is not installed"
+    else:
+        errors = [line for line in lines[:-1] if "ERROR" in line]
+        message = (errors or lines[:-1] or [f"NHC exited with {code}"])[-1]
+        message = message.split("Health check failed:", 1)[-1].strip()
+    return (host or [None])[0], False, message
+
+
+async def sweep(
+    cluster: Cluster,
+    application_name: str = "compute",
+    timeout: float = 60,
+    concurrency: int = 256,
+    on_result: Optional[Callable[[HealthResult], None]] = None,
+) -> HealthReport:
+    """Run NHC on every unit of an application at once.
+
+    Args:
+        cluster: Connected cluster to check.
+        application_name: Application whose units to check. Default: "compute".
+        timeout: Seconds each node may take to check its health. Default: 60.
+        concurrency: Maximum number of nodes checked at once. Default: 256.
+        on_result: Function called with each result as soon as it arrives. Default: None.
+    """
+    command = nhc_command(timeout)
+    # The loop's clock is monotonic, and also follows simulated time.
+    loop = asyncio.get_event_loop()
+
+    async def _check(unit: Unit) -> HealthResult:
+        start = loop.time()
+        with tracer.span("ssh", cat="unit", unit=unit.name, command="nhc"):
+            try:
+                output = await asyncio.wait_for(
+                    unit.ssh(command, ssh_opts=_SSH_OPTS), timeout + _GRACE
+                )
+            except asyncio.TimeoutError:
+                return HealthResult(
+                    unit.name, None, False, f"no response within {timeout + _GRACE:g}s", None
+                )
+        host, healthy, message = parse_nhc(output, timeout)
+        return HealthResult(unit.name, host, healthy, message, loop.time() - start)
+
+    start = loop.time()
+    results = []
+    async for result in cluster.fan_out_as_completed(application_name, _check, concurrency):
+        if result.error is not None:
+            health = HealthResult(result.unit.name, None, False, str(result.error), None)
+        else:
+            health = result.result
+        results.append(health)
+        if on_result is not None:
+            on_result(health)
+    return HealthReport(results, loop.time() - start, [])
+
+
+def drain_batch(failed: List[HealthResult]) -> Tuple[CommandBatch, List[List[str]]]:
+    """Get batch that drains failing nodes, with one scontrol call per distinct reason.
+
+    Returns:
+        Batch of scontrol calls, and the hostnames that each call drains.
+    """
+    nodes: Dict[str, List[str]] = defaultdict(list)
+    for result in failed:
+        if result.host:
+            nodes[f"pluto health: {result.message}"[:128]].append(result.host)
+    batch = CommandBatch(
+        f"sudo scontrol update nodename={','.join(sorted(hosts))} state=drain "
+        f"reason={shlex.quote(reason)}"
+        for reason, hosts in nodes.items()
+    )
+    return batch, [sorted(hosts) for hosts in nodes.values()]
+
+
+async def drain(cluster: Cluster, failed: List[HealthResult]) -> List[str]:
+    """Drain failing nodes through the Slurm controller in a single SSH session.
+
+    Nodes that did not report their hostname cannot be drained. Once an
+    scontrol call fails, the calls after it do not run, since the Slurm
+    controller is most likely unreachable.
+
+    Returns:
+        Hostnames of drained nodes.
+    """
+    batch, hosts = drain_batch(failed)
+    if not batch:
+        return []
+    controller = cluster.units("slurm-controller")[0]
+    drained = []
+    for result, names in zip(await batch.run(controller, check=False), hosts):
+        if result.exit_code == 0:
+            drained.extend(names)
+        else:
+            emit.message(f"Failed to drain {', '.join(names)}: {result.output.strip()}")
+    return sorted(drained)
+
+
+def format_report(report: HealthReport) -> str:
+    """Render summary of a health sweep."""
+    failed = [r for r in report.results if not r.healthy]
+    lines = [
+        f"{len(report.results) - len(failed)} healthy, {len(failed)} unhealthy "
+        f"of {len(report.results)} nodes in {report.elapsed:.1f}s"
+    ]
+    if stats := summarize([r.latency for r in report.results if r.latency is not None]):
+        lines.append(
+            f"Check latency: p50 {stats['p50']:.1f}s, p95 {stats['p95']:.1f}s, "
+            f"p99 {stats['p99']:.1f}s, max {stats['max']:.1f}s"
+        )
+    if report.drained:
+        lines.append(f"Drained {len(report.drained)} nodes: {', '.join(report.drained)}")
+    return "\n".join(lines)
+
+
+async def health(
+    name: str,
+    timeout: float = 60,
+    concurrency: int = 256,
+    drain_failed: bool = False,
+) -> HealthReport:
+    """Check the health of the compute nodes of an HPC cluster.
+
+    Failures are reported as soon as they arrive.
+
+    Args:
+        name: Name of the HPC cluster.
+        timeout: Seconds each node may take to check its health. Default: 60.
+        concurrency: Maximum number of nodes checked at once. Default: 256.
+        drain_failed: Drain unhealthy nodes in Slurm. Default: False.
+    """
+    async with Cluster(name, create=False) as cluster:
+        total = len(cluster.units("compute"))
+        checked, failures = 0, 0
+
+        def _report(result: HealthResult) -> None:
+            nonlocal checked, failures
+            checked += 1
+            if not result.healthy:
+                failures += 1
+                emit.message(f"{result.unit}: {result.message}")
+            emit.progress(f"Checked {checked} of {total} nodes, {failures} unhealthy")
+
+        report = await sweep(cluster, "compute", timeout, concurrency, _report)
+        if drain_failed and (failed := [r for r in report.results if not r.healthy]):
+            report = report._replace(drained=await drain(cluster, failed))
+
+    emit.message(format_report(report))
+    return report
@@ -0,0 +1,98 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Cache packages that the units of an HPC cluster install.
+
+The cache is an apt-cacher-ng proxy on a control plane unit. Juju points
+apt on every machine of the model at it through the model's
+`apt-http-proxy`, so each package is fetched upstream once and then served
+over the LAN. Packages from HTTPS sources, such as PPAs, are fetched
+upstream directly, since the proxy cannot cache them. This includes the
+Slurm packages, which the Slurm charms install from a PPA, so the cache
+only saves what nodes install from the Ubuntu archive.
+"""
+
+from collections import namedtuple
+from typing import Optional
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import CommandBatch
+from pluto.spec import PACKAGE_CACHE
+from pluto.utils import tracer
+
+# Port apt-cacher-ng listens on.
+PORT = 3142
+
+# Bytes that the proxy fetched upstream, and that it served to units.
+CacheStats = namedtuple("CacheStats", ["fetched", "served"])
+
+# Marks the line with the totals of the proxy's transfer log.
+_MARKER = "pluto-cache:"
+
+# Lines of the transfer log read `time|I or O|bytes|client|path`, where I
+# is a transfer from upstream into the cache and O a transfer to a client.
+_STATS = (
+    'sudo awk -F\'|\' \'$2 == "I" { i += $3 } $2 == "O" { o += $3 } '
+    f'END {{ printf "{_MARKER} %.0f %.0f\\n", i, o }}\' '
+    "/var/log/apt-cacher-ng/apt-cacher.log 2>/dev/null || true"
+)
+
+
+def hit_rate(stats: CacheStats) -> float:
+    """Get share of served bytes that did not have to be fetched upstream."""
+    if not stats.served:
+        return 0.0
+    return max(0.0, 1 - stats.fetched / stats.served)
+
+
+async def provision_cache(cluster: Cluster, concurrency: int = 16) -> str:
+    """Install the caching proxy, and point apt on every machine of the model at it.
+
+    Returns:
+        URL of the proxy.
+    """
+    await cluster.wait_for([PACKAGE_CACHE], status="active", timeout=1200)
+    await cluster.batch_on(
+        PACKAGE_CACHE,
+        CommandBatch(
+            [
+                "sudo DEBIAN_FRONTEND=noninteractive apt -y install apt-cacher-ng",
+                f"timeout 60 sh -c 'until nc -z localhost {PORT}; do sleep 1; done'",
+            ]
+        ),
+        concurrency=concurrency,
+        check=True,
+    )
+    address = await cluster.units(PACKAGE_CACHE)[0].get_public_address()
+    url = f"http://{address}:{PORT}"
+    await cluster.set_model_config({"apt-http-proxy": url})
+    return url
+
+
+def parse_stats(output: str) -> Optional[CacheStats]:
+    """Get totals of the proxy's transfer log from the output of its stats command."""
+    for line in output.splitlines():
+        if line.startswith(_MARKER):
+            _, fetched, served = line.split()
+            return CacheStats(int(fetched), int(served))
+    return None
+
+
+async def cache_stats(cluster: Cluster) -> Optional[CacheStats]:
+    """Get how much the caching proxy fetched upstream and served to units.
+
+    Returns:
+        Totals of the proxy's transfer log, or None if they cannot be read.
+    """
+    unit = cluster.units(PACKAGE_CACHE)[0]
+    with tracer.span("ssh", cat="unit", unit=unit.name, command="cache stats"):
+        return parse_stats(await unit.ssh(_STATS))
+
+
+def format_stats(stats: CacheStats) -> str:
+    """Render summary of what the caching proxy served."""
+    return (
+        f"Package cache served {stats.served / 2**20:.0f} MiB, fetching "
+        f"{stats.fetched / 2**20:.0f} MiB upstream ({hit_rate(stats):.0%} hit rate). "
+        "Packages from HTTPS sources, such as the Slurm PPA, bypassed the cache"
+    )
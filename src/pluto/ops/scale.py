@@ -0,0 +1,145 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Scale out compute nodes of an HPC cluster."""
+
+import asyncio
+from collections import namedtuple
+from typing import List, Optional
+
+from craft_cli import emit
+from juju.errors import JujuError
+from juju.unit import Unit
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import ClusterDriverError
+from pluto.utils import tracer
+
+ScaleReport = namedtuple("ScaleReport", ["started", "failed", "elapsed"])
+
+
+class _ScaleOut:
+    """Add units in batches and start each node as soon as it comes up."""
+
+    def __init__(
+        self,
+        cluster: Cluster,
+        action: Optional[str],
+        concurrency: int,
+        timeout: Optional[float],
+    ) -> None:
+        self._cluster = cluster
+        self._action = action
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._timeout = timeout
+        self.started: List[str] = []
+        self.failed: List[str] = []
+
+    async def bring_up(self, unit: Unit) -> None:
+        """Wait for unit to settle, then start it."""
+        try:
+            await self._cluster.wait_for_unit(unit.name, timeout=self._timeout)
+            if self._action:
+                async with self._semaphore:
+                    with tracer.span("action", cat="unit", unit=unit.name, action=self._action):
+                        action = await (await unit.run_action(self._action)).wait()
+                if action.status != "completed":
+                    raise ClusterDriverError(
+                        f"Action {self._action} {action.status} on {unit.name}: {action.results}"
+                    )
+        except (ClusterDriverError, JujuError) as e:
+            self.failed.append(unit.name)
+            emit.message(f"Failed to start {unit.name}: {e}")
+            return
+
+        self.started.append(unit.name)
+        emit.progress(f"Started {unit.name} ({len(self.started)} nodes)")
+
+
+async def scale_out(
+    cluster: Cluster,
+    application_name: str,
+    units: int,
+    batch_size: int = 10,
+    concurrency: int = 16,
+    action: Optional[str] = "node-configured",
+    timeout: Optional[float] = 1200,
+) -> ScaleReport:
+    """Scale out an application to a number of units.
+
+    Units are requested in batches, back to back, without waiting for earlier
+    batches to come up. Each new unit is started with `action` as soon as it
+    settles, so a slow unit holds up no other unit.
+
+    Args:
+        cluster: Connected cluster to scale.
+        application_name: Application to scale out.
+        units: Total number of units the application should have.
+        batch_size: Number of units to request at once. Default: 10.
+        concurrency: Maximum number of start actions in flight. Default: 16.
+        action: Action to run on each new unit, if any. Default: "node-configured".
+        timeout: Seconds to wait for each unit to come up. Default: 1200.
+
+    Raises:
+        ClusterDriverError: Raised if asked to scale in.
+    """
+    app = cluster.get_app(application_name)
+    current = len(app.units)
+    if units < current:
+        raise ClusterDriverError(
+            f"{application_name} already has {current} units. Scaling in is not supported"
+        )
+
+    scaler = _ScaleOut(cluster, action, concurrency, timeout)
+    # The loop's clock is monotonic, and also follows simulated time.
+    loop = asyncio.get_event_loop()
+    start = loop.time()
+    pending = []
+    try:
+        for offset in range(0, units - current, batch_size):
+            count = min(batch_size, units - current - offset)
+            emit.progress(f"Adding {count} units to {application_name}...")
+            with tracer.span("add-unit", cat="model", app=application_name, count=count):
+                batch = await app.add_unit(count=count)
+            pending.extend(asyncio.ensure_future(scaler.bring_up(unit)) for unit in batch)
+    except BaseException:
+        # Units already requested are not started, so do not leave them waiting.
+        for future in pending:
+            future.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        raise
+
+    await asyncio.gather(*pending)
+    return ScaleReport(scaler.started, scaler.failed, loop.time() - start)
+
+
+async def scale(
+    name: str,
+    application_name: str,
+    units: int,
+    batch_size: int = 10,
+    concurrency: int = 16,
+    timeout: Optional[float] = 1200,
+) -> ScaleReport:
+    """Scale out an application of an existing HPC cluster.
+
+    Args:
+        name: Name of the HPC cluster.
+        application_name: Application to scale out.
+        units: Total number of units the application should have.
+        batch_size: Number of units to request at once.
+        concurrency: Maximum number of start actions in flight.
+        timeout: Seconds to wait for each unit to come up.
+    """
+    async with Cluster(name, create=False) as cluster:
+        report = await scale_out(
+            cluster, application_name, units, batch_size, concurrency, timeout=timeout
+        )
+
+    minutes = report.elapsed / 60
+    rate = len(report.started) / minutes if minutes else 0.0
+    emit.message(
+        f"Started {len(report.started)} nodes in {report.elapsed:.1f}s "
+        f"({rate:.1f} nodes/minute). {len(report.failed)} failed."
+    )
+    return report
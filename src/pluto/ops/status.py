@@ -0,0 +1,159 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Show the status of an HPC cluster."""
+
+import asyncio
+import contextlib
+import shutil
+import signal
+import sys
+from typing import Dict, Optional, TextIO
+
+from craft_cli import emit
+
+from pluto.drivers import Cluster
+from pluto.drivers.agent import AgentClient, AgentError
+from pluto.drivers.cluster import ClusterDriverError
+from pluto.drivers.status import StatusTable
+
+_ENTER = "\x1b[?1049h\x1b[?25l"
+_EXIT = "\x1b[?25h\x1b[?1049l"
+_CLEAR = "\x1b[H\x1b[2J"
+
+
+class StatusScreen:
+    """Draw a status table in the terminal, redrawing only what changed.
+
+    The whole screen is only redrawn when applications appear, units are
+    added or removed within the visible area, or the terminal is resized.
+    """
+
+    def __init__(self, table: StatusTable, title: str, out: TextIO = sys.stdout) -> None:
+        self._table = table
+        self._title = title
+        self._out = out
+        self._size = None
+        self._apps: Dict[str, int] = {}
+        self._rows: Dict[int, int] = {}
+        self._footer = 0
+
+    def _line(self, number: int, text: str) -> str:
+        """Get escape sequence that replaces a line of the screen with text."""
+        return f"\x1b[{number};1H{text[: self._size.columns]}\x1b[K"
+
+    def draw(self) -> None:
+        """Redraw the whole screen."""
+        self._table.take_dirty()
+        self._size = shutil.get_terminal_size()
+        apps = sorted(self._table.applications)
+        self._apps = {app: i + 2 for i, app in enumerate(apps)}
+
+        # Leave room for the footer. Rows that do not fit are summarized there.
+        lines = self._table.render(limit=self._size.lines - 1)
+        visible = [line[: self._size.columns] for line in lines]
+        first = len(apps) + 4
+        self._rows = {}
+        for i, row in zip(range(len(visible) - first + 1), self._table.rows()):
+            self._rows[row] = first + i
+        self._footer = len(visible) + 1
+        self._out.write(_CLEAR + "\n".join(visible) + self._line(self._footer, self._summary()))
+        self._out.flush()
+
+    def _summary(self) -> str:
+        """Get footer line of the screen."""
+        hidden = len(self._table) - len(self._rows)
+        more = f" ({hidden} not shown)" if hidden > 0 else ""
+        return f"{self._title}: {len(self._table)} units{more}. Press Ctrl+C to exit."
+
+    def refresh(self) -> int:
+        """Redraw changed rows, or the whole screen if the layout changed.
+
+        Returns:
+            Number of lines redrawn.
+        """
+        rows, apps = self._table.take_dirty()
+        if not rows and not apps:
+            return 0
+        resized = shutil.get_terminal_size() != self._size
+        new_apps = any(app not in self._apps for app in apps)
+        moved = any(
+            (row not in self._rows and self._footer < self._size.lines)
+            or self._table.row(row) is None
+            for row in rows
+        )
+        if resized or new_apps or moved:
+            self.draw()
+            return len(self._rows) + len(self._apps)
+
+        updates = [self._line(self._apps[app], self._table.format_app(app)) for app in apps]
+        updates.extend(
+            self._line(self._rows[row], self._table.format_row(row))
+            for row in rows
+            if row in self._rows
+        )
+        updates.append(self._line(self._footer, self._summary()))
+        self._out.write("".join(updates))
+        self._out.flush()
+        return len(updates)
+
+
+async def _snapshot(name: str) -> Optional[StatusTable]:
+    """Get status table from a running pluto agent, if there is one."""
+    if (agent := await AgentClient.open()) is None:
+        return None
+    try:
+        return StatusTable.from_snapshot(await agent.request("snapshot", name=name))
+    except AgentError as e:
+        raise ClusterDriverError(f"Failed to get status of {name}. Reason:\n{e.message}")
+    except (OSError, ValueError):
+        # A stale socket, or an agent that went away mid-request.
+        return None
+    finally:
+        with contextlib.suppress(OSError):
+            await agent.close()
+
+
+async def _watch(table: StatusTable, title: str, interval: float) -> None:
+    """Redraw status table as it changes until interrupted."""
+    stop = asyncio.Event()
+    loop = asyncio.get_event_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    screen = StatusScreen(table, title)
+    sys.stdout.write(_ENTER)
+    try:
+        screen.draw()
+        while not stop.is_set():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), interval)
+            screen.refresh()
+    finally:
+        sys.stdout.write(_EXIT)
+        sys.stdout.flush()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+
+
+async def status(name: str, watch: bool = False, interval: float = 1.0) -> None:
+    """Show status of the applications and units of an HPC cluster.
+
+    A one-off status is served by the pluto agent when one is running.
+
+    Args:
+        name: Name of the HPC cluster.
+        watch: Keep updating the status until interrupted. Default: False.
+        interval: Seconds between redraws when watching. Default: 1.0.
+    """
+    if not watch and (table := await _snapshot(name)) is not None:
+        emit.message("\n".join(table.render()))
+        return
+
+    async with Cluster(name, create=False) as cluster:
+        table = cluster.status_table()
+        if not watch:
+            emit.message("\n".join(table.render()))
+            return
+        with emit.pause():
+            await _watch(table, name, interval)
@@ -0,0 +1,258 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Submit batch jobs to an HPC cluster through slurmrestd."""
+
+import asyncio
+import itertools
+from collections import namedtuple
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from craft_cli import emit
+
+from pluto.drivers import Cluster
+from pluto.drivers.cluster import ClusterDriverError
+from pluto.drivers.slurm import SLURMRESTD_PORT, SlurmRestClient, SlurmRestError
+from pluto.utils.ratelimit import TokenBucket
+from pluto.utils.stats import summarize
+
+SubmitReport = namedtuple("SubmitReport", ["job_ids", "failures", "elapsed", "latencies"])
+SubmitFailure = namedtuple("SubmitFailure", ["index", "reason"])
+
+# Lifespan in seconds of the tokens pluto requests from slurmctld.
+_TOKEN_LIFESPAN = 3600
+
+
+def parse_params(params: Sequence[str]) -> List[Tuple[str, List[str]]]:
+    """Parse job parameters given as KEY=VALUE1,VALUE2,...
+
+    Raises:
+        ValueError: Raised if a parameter is not of the form KEY=VALUES.
+    """
+    parsed = []
+    for param in params:
+        key, sep, values = param.partition("=")
+        if not sep or not key.isidentifier():
+            raise ValueError(f"Invalid parameter {param}. Expected KEY=VALUE1,VALUE2,...")
+        parsed.append((key, values.split(",")))
+    return parsed
+
+
+def parse_indexes(indexes: str) -> Set[int]:
+    """Parse job indexes given as ranges, e.g. 3-7,12.
+
+    Raises:
+        ValueError: Raised if a range is not of the form N or N-M.
+    """
+    parsed = set()
+    for part in indexes.split(","):
+        first, sep, last = part.partition("-")
+        if not first.isdigit() or (sep and not last.isdigit()):
+            raise ValueError(f"Invalid job indexes {part}. Expected N or N-M")
+        parsed.update(range(int(first), int(last if sep else first) + 1))
+    return parsed
+
+
+def format_indexes(indexes: Iterable[int]) -> str:
+    """Render job indexes as ranges that `parse_indexes` reads back, e.g. 3-7,12."""
+    ranges: List[List[int]] = []
+    for index in sorted(set(indexes)):
+        if ranges and index == ranges[-1][1] + 1:
+            ranges[-1][1] = index
+        else:
+            ranges.append([index, index])
+    return ",".join(str(first) if first == last else f"{first}-{last}" for first, last in ranges)
+
+
+def expand_jobs(
+    name: str,
+    workdir: str,
+    count: int = 1,
+    params: Sequence[Tuple[str, List[str]]] = (),
+    partition: Optional[str] = None,
+    array: Optional[str] = None,
+    indexes: Optional[Collection[int]] = None,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Generate descriptions of the jobs to submit.
+
+    One job is submitted for every combination of parameter values, `count`
+    times over. Each job gets its parameters, and its index as
+    `PLUTO_JOB_INDEX`, in its environment. An `array` is passed on to Slurm,
+    which then expands each submitted job into an array of tasks.
+
+    Args:
+        name: Name of the jobs.
+        workdir: Working directory of the jobs.
+        count: Number of times to submit each combination of parameters. Default: 1.
+        params: Parameters of the jobs and the values to sweep over. Default: none.
+        partition: Partition to submit jobs to. Default: None, the default partition.
+        array: Slurm job array specification, e.g. "0-99%10". Default: None.
+        indexes: Only generate the jobs with these indexes. Default: None, all jobs.
+
+    Yields:
+        Index and description of each job.
+    """
+    keys = [key for key, _ in params]
+    combinations = itertools.product(*(values for _, values in params))
+    jobs = itertools.product(combinations, range(count))
+    for index, (values, _) in enumerate(jobs):
+        if indexes is not None and index not in indexes:
+            continue
+        job = {
+            "name": name,
+            "current_working_directory": workdir,
+            "environment": [
+                "PATH=/usr/local/bin:/usr/bin:/bin",
+                f"PLUTO_JOB_INDEX={index}",
+                *(f"{key}={value}" for key, value in zip(keys, values)),
+            ],
+        }
+        if partition:
+            job["partition"] = partition
+        if array:
+            job["array"] = array
+        yield index, job
+
+
+async def submit_jobs(
+    client: SlurmRestClient,
+    script: str,
+    jobs: Iterator[Tuple[int, Dict[str, Any]]],
+    concurrency: int = 32,
+    rate: Optional[float] = None,
+) -> SubmitReport:
+    """Submit jobs concurrently, keeping the client's connections busy.
+
+    A job whose response was lost, for example because slurmrestd closed
+    its connection with the job's request still pipelined behind others,
+    is not sent again, since it may have been submitted. Its failure is
+    reported with its index, so that it can be resubmitted on its own.
+
+    Args:
+        client: Client of the Slurm REST API.
+        script: Batch script of the jobs.
+        jobs: Indexes and descriptions of the jobs to submit.
+        concurrency: Maximum number of submissions in flight. Default: 32.
+        rate: Maximum number of submissions per second. Default: None, unlimited.
+    """
+    loop = asyncio.get_event_loop()
+    bucket = TokenBucket(rate) if rate else None
+    job_ids: List[int] = []
+    failures: List[SubmitFailure] = []
+    latencies: List[float] = []
+
+    async def _worker() -> None:
+        for index, job in jobs:
+            if bucket is not None:
+                await bucket.acquire()
+            start = loop.time()
+            try:
+                job_ids.append(await client.submit(script, job))
+            except SlurmRestError as e:
+                failures.append(SubmitFailure(index, e.message))
+                continue
+            latencies.append(loop.time() - start)
+            if len(job_ids) % 100 == 0:
+                emit.progress(f"Submitted {len(job_ids)} jobs")
+
+    start = loop.time()
+    await asyncio.gather(*(_worker() for _ in range(max(concurrency, 1))))
+    return SubmitReport(job_ids, failures, loop.time() - start, latencies)
+
+
+def format_report(report: SubmitReport) -> str:
+    """Render throughput and latency percentiles of a submission."""
+    submitted = len(report.job_ids)
+    throughput = submitted / report.elapsed if report.elapsed > 0 else 0.0
+    lines = [
+        f"Submitted {submitted} jobs in {report.elapsed:.2f}s ({throughput:.1f} jobs/s)"
+        + (f", {len(report.failures)} failed" if report.failures else "")
+    ]
+    if stats := summarize(report.latencies):
+        lines.append(
+            "Latency: " + " ".join(f"{key}={value * 1e3:.1f}ms" for key, value in stats.items())
+        )
+    return "\n".join(lines)
+
+
+async def _endpoint(name: str, user: str, token: Optional[str]) -> Tuple[str, str]:
+    """Get URL of slurmrestd within a cluster, and a token for user if none is given."""
+    async with Cluster(name, create=False) as cluster:
+        try:
+            restapi = cluster.units("slurm-restapi")[0]
+            controller = cluster.units("slurm-controller")[0]
+        except (KeyError, IndexError):
+            raise ClusterDriverError(f"Cluster {name} has no slurm-restapi and slurm-controller")
+        url = f"http://{await restapi.get_public_address()}:{SLURMRESTD_PORT}"
+        if token is None:
+            emit.progress(f"Requesting Slurm token for {user}")
+            output = await controller.ssh(
+                f"sudo scontrol token username={user} lifespan={_TOKEN_LIFESPAN}"
+            )
+            token = output.strip().partition("SLURM_JWT=")[2]
+            if not token:
+                raise ClusterDriverError(f"Failed to get Slurm token for {user}: {output}")
+    return url, token
+
+
+async def submit(
+    name: str,
+    script: Path,
+    user: str,
+    count: int = 1,
+    params: Sequence[str] = (),
+    partition: Optional[str] = None,
+    array: Optional[str] = None,
+    workdir: Optional[str] = None,
+    url: Optional[str] = None,
+    token: Optional[str] = None,
+    rate: Optional[float] = None,
+    connections: int = 4,
+    pipeline: int = 8,
+    indexes: Optional[str] = None,
+) -> int:
+    """Submit batch jobs to an HPC cluster.
+
+    Args:
+        name: Name of the HPC cluster.
+        script: Path to the batch script.
+        user: User to submit jobs as.
+        count: Number of times to submit each combination of parameters. Default: 1.
+        params: Parameters to sweep over, as KEY=VALUE1,VALUE2,... Default: none.
+        partition: Partition to submit jobs to. Default: None.
+        array: Slurm job array specification. Default: None.
+        workdir: Working directory of the jobs. Default: home directory of user.
+        url: URL of slurmrestd. Default: None, look up slurm-restapi within the cluster.
+        token: Slurm JWT of user. Default: None, request one from slurmctld.
+        rate: Maximum number of submissions per second. Default: None, unlimited.
+        connections: Number of connections to slurmrestd. Default: 4.
+        pipeline: Number of requests in flight per connection. Default: 8.
+        indexes: Only submit jobs with these indexes, e.g. 3-7,12. Default: None, all jobs.
+
+    Returns:
+        Number of jobs that failed to submit.
+    """
+    jobs = expand_jobs(
+        script.stem,
+        workdir or f"/home/{user}",
+        count,
+        parse_params(params),
+        partition,
+        array,
+        parse_indexes(indexes) if indexes else None,
+    )
+    if url is None or token is None:
+        found, token = await _endpoint(name, user, token)
+        url = url or found
+
+    emit.progress(f"Submitting jobs to {url}")
+    async with SlurmRestClient(url, user, token, connections=connections, pipeline=pipeline) as c:
+        report = await submit_jobs(c, script.read_text(), jobs, connections * pipeline, rate)
+    for reason in sorted({failure.reason for failure in report.failures})[:10]:
+        emit.verbose(reason)
+    emit.message(format_report(report))
+    if report.failures:
+        failed = format_indexes(failure.index for failure in report.failures)
+        emit.message(f"Resubmit the jobs that failed with --index {failed}")
+    return len(report.failures)
@@ -0,0 +1,128 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Import users of an HPC cluster."""
+
+import hashlib
+import os
+import tempfile
+import time
+from typing import Optional, Union
+from zipfile import ZipFile, ZipInfo
+
+from craft_cli import emit
+
+from pluto.drivers import Cluster
+from pluto.identity import ImportPlan, load_applied, plan_import, read_users, save_applied
+from pluto.utils import Journal
+
+# Users whose home directories the NFS server should have, one "name uid gid" per line.
+HOMES_PATH = "/var/lib/pluto/homes"
+
+# Creates missing home directories. Homes of removed users are kept.
+_CREATE_HOMES = (
+    'while read -r name uid gid; do [ -d "/home/$name" ] || '
+    'install -d -m 0700 -o "$uid" -g "$gid" "/home/$name"; done < ' + HOMES_PATH
+)
+
+
+async def attach_identity_config(
+    cluster: Cluster, config: str, journal: Optional[Journal] = None
+) -> bool:
+    """Attach GLAuth config to a cluster unless it is already attached.
+
+    Args:
+        cluster: Connected cluster to attach config to.
+        config: GLAuth config to attach.
+        journal: Journal that records the digest of the attached config. Default: None.
+
+    Returns:
+        Whether config was attached.
+    """
+    digest = hashlib.sha256(config.encode()).hexdigest()
+    if journal is not None and journal.fingerprint("glauth-config") == digest:
+        return False
+    with tempfile.NamedTemporaryFile(suffix=".zip") as cfg:
+        with ZipFile(cfg.name, "w") as cfg_zip:
+            cfg_zip.writestr(ZipInfo("microhpc.cfg"), config)
+        await cluster.attach_resource("glauth", {"config": cfg.name})
+    if journal is not None:
+        journal.set_fingerprint("glauth-config", digest)
+    save_applied(cluster.name, config)
+    return True
+
+
+def homes(plan: ImportPlan) -> bytes:
+    """Render list of home directories that the NFS server should have."""
+    return "".join(
+        f"{name} {uid} {gid}\n" for name, (uid, gid) in sorted(plan.users.items())
+    ).encode()
+
+
+async def apply_import(
+    cluster: Cluster, plan: ImportPlan, journal: Optional[Journal] = None, concurrency: int = 16
+) -> None:
+    """Apply planned import of users to a cluster.
+
+    The new GLAuth config is only attached if it changed. Home directories
+    are created by a single batched command on each NFS server, which only
+    runs if the list of users changed.
+
+    Args:
+        cluster: Connected cluster to import users into.
+        plan: Planned import of users.
+        journal: Journal that records the digest of the attached config. Default: None.
+        concurrency: Maximum number of NFS servers updated at once. Default: 16.
+    """
+    if await attach_identity_config(cluster, plan.config, journal):
+        emit.progress("Attached new identity configuration")
+    else:
+        emit.progress("Identity configuration unchanged")
+    emit.progress("Creating home directories...")
+    await cluster.push(
+        "nfs-server", homes(plan), HOMES_PATH, on_change=_CREATE_HOMES, concurrency=concurrency
+    )
+
+
+def format_plan(plan: ImportPlan) -> str:
+    """Render summary of planned import of users."""
+    lines = [
+        f"{len(plan.added)} added, {len(plan.changed)} changed, "
+        f"{len(plan.removed)} removed, {plan.unchanged} unchanged"
+    ]
+    for label, names in (("Added", plan.added), ("Changed", plan.changed)):
+        if names:
+            lines.append(f"{label}: {', '.join(names[:10])}{' ...' if len(names) > 10 else ''}")
+    if plan.removed:
+        lines.append(f"Removed (home directories are kept): {', '.join(plan.removed)}")
+    return "\n".join(lines)
+
+
+async def import_users(
+    name: str,
+    path: Union[str, os.PathLike],
+    dry_run: bool = False,
+    concurrency: int = 16,
+) -> ImportPlan:
+    """Import users from a CSV file into an existing HPC cluster.
+
+    The imported users replace those imported before. Users keep the uid
+    they were given by an earlier import. Applying an import again is
+    cheap, and finishes an import that was interrupted.
+
+    Args:
+        name: Name of the HPC cluster.
+        path: Path to the CSV file of users.
+        dry_run: Only show what would change. Default: False.
+        concurrency: Maximum number of NFS servers updated at once. Default: 16.
+    """
+    start = time.monotonic()
+    plan = plan_import(read_users(path), load_applied(name))
+    emit.message(format_plan(plan))
+    if dry_run:
+        return plan
+
+    async with Cluster(name, create=False) as cluster:
+        await apply_import(cluster, plan, Journal.for_cluster(name), concurrency)
+    emit.message(f"Imported {len(plan.users)} users in {time.monotonic() - start:.1f}s")
+    return plan
@@ -0,0 +1,154 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Placement of an HPC cluster's applications onto machines.
+
+By default every unit gets a machine of its own. Provisioning machines
+dominates the time a bootstrap takes, so the dense strategy packs
+single-unit control-plane applications onto as few machines as their
+estimated footprint allows. Applications are only packed together if:
+
+* they ask for the same constraints, so one machine satisfies both;
+* they do not share a subordinate application, such as sssd, which
+  would otherwise end up installed twice on one machine.
+"""
+
+import re
+from collections import namedtuple
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+PLACEMENTS = ("spread", "dense")
+
+# CPU cores and memory in MiB.
+Resources = namedtuple("Resources", ["cores", "mem"])
+
+# Estimated footprint of the workload of each charm once it is running.
+COSTS = {
+    "slurmctld": Resources(1.0, 1024),
+    "slurmdbd": Resources(0.5, 512),
+    "slurmrestd": Resources(0.5, 512),
+    "mysql": Resources(1.0, 2048),
+    "glauth": Resources(0.25, 256),
+    "nfs-server-proxy": Resources(0.1, 64),
+    "ubuntu": Resources(0.5, 512),
+}
+DEFAULT_COST = Resources(1.0, 1024)
+
+# Size of a machine provisioned without cores or mem constraints.
+DEFAULT_MACHINE = Resources(2.0, 4096)
+
+Machine = namedtuple("Machine", ["applications", "constraints", "capacity", "used"])
+Layout = namedtuple("Layout", ["strategy", "machines", "unplaced"])
+
+_MEM_UNITS = {"M": 1, "G": 1024, "T": 1024 * 1024}
+
+
+def capacity(constraints: Dict[str, str]) -> Resources:
+    """Get size of the machine that Juju provisions for constraints."""
+    cores = constraints.get("cores") or constraints.get("cpu-cores")
+    mem = re.match(r"^(\d+(?:\.\d+)?)([MGT]?)$", constraints.get("mem", ""))
+    return Resources(
+        float(cores) if cores else DEFAULT_MACHINE.cores,
+        float(mem.group(1)) * _MEM_UNITS[mem.group(2) or "M"] if mem else DEFAULT_MACHINE.mem,
+    )
+
+
+def _conflicts(
+    units: Dict[str, int], relations: Iterable[Tuple[str, str]]
+) -> Set[Tuple[str, str]]:
+    """Get pairs of principal applications that share a subordinate application."""
+    principals: Dict[str, Set[str]] = {}
+    for relation in relations:
+        first, second = (endpoint.split(":")[0] for endpoint in relation)
+        for subordinate, principal in ((first, second), (second, first)):
+            if units.get(subordinate) == 0:
+                principals.setdefault(subordinate, set()).add(principal)
+    return {(a, b) for group in principals.values() for a in group for b in group if a != b}
+
+
+def plan(
+    applications: Sequence,
+    relations: Iterable[Tuple[str, str]] = (),
+    strategy: str = "spread",
+    names: Optional[Iterable[str]] = None,
+) -> Layout:
+    """Plan which applications share machines.
+
+    Packs applications first-fit, largest first, onto machines sized by
+    their constraints.
+
+    Args:
+        applications: Specifications of the applications of the cluster.
+        relations: Relations between applications of the cluster.
+        strategy: "spread" to give every unit a machine, or "dense" to pack
+            single-unit control-plane applications together. Default: "spread".
+        names: Only place these applications. If omitted, place them all.
+    """
+    names = {app.name for app in applications} if names is None else set(names)
+    placeable = [
+        app
+        for app in applications
+        if strategy == "dense" and app.name in names and app.plane == "control" and app.units == 1
+    ]
+    conflicts = _conflicts({app.name: app.units for app in applications}, relations)
+    machines: List[Machine] = []
+    for app in sorted(placeable, key=lambda app: COSTS.get(app.charm, DEFAULT_COST), reverse=True):
+        cost = COSTS.get(app.charm, DEFAULT_COST)
+        for i, machine in enumerate(machines):
+            used = Resources(machine.used.cores + cost.cores, machine.used.mem + cost.mem)
+            if (
+                machine.constraints == app.constraints
+                and used.cores <= machine.capacity.cores
+                and used.mem <= machine.capacity.mem
+                and not any((app.name, other) in conflicts for other in machine.applications)
+            ):
+                machines[i] = machine._replace(
+                    applications=machine.applications + [app.name], used=used
+                )
+                break
+        else:
+            machines.append(Machine([app.name], app.constraints, capacity(app.constraints), cost))
+
+    placed = {name for machine in machines for name in machine.applications}
+    unplaced = {
+        app.name: app.units
+        for app in applications
+        if app.units and app.name in names and app.name not in placed
+    }
+    return Layout(strategy, machines, unplaced)
+
+
+def machine_count(layout: Layout) -> int:
+    """Get number of machines a layout provisions."""
+    return len(layout.machines) + sum(layout.unplaced.values())
+
+
+def apply(bundle: Dict, layout: Layout, series: Optional[str] = None) -> Dict:
+    """Add machines of a layout to a bundle, and place applications on them."""
+    if not layout.machines:
+        return bundle
+    machines = {}
+    for i, machine in enumerate(layout.machines):
+        machines[str(i)] = {"series": series} if series else {}
+        if machine.constraints:
+            machines[str(i)]["constraints"] = " ".join(
+                f"{k}={v}" for k, v in machine.constraints.items()
+            )
+        for name in machine.applications:
+            bundle["applications"][name]["to"] = [str(i)]
+    bundle["machines"] = machines
+    return bundle
+
+
+def format_layout(layout: Layout) -> List[str]:
+    """Render a layout as lines of text."""
+    lines = [f"Placement: {layout.strategy}, {machine_count(layout)} machines"]
+    for i, machine in enumerate(layout.machines):
+        lines.append(
+            f"  machine {i}: {', '.join(machine.applications)} "
+            f"({machine.used.cores:g}/{machine.capacity.cores:g} cores, "
+            f"{machine.used.mem / 1024:g}/{machine.capacity.mem / 1024:g}G)"
+        )
+    for name, units in layout.unplaced.items():
+        lines.append(f"  {name}: {units} machine{'s' if units != 1 else ''} of its own")
+    return lines
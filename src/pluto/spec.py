@@ -0,0 +1,335 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Declarative specification of an HPC cluster's topology."""
+
+import os
+from collections import namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import yaml
+
+from pluto import placement
+
+DEFAULT_SPEC = """
+base: ubuntu@22.04
+applications:
+  slurm-controller:
+    charm: slurmctld
+    channel: edge
+    units: 1
+    plane: control
+    config:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  compute:
+    charm: slurmd
+    channel: edge
+    units: 1
+    plane: compute
+    config:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  slurm-database:
+    charm: slurmdbd
+    channel: edge
+    units: 1
+    plane: control
+    config:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  slurm-restapi:
+    charm: slurmrestd
+    channel: edge
+    units: 1
+    plane: control
+    config:
+      custom-slurm-repo: ppa:ubuntu-hpc/slurm-wlm-23.02
+  mysql:
+    charm: mysql
+    channel: 8.0/edge
+    units: 1
+    plane: control
+  slurm-database-mysql-router:
+    charm: mysql-router
+    channel: dpe/edge
+    units: 0
+  sssd:
+    charm: sssd
+    channel: edge
+    units: 0
+  glauth:
+    charm: glauth
+    channel: edge
+    units: 1
+    plane: control
+    config:
+      ldap-search-base: dc=glauth,dc=com
+      tls: "true"
+  home:
+    charm: nfs-client
+    channel: edge
+    units: 0
+    config:
+      mountpoint: /home
+  home-nfs-proxy:
+    charm: nfs-server-proxy
+    channel: edge
+    units: 1
+    plane: control
+  nfs-server:
+    charm: ubuntu
+    units: 1
+    plane: control
+relations:
+  - [compute:slurmd, slurm-controller:slurmd]
+  - [slurm-restapi:slurmrestd, slurm-controller:slurmrestd]
+  - [slurm-database:slurmdbd, slurm-controller:slurmdbd]
+  - [slurm-database-mysql-router:backend-database, mysql:database]
+  - [slurm-database:database, slurm-database-mysql-router:database]
+  - [compute:juju-info, home:juju-info]
+  - [slurm-controller:juju-info, home:juju-info]
+  - [compute:juju-info, sssd:juju-info]
+  - [slurm-controller:juju-info, sssd:juju-info]
+  - [nfs-server:juju-info, sssd:juju-info]
+"""
+
+_SERIES = {
+    "ubuntu@20.04": "focal",
+    "ubuntu@22.04": "jammy",
+    "ubuntu@24.04": "noble",
+}
+
+# Application that runs the optional caching apt proxy of a cluster.
+PACKAGE_CACHE = "apt-cache"
+
+ApplicationSpec = namedtuple(
+    "ApplicationSpec",
+    ["name", "charm", "channel", "units", "plane", "config", "constraints"],
+    defaults=[None, 1, None, {}, {}],
+)
+
+
+class SpecDiff(
+    namedtuple(
+        "SpecDiff",
+        ["missing_apps", "missing_units", "missing_relations", "config_changes"],
+    )
+):
+    """Work needed to bring a live cluster in line with its specification."""
+
+    @property
+    def empty(self) -> bool:
+        """Determine if the live cluster already matches its specification."""
+        return not any(self)
+
+
+class SpecError(Exception):
+    """Raise if cluster specification is invalid."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+def _constraints(constraints: Union[str, Dict[str, Any], None]) -> Dict[str, str]:
+    """Normalize constraints to a dict keyed by Juju constraint names."""
+    if not constraints:
+        return {}
+    if isinstance(constraints, str):
+        constraints = dict(c.split("=", 1) for c in constraints.split())
+    return {k.replace("_", "-"): str(v) for k, v in constraints.items()}
+
+
+class ClusterSpec:
+    """Applications, relations and placement of an HPC cluster."""
+
+    def __init__(
+        self,
+        applications: Iterable[ApplicationSpec],
+        relations: Iterable[Tuple[str, str]] = (),
+        base: str = "ubuntu@22.04",
+        placement: str = "spread",
+    ) -> None:
+        self.applications: Dict[str, ApplicationSpec] = {app.name: app for app in applications}
+        self.relations: List[Tuple[str, str]] = [tuple(r) for r in relations]
+        self.base = base
+        self.placement = placement
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClusterSpec":
+        """Load cluster specification from a dict.
+
+        Args:
+            data: Parsed cluster specification.
+
+        Raises:
+            SpecError: Raised if the specification is malformed.
+        """
+        if not isinstance(data, dict) or not isinstance(data.get("applications"), dict):
+            raise SpecError("Cluster specification must define a mapping of applications")
+
+        applications = []
+        for name, app in data["applications"].items():
+            if not isinstance(app, dict) or "charm" not in app:
+                raise SpecError(f"Application {name} must define a charm")
+            unknown = set(app) - {"charm", "channel", "units", "plane", "config", "constraints"}
+            if unknown:
+                raise SpecError(f"Application {name} has unknown keys {sorted(unknown)}")
+            applications.append(
+                ApplicationSpec(
+                    name=name,
+                    charm=app["charm"],
+                    channel=app.get("channel"),
+                    units=int(app.get("units", 1)),
+                    plane=app.get("plane"),
+                    config={k: str(v) for k, v in (app.get("config") or {}).items()},
+                    constraints=_constraints(app.get("constraints")),
+                )
+            )
+
+        relations = []
+        for relation in data.get("relations") or []:
+            if len(relation) != 2:
+                raise SpecError(f"Relation {relation} must have exactly two endpoints")
+            for endpoint in relation:
+                if endpoint.split(":")[0] not in data["applications"]:
+                    raise SpecError(f"Relation endpoint {endpoint} names unknown application")
+            relations.append(tuple(relation))
+
+        strategy = data.get("placement", "spread")
+        if strategy not in placement.PLACEMENTS:
+            raise SpecError(f"Unknown placement {strategy}")
+
+        base = data.get("base", "ubuntu@22.04")
+        if base not in _SERIES:
+            raise SpecError(f"Unsupported base {base}")
+
+        return cls(applications, relations, base, strategy)
+
+    @classmethod
+    def from_yaml(cls, path: Union[str, os.PathLike]) -> "ClusterSpec":
+        """Load cluster specification from a YAML file.
+
+        Args:
+            path: YAML file to load.
+        """
+        with open(path) as f:
+            return cls.from_dict(yaml.safe_load(f))
+
+    @classmethod
+    def default(cls) -> "ClusterSpec":
+        """Get specification of pluto's default micro-HPC cluster."""
+        return cls.from_dict(yaml.safe_load(DEFAULT_SPEC))
+
+    def require(self, *names: str) -> None:
+        """Check that applications are part of the specification.
+
+        Raises:
+            SpecError: Raised if an application is missing.
+        """
+        if missing := [name for name in names if name not in self.applications]:
+            raise SpecError(f"Cluster specification is missing applications {missing}")
+
+    def scale(self, application_name: str, units: int) -> None:
+        """Set the number of units of an application.
+
+        Args:
+            application_name: Application to scale.
+            units: Number of units to deploy.
+        """
+        app = self.applications[application_name]
+        self.applications[application_name] = app._replace(units=units)
+
+    def constrain(self, plane: str, constraints: Optional[Dict[str, str]]) -> None:
+        """Apply constraints to every application in a plane.
+
+        Args:
+            plane: Plane of applications to constrain, e.g. "control" or "compute".
+            constraints: Constraints as parsed from the command line.
+        """
+        for name, app in self.applications.items():
+            if app.plane == plane and constraints:
+                self.applications[name] = app._replace(
+                    constraints={**app.constraints, **_constraints(constraints)}
+                )
+
+    def cache_packages(self) -> None:
+        """Add a caching apt proxy to the control plane, if the specification has none."""
+        if PACKAGE_CACHE not in self.applications:
+            self.applications[PACKAGE_CACHE] = ApplicationSpec(
+                PACKAGE_CACHE, "ubuntu", units=1, plane="control"
+            )
+
+    def place(self, strategy: str) -> None:
+        """Set how applications are placed onto machines.
+
+        Args:
+            strategy: "spread" to give every unit a machine of its own, or
+                "dense" to pack control-plane applications onto fewer machines.
+
+        Raises:
+            SpecError: Raised if the strategy is unknown.
+        """
+        if strategy not in placement.PLACEMENTS:
+            raise SpecError(f"Unknown placement {strategy}")
+        self.placement = strategy
+
+    def layout(self, applications: Optional[Iterable[str]] = None) -> placement.Layout:
+        """Plan which applications share machines.
+
+        Args:
+            applications: Only place these applications. If omitted, place them all.
+        """
+        return placement.plan(
+            list(self.applications.values()), self.relations, self.placement, applications
+        )
+
+    def topology(self) -> str:
+        """Get coarse description of the cluster's size, for comparing bootstraps.
+
+        Clusters are alike if they place applications the same way and
+        provision machines of the same power of two.
+        """
+        machines = placement.machine_count(self.layout())
+        return f"{self.placement}-{1 << max(machines - 1, 0).bit_length()}"
+
+    def to_bundle(self, applications: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """Compile specification into a Juju bundle.
+
+        Args:
+            applications:
+                Only include these applications, and the relations between them.
+                If omitted, include the whole specification.
+        """
+        series = _SERIES.get(self.base)
+        if series is None:
+            raise SpecError(f"Unsupported base {self.base}")
+
+        names = set(self.applications if applications is None else applications)
+        relations = [list(r) for r in self.relations if all(e.split(":")[0] in names for e in r)]
+        applications = {}
+        for name, app in self.applications.items():
+            if name not in names:
+                continue
+            entry = {"charm": app.charm}
+            if app.channel:
+                entry["channel"] = app.channel
+            # Subordinates are deployed without units of their own.
+            if app.units:
+                entry["num_units"] = app.units
+            if app.config:
+                entry["options"] = dict(app.config)
+            if app.constraints:
+                entry["constraints"] = " ".join(f"{k}={v}" for k, v in app.constraints.items())
+            applications[name] = entry
+
+        bundle = {"series": series, "applications": applications, "relations": relations}
+        return placement.apply(bundle, self.layout(names), series)
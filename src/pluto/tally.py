@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Count categories, such as votes, in CSV datasets of any size.
+
+This module only uses the Python standard library and does not import
+the rest of pluto, so it can be copied onto a cluster and run with the
+system python3:
+
+    python3 tally.py distro_name_dataset.csv
+
+Datasets are memory-mapped and split into byte ranges that start and end
+on line boundaries, and the ranges are counted in parallel by worker
+processes, one chunk at a time. Within a Slurm job array, each task only
+counts its share of the dataset, given by `SLURM_ARRAY_TASK_ID`, and
+saves its partial counts with --output for a later run to merge:
+
+    python3 tally.py dataset.csv --output counts/$SLURM_ARRAY_TASK_ID.json
+    python3 tally.py counts/*.json
+
+By default the last column of each row is counted. Rows are split on
+their last comma, so a quoted last field containing commas is only
+counted correctly with --column, which parses rows as CSV at a cost.
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import os
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bytes read from the dataset at a time by each worker.
+CHUNK_SIZE = 1 << 24
+
+
+def array_shard() -> Tuple[int, int]:
+    """Get index of this Slurm array task and number of tasks in the array.
+
+    Returns:
+        (0, 1) outside of a Slurm job array.
+    """
+    try:
+        task = int(os.environ["SLURM_ARRAY_TASK_ID"]) - int(os.getenv("SLURM_ARRAY_TASK_MIN", 0))
+        return task, int(os.environ["SLURM_ARRAY_TASK_COUNT"])
+    except (KeyError, ValueError):
+        return 0, 1
+
+
+def default_workers() -> int:
+    """Get number of CPUs allocated to this Slurm job, or available on this machine."""
+    if cpus := os.getenv("SLURM_CPUS_PER_TASK"):
+        return max(int(cpus), 1)
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def _line_start(data: mmap.mmap, offset: int) -> int:
+    """Get offset of the first line that starts at or after an offset."""
+    if offset <= 0:
+        return 0
+    newline = data.find(b"\n", offset - 1)
+    return len(data) if newline < 0 else newline + 1
+
+
+def split(path: str, parts: int, shard: Tuple[int, int] = (0, 1)) -> List[Tuple[int, int]]:
+    """Split a shard of a dataset into byte ranges of whole lines.
+
+    Args:
+        path: Path to the dataset.
+        parts: Number of ranges to split shard into.
+        shard: Index of the shard and number of shards to split the dataset into.
+            Default: (0, 1), the whole dataset.
+    """
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    index, shards = shard
+    first, last = size * index // shards, size * (index + 1) // shards
+    step = (last - first) / max(parts, 1)
+    bounds = [first + round(step * i) for i in range(max(parts, 1))] + [last]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        starts = [_line_start(data, offset) for offset in bounds]
+    return [(start, end) for start, end in zip(starts, starts[1:]) if start < end]
+
+
+def _count_last(chunk: bytes, known: List[bytes], counts: Counter) -> None:
+    """Count the last fields of the lines within a chunk.
+
+    Fields seen before are counted by searching for the end of lines
+    they appear in, which is much faster than splitting lines. If that
+    does not account for every line, the chunk is counted line by line,
+    and new fields are remembered.
+    """
+    lines = chunk.count(b"\n")
+    found = [chunk.count(b"," + field + b"\n") for field in known]
+    if sum(found) == lines:
+        counts.update(dict(zip(known, found)))
+        return
+    fields = Counter(line[line.rfind(b",") + 1 :] for line in chunk.split(b"\n")[:-1])
+    counts.update(fields)
+    known.extend(field for field in fields if field not in known and b"," not in field)
+
+
+def _count_column(chunk: bytes, column: int, counts: Counter) -> None:
+    """Count one column of the CSV rows within a chunk."""
+    for row in csv.reader(chunk.decode(errors="replace").splitlines()):
+        if len(row) > abs(column) - (column < 0):
+            counts[row[column]] += 1
+
+
+def _label(field: bytes) -> str:
+    """Get category of a raw field."""
+    return field.decode(errors="replace").strip().strip('"')
+
+
+def count_range(
+    path: str, start: int, end: int, column: Optional[int] = None, header: bool = False
+) -> Dict[str, int]:
+    """Count categories of the lines within a byte range of a dataset.
+
+    Args:
+        path: Path to the dataset.
+        start: Offset of the first line to count.
+        end: Offset just after the last line to count.
+        column: Column to count. Default: None, the last column.
+        header: Skip the first line of the dataset. Default: False.
+    """
+    counts: Counter = Counter()
+    known: List[bytes] = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if header and start == 0:
+            start = _line_start(data, 1)
+        while start < end:
+            stop = min(start + CHUNK_SIZE, end)
+            if stop < end:
+                stop = data.rfind(b"\n", start, stop) + 1 or _line_start(data, stop)
+            chunk = data[start:stop]
+            if not chunk.endswith(b"\n"):
+                chunk += b"\n"
+            if column is None:
+                _count_last(chunk, known, counts)
+            else:
+                _count_column(chunk, column, counts)
+            start = stop
+
+    labels: Counter = Counter()
+    for field, n in counts.items():
+        labels[field if isinstance(field, str) else _label(field)] += n
+    return dict(labels)
+
+
+def count(
+    path: str,
+    workers: int = 1,
+    shard: Tuple[int, int] = (0, 1),
+    column: Optional[int] = None,
+    header: bool = False,
+) -> Dict[str, int]:
+    """Count categories within a shard of a dataset using several processes.
+
+    Args:
+        path: Path to the dataset.
+        workers: Number of worker processes. Default: 1, count in this process.
+        shard: Index of the shard and number of shards. Default: (0, 1), the whole dataset.
+        column: Column to count. Default: None, the last column.
+        header: Skip the first line of the dataset. Default: False.
+    """
+    ranges = split(path, workers, shard)
+    args = [(path, start, end, column, header) for start, end in ranges]
+    if workers <= 1 or len(ranges) <= 1:
+        return merge(count_range(*a) for a in args)
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(min(workers, len(ranges))) as pool:
+        return merge(pool.map(count_range, *zip(*args)))
+
+
+def merge(partials: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    """Add up partial counts."""
+    total: Counter = Counter()
+    for partial in partials:
+        total.update(partial)
+    return dict(total)
+
+
+def report(counts: Dict[str, int]) -> str:
+    """Render counts and shares of categories, most common first."""
+    rows = sum(counts.values())
+    width = max((len(label) for label in counts), default=0)
+    lines = [f"Counted {rows} rows in {len(counts)} categories"]
+    for label, n in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+        lines.append(f"  {label:<{width}}  {n:>12}  {n / rows:>7.2%}")
+    return "\n".join(lines)
+
+
+def _load(path: str) -> Tuple[Dict[str, int], Optional[Tuple[int, int]]]:
+    """Load partial counts saved with --output."""
+    with open(path) as f:
+        saved = json.load(f)
+    return saved["counts"], tuple(saved["shard"]) if "shard" in saved else None
+
+
+def _missing_shards(shards: Sequence[Tuple[int, int]]) -> List[int]:
+    """Get indices of shards missing from a set of partial counts."""
+    total = max(n for _, n in shards)
+    return sorted(set(range(total)) - {i for i, _ in shards})
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Define arguments and flags of the tally command."""
+    parser.add_argument(
+        "paths",
+        nargs="+",
+        metavar="path",
+        help="CSV datasets to count, or partial counts saved with --output to merge.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Worker processes. Default: allocated CPUs."
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        default=None,
+        metavar="I/N",
+        help="Only count shard I of N of each dataset. Default: this Slurm array task's share.",
+    )
+    parser.add_argument("--column", type=int, default=None, help="Column to count. Default: last.")
+    parser.add_argument(
+        "--header", default=False, action="store_true", help="Skip the first line of datasets."
+    )
+    parser.add_argument("--output", type=str, default=None, help="Save counts to a JSON file.")
+
+
+def run(args: argparse.Namespace) -> int:
+    """Count datasets and merge partial counts as requested by parsed arguments."""
+    if args.shard:
+        index, _, shards = args.shard.partition("/")
+        shard = (int(index), int(shards))
+    else:
+        shard = array_shard()
+    workers = args.workers or default_workers()
+
+    partials, shards, counted = [], [], False
+    for path in args.paths:
+        if path.endswith(".json"):
+            counts, saved = _load(path)
+            if saved is not None:
+                shards.append(saved)
+        else:
+            counts = count(path, workers, shard, args.column, args.header)
+            counted = True
+        partials.append(counts)
+    total = merge(partials)
+
+    if shards and (missing := _missing_shards(shards)):
+        print(f"Warning: partial counts of shards {missing} are missing", file=sys.stderr)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            # Only counts of datasets belong to a shard. Merged counts are whole.
+            json.dump({"shard": list(shard), "counts": total} if counted else {"counts": total}, f)
+    print(report(total))
+    return 0
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Run tally as a standalone script."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
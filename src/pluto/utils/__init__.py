@@ -0,0 +1,13 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Utilities shared across pluto commands."""
+
+from .cache import ArtifactCache, ArtifactCacheError
+from .dag import StepGraph, StepGraphError
+from .history import History, StepMonitor
+from .http import HTTPError, HTTPPool
+from .journal import Journal
+from .ratelimit import TokenBucket
+from .stats import percentile, summarize
+from .trace import Tracer, tracer
@@ -0,0 +1,223 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Content-addressed cache for artifacts downloaded by pluto."""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Union
+from urllib import request
+from urllib.parse import urlparse
+
+from .paths import data_dir
+
+_CHUNK_SIZE = 1 << 16
+
+
+class ArtifactCacheError(Exception):
+    """Raise if artifact cache encounters an error."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+class ArtifactCache:
+    """Store downloaded artifacts keyed by their SHA-256 digest.
+
+    Artifacts live at `<root>/objects/<sha256>/<filename>`. An index maps
+    source URLs to digests and tracks the size and last access time of each
+    entry so that the least recently used entries can be evicted once the
+    cache grows past `max_size` bytes.
+    """
+
+    def __init__(
+        self,
+        root: Optional[Union[str, os.PathLike]] = None,
+        max_size: int = 1 << 30,
+        offline: bool = False,
+    ) -> None:
+        self.root = Path(root) if root else data_dir() / "artifacts"
+        self.max_size = max_size
+        self.offline = offline
+        self._index_path = self.root / "index.json"
+        self._index = self._load()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    def _load(self) -> Dict[str, Dict]:
+        """Load cache index from disk."""
+        try:
+            index = json.loads(self._index_path.read_text())
+        except (FileNotFoundError, ValueError):
+            index = {}
+        index.setdefault("urls", {})
+        index.setdefault("entries", {})
+        return index
+
+    def _save(self) -> None:
+        """Atomically write cache index to disk."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.root, delete=False) as f:
+            json.dump(self._index, f)
+        os.replace(f.name, self._index_path)
+
+    def _path(self, digest: str) -> Optional[Path]:
+        """Get path of cached artifact if it is still on disk."""
+        entry = self._index["entries"].get(digest)
+        if entry is None:
+            return None
+        path = self.root / "objects" / digest / entry["filename"]
+        return path if path.exists() else None
+
+    @property
+    def size(self) -> int:
+        """Get total size of cached artifacts in bytes."""
+        return sum(entry["size"] for entry in self._index["entries"].values())
+
+    def get(self, url: str, sha256: Optional[str] = None) -> Optional[Path]:
+        """Get path of cached artifact without downloading it.
+
+        Args:
+            url: URL the artifact was downloaded from.
+            sha256: Expected digest of the artifact. Default: None.
+        """
+        digest = sha256 or self._index["urls"].get(url)
+        if digest is None or (path := self._path(digest)) is None:
+            return None
+
+        self._index["urls"][url] = digest
+        self._index["entries"][digest]["atime"] = time.time()
+        self._save()
+        return path
+
+    async def fetch(self, url: str, sha256: Optional[str] = None) -> Path:
+        """Get artifact from the cache, downloading it if necessary.
+
+        Concurrent requests for the same URL share one download.
+
+        Args:
+            url: URL to download artifact from.
+            sha256: Expected digest of the artifact. Default: None.
+
+        Raises:
+            ArtifactCacheError:
+                Raised if the artifact is not cached in offline mode,
+                or if the downloaded artifact does not match `sha256`.
+        """
+        if path := self.get(url, sha256):
+            return path
+        if self.offline:
+            raise ArtifactCacheError(f"Artifact {url} is not cached and pluto is offline")
+
+        if url not in self._inflight:
+            self._inflight[url] = asyncio.ensure_future(self._download(url, sha256))
+        try:
+            return await asyncio.shield(self._inflight[url])
+        finally:
+            if self._inflight.get(url) is not None and self._inflight[url].done():
+                del self._inflight[url]
+
+    def add(self, url: str, path: Union[str, os.PathLike]) -> Path:
+        """Seed the cache with a local copy of an artifact.
+
+        Useful for preparing an offline cache on a machine without network access.
+
+        Args:
+            url: URL the artifact would otherwise be downloaded from.
+            path: Local copy of the artifact.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(path, "rb") as source:
+            return self._insert(url, *self._spool(source), None)
+
+    async def _download(self, url: str, sha256: Optional[str]) -> Path:
+        """Download artifact into the cache without blocking the event loop."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        loop = asyncio.get_event_loop()
+        tmp, digest, size = await loop.run_in_executor(None, self._stream, url)
+        return self._insert(url, tmp, digest, size, sha256)
+
+    def _insert(self, url: str, tmp: str, digest: str, size: int, sha256: Optional[str]) -> Path:
+        """Move a spooled artifact into place and record it in the index."""
+        if sha256 and digest != sha256:
+            os.unlink(tmp)
+            raise ArtifactCacheError(f"Artifact {url} has digest {digest}, expected {sha256}")
+
+        filename = Path(urlparse(url).path).name or "artifact"
+        path = self.root / "objects" / digest / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, path)
+
+        self._index["urls"][url] = digest
+        self._index["entries"][digest] = {
+            "filename": filename,
+            "size": size,
+            "atime": time.time(),
+        }
+        self.evict(keep=digest)
+        return path
+
+    def _stream(self, url: str):
+        """Stream URL to a temporary file inside the cache while hashing it."""
+        with request.urlopen(url) as response:
+            tmp, digest, size = self._spool(response)
+        # Reads of a set size return what arrived if the connection breaks off.
+        expected = response.headers.get("Content-Length")
+        if expected is not None and int(expected) != size:
+            os.unlink(tmp)
+            raise ArtifactCacheError(
+                f"Download of {url} broke off after {size} of {expected} bytes"
+            )
+        return tmp, digest, size
+
+    def _spool(self, source: BinaryIO):
+        """Copy a file object to a temporary file inside the cache while hashing it."""
+        sha = hashlib.sha256()
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=self.root, delete=False) as f:
+            try:
+                while chunk := source.read(_CHUNK_SIZE):
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        return f.name, sha.hexdigest(), size
+
+    def evict(self, keep: Optional[str] = None) -> None:
+        """Remove least recently used artifacts until the cache fits within `max_size`.
+
+        Args:
+            keep: Digest of an artifact that must not be evicted. Default: None.
+        """
+        entries = self._index["entries"]
+        total = self.size
+        for digest in sorted(entries, key=lambda d: entries[d]["atime"]):
+            if total <= self.max_size:
+                break
+            if digest == keep:
+                continue
+            total -= entries.pop(digest)["size"]
+            shutil.rmtree(self.root / "objects" / digest, ignore_errors=True)
+
+        self._index["urls"] = {
+            url: digest for url, digest in self._index["urls"].items() if digest in entries
+        }
+        self._save()
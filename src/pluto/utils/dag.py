@@ -0,0 +1,218 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Run asynchronous steps as a dependency graph."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from .trace import tracer
+
+
+class StepGraphError(Exception):
+    """Raise if step graph encounters an error."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+class Step:
+    """Named unit of work within a step graph."""
+
+    def __init__(
+        self, name: str, func: Callable[[], Awaitable[Any]], requires: Iterable[str] = ()
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.result: Any = None
+
+    @property
+    def duration(self) -> float:
+        """Get how long the step ran for in seconds."""
+        if self.start is None or self.end is None:
+            return 0.0
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        """String representation of the step."""
+        return f"<{type(self).__name__} {self.name} requires={list(self.requires)}>"
+
+
+class StepGraph:
+    """Execute steps as soon as the steps they depend on have completed."""
+
+    def __init__(self) -> None:
+        self._steps: Dict[str, Step] = {}
+        self._origin: Optional[float] = None
+
+    def __getitem__(self, name: str) -> Step:
+        """Get step by name."""
+        return self._steps[name]
+
+    def __iter__(self):
+        """Iterate over steps in the order they were added."""
+        return iter(self._steps.values())
+
+    def add(
+        self, name: str, func: Callable[[], Awaitable[Any]], requires: Iterable[str] = ()
+    ) -> Step:
+        """Add a step to the graph.
+
+        Args:
+            name: Unique name of the step.
+            func: Coroutine function to call when the step runs.
+            requires: Names of steps that must complete before this step starts.
+        """
+        if name in self._steps:
+            raise StepGraphError(f"Step {name} is already defined")
+        self._steps[name] = step = Step(name, func, requires)
+        return step
+
+    def step(self, name: str, requires: Iterable[str] = ()) -> Callable:
+        """Decorator form of `add`.
+
+        Args:
+            name: Unique name of the step.
+            requires: Names of steps that must complete before this step starts.
+        """
+
+        def decorator(func: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+            self.add(name, func, requires)
+            return func
+
+        return decorator
+
+    def order(self) -> List[Step]:
+        """Get steps in a valid execution order.
+
+        Raises:
+            StepGraphError: Raised if a step has an unknown dependency or the graph has a cycle.
+        """
+        for step in self:
+            for dep in step.requires:
+                if dep not in self._steps:
+                    raise StepGraphError(f"Step {step.name} requires unknown step {dep}")
+
+        ordered = []
+        pending = {step.name: set(step.requires) for step in self}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise StepGraphError(f"Dependency cycle between steps {sorted(pending)}")
+            for name in ready:
+                ordered.append(self._steps[name])
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+
+        return ordered
+
+    async def _run_step(
+        self,
+        step: Step,
+        tasks: Dict[str, asyncio.Task],
+        on_complete: Optional[Callable[[Step], None]],
+    ) -> Any:
+        """Wait for the dependencies of a step and then run it."""
+        if step.requires:
+            await asyncio.gather(*(tasks[dep] for dep in step.requires))
+        step.start = asyncio.get_event_loop().time()
+        try:
+            with tracer.span(step.name, cat="step"):
+                step.result = await step.func()
+        finally:
+            step.end = asyncio.get_event_loop().time()
+        if on_complete is not None:
+            on_complete(step)
+        return step.result
+
+    async def _skip_step(self, step: Step) -> None:
+        """Treat a step as already completed."""
+        step.start = step.end = asyncio.get_event_loop().time()
+
+    async def run(
+        self,
+        skip: Iterable[str] = (),
+        on_complete: Optional[Callable[[Step], None]] = None,
+    ) -> Dict[str, Any]:
+        """Run all steps in the graph.
+
+        Args:
+            skip: Names of steps that already completed and must not run again.
+            on_complete: Callback invoked with each step after it completes successfully.
+
+        Returns:
+            Results of each step keyed by step name.
+
+        Raises:
+            StepGraphError: Raised if a step fails. Running steps are cancelled.
+        """
+        skip = frozenset(skip)
+        tasks: Dict[str, asyncio.Task] = {}
+        self._origin = asyncio.get_event_loop().time()
+        for step in self.order():
+            if step.name in skip:
+                tasks[step.name] = asyncio.ensure_future(self._skip_step(step))
+            else:
+                tasks[step.name] = asyncio.ensure_future(self._run_step(step, tasks, on_complete))
+
+        done, pending = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for name, task in tasks.items():
+            if task not in done or task.cancelled() or task.exception() is None:
+                continue
+            # Dependents of a failed step fail too, but never get to start.
+            if self._steps[name].start is not None:
+                raise StepGraphError(f"Step {name} failed. Reason:\n{task.exception()}") from (
+                    task.exception()
+                )
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> List[Step]:
+        """Get the chain of steps that determined total wall-clock time.
+
+        Starting from the step that finished last, follow the dependency
+        that finished last at each step back to a root of the graph.
+        """
+        finished = [step for step in self if step.end is not None]
+        if not finished:
+            return []
+
+        path = [max(finished, key=lambda s: s.end)]
+        while path[-1].requires:
+            deps = [self._steps[dep] for dep in path[-1].requires]
+            path.append(max(deps, key=lambda s: s.end or 0.0))
+
+        return path[::-1]
+
+    def report(self) -> List[str]:
+        """Summarize the critical path as printable lines."""
+        path = self.critical_path()
+        if not path:
+            return []
+
+        total = path[-1].end - self._origin
+        lines = [f"Critical path ({total:.1f}s):"]
+        for step in path:
+            lines.append(
+                f"  {step.name:<24} {step.start - self._origin:>8.1f}s +{step.duration:.1f}s"
+            )
+        return lines
@@ -0,0 +1,162 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""History of how long steps took, for estimating how long they will take."""
+
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+from .dag import Step, StepGraph
+from .paths import data_dir
+from .stats import percentile
+
+# Fewer durations than this do not say how long a step usually takes.
+MIN_SAMPLES = 3
+
+
+class History:
+    """Record how long steps took, keyed by what they ran against.
+
+    A key such as the cloud and topology of a cluster groups runs of steps
+    that are expected to take about as long as each other. Only the most
+    recent durations of each step are kept, so estimates follow changes in
+    the cloud. The history is written to disk after every change.
+    """
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None, keep: int = 20) -> None:
+        self.path = Path(path) if path else data_dir() / "history.json"
+        self.keep = keep
+        try:
+            self._data: Dict[str, Dict[str, List[float]]] = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            self._data = {}
+
+    def _save(self) -> None:
+        """Atomically write history to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+            json.dump(self._data, f)
+        os.replace(f.name, self.path)
+
+    def record(self, key: str, step: str, duration: float) -> None:
+        """Record how long a step took.
+
+        Args:
+            key: What the step ran against.
+            step: Name of the step.
+            duration: Seconds the step took.
+        """
+        durations = self._data.setdefault(key, {}).setdefault(step, [])
+        durations.append(round(duration, 3))
+        del durations[: -self.keep]
+        self._save()
+
+    def durations(self, key: str, step: str) -> List[float]:
+        """Get recorded durations of a step, oldest first."""
+        return list(self._data.get(key, {}).get(step, []))
+
+    def expected(self, key: str, step: str, p: float = 50) -> Optional[float]:
+        """Get a percentile of the recorded durations of a step.
+
+        Args:
+            key: What the step runs against.
+            step: Name of the step.
+            p: Percentile to get, between 0 and 100. Default: 50.
+
+        Returns:
+            Seconds, or None if the step has not run often enough to tell.
+        """
+        durations = self.durations(key, step)
+        return percentile(durations, p) if len(durations) >= MIN_SAMPLES else None
+
+
+class StepMonitor:
+    """Watch the steps of a running graph against their history.
+
+    The monitor estimates how long the graph has left to run, and flags
+    steps that run far longer than they did before, so that a stuck step
+    is noticed long before whatever it waits on times out.
+    """
+
+    def __init__(
+        self,
+        graph: StepGraph,
+        history: History,
+        key: str,
+        stall_factor: float = 2.0,
+        interval: float = 5.0,
+    ) -> None:
+        self.graph = graph
+        self.history = history
+        self.key = key
+        self.stall_factor = stall_factor
+        self.interval = interval
+        self.stalled: Dict[str, float] = {}
+
+    def complete(self, step: Step) -> None:
+        """Record how long a completed step took."""
+        self.history.record(self.key, step.name, step.duration)
+
+    def eta(self, now: float) -> Optional[float]:
+        """Get seconds until the graph is expected to finish.
+
+        Each unfinished step is expected to take its median duration,
+        starting once the steps it requires are expected to finish.
+
+        Returns:
+            Seconds, or None if a step that has yet to finish has no history.
+        """
+        finish: Dict[str, float] = {}
+        for step in self.graph.order():
+            if step.end is not None:
+                finish[step.name] = step.end
+                continue
+            expected = self.history.expected(self.key, step.name)
+            if expected is None:
+                return None
+            if step.start is not None:
+                finish[step.name] = max(step.start + expected, now)
+            else:
+                ready = max((finish[dep] for dep in step.requires), default=now)
+                finish[step.name] = max(ready, now) + expected
+        return max(finish.values(), default=now) - now
+
+    def check(self, now: float) -> List[Step]:
+        """Get running steps that have newly overrun their history.
+
+        A step overruns once it has run `stall_factor` times as long as the
+        95th percentile of its recorded durations.
+        """
+        overrun = []
+        for step in self.graph:
+            if step.start is None or step.end is not None or step.name in self.stalled:
+                continue
+            p95 = self.history.expected(self.key, step.name, 95)
+            if p95 is not None and now - step.start > p95 * self.stall_factor:
+                self.stalled[step.name] = now
+                overrun.append(step)
+        return overrun
+
+    async def watch(
+        self,
+        on_eta: Callable[[Optional[float]], None],
+        on_stall: Callable[[Step, float, float], None],
+    ) -> None:
+        """Report estimates and stalls every `interval` seconds until cancelled.
+
+        Args:
+            on_eta: Called with seconds the graph has left to run, if known.
+            on_stall: Called with each overrunning step, how long it has run
+                for, and the 95th percentile of its recorded durations.
+        """
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            for step in self.check(now):
+                on_stall(step, now - step.start, self.history.expected(self.key, step.name, 95))
+            on_eta(self.eta(now))
@@ -0,0 +1,318 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Minimal HTTP/1.1 client with keep-alive connection pooling and pipelining.
+
+Only what pluto needs to talk to REST services within a cluster is
+supported: requests with small bodies, and responses delimited by
+Content-Length or chunked transfer encoding.
+"""
+
+import asyncio
+import ssl as _ssl
+from collections import namedtuple
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+Response = namedtuple("Response", ["status", "reason", "headers", "body"])
+
+# Methods whose requests can be sent again without changing their outcome.
+_IDEMPOTENT = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Times a request is sent again after its connection turned out to be closed.
+_RESENDS = 3
+
+# Statuses of responses that never have a body, whatever their headers say.
+_NO_BODY = {204, 304}
+
+
+class HTTPError(Exception):
+    """Raise if an HTTP request fails without a response."""
+
+    @property
+    def name(self) -> str:
+        """Get a string representation of the error plus class name."""
+        return f"<{type(self).__module__}.{type(self).__name__}>"
+
+    @property
+    def message(self) -> str:
+        """Return the message passed as an argument."""
+        return self.args[0]
+
+    def __repr__(self) -> str:
+        """String representation of the error."""
+        return f"<{type(self).__module__}.{type(self).__name__} {self.args}>"
+
+
+class _DroppedConnectionError(HTTPError):
+    """Raise if a connection is lost before any part of a response arrived."""
+
+    def __init__(self, message: str, sent: bool) -> None:
+        super().__init__(message)
+        self.sent = sent
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: Dict[str, str]) -> bytes:
+    """Read body of a response according to its headers."""
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while size := int((await reader.readline()).split(b";")[0], 16):
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+        # Skip trailers.
+        while (await reader.readline()).strip():
+            pass
+        return b"".join(chunks)
+    return await reader.readexactly(int(headers.get("content-length", 0)))
+
+
+async def read_response(reader: asyncio.StreamReader, method: str = "GET") -> Response:
+    """Read a single HTTP/1.1 response from a stream.
+
+    Args:
+        reader: Stream to read from.
+        method: Method of the request the response answers. Default: "GET".
+
+    Raises:
+        asyncio.IncompleteReadError: Raised if the stream ends before the response does.
+    """
+    status_line = await reader.readline()
+    if not status_line:
+        raise asyncio.IncompleteReadError(b"", None)
+    return await _read_rest(reader, status_line, method)
+
+
+async def _read_rest(reader: asyncio.StreamReader, status_line: bytes, method: str) -> Response:
+    """Read headers and body of a response whose status line has been read.
+
+    Responses to HEAD requests, and 204 and 304 responses, have no body,
+    even if they carry the Content-Length a GET request would get.
+    """
+    _, status, *reason = status_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while (line := await reader.readline()).strip():
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    if method.upper() == "HEAD" or int(status) in _NO_BODY:
+        body = b""
+    else:
+        body = await _read_body(reader, headers)
+    return Response(int(status), "".join(reason).strip(), headers, body)
+
+
+class _Connection:
+    """Keep-alive connection that pipelines requests.
+
+    Requests are written as soon as they are sent, and responses, which
+    arrive in the same order, are matched to them by a reader task.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._reader = reader
+        self._writer = writer
+        # Futures of responses to sent requests, with the methods of the requests.
+        self._waiting: "asyncio.Queue[Tuple[asyncio.Future, str]]" = asyncio.Queue()
+        self.inflight = 0
+        self.closed = False
+        self._task = asyncio.ensure_future(self._read_responses())
+
+    @property
+    def expired(self) -> bool:
+        """Determine if the server closed the connection while it was idle."""
+        return self.inflight == 0 and self._reader.at_eof()
+
+    async def _read_responses(self) -> None:
+        """Resolve futures of sent requests with responses, in order."""
+        future = None
+        try:
+            while True:
+                future, method = await self._waiting.get()
+                try:
+                    status_line = await self._reader.readline()
+                except OSError:
+                    status_line = b""
+                if not status_line:
+                    break
+                response = await _read_rest(self._reader, status_line, method)
+                self.inflight -= 1
+                if not future.done():
+                    future.set_result(response)
+                future = None
+                if response.headers.get("connection", "").lower() == "close":
+                    break
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            self._fail(future, HTTPError(f"Connection lost: {e or type(e).__name__}"))
+            return
+        # None of the responses to the remaining requests arrived.
+        self._fail(future, _DroppedConnectionError("Connection closed by server", sent=True))
+
+    def _fail(self, future: Optional[asyncio.Future], error: HTTPError) -> None:
+        """Close connection and fail all requests awaiting a response."""
+        self.closed = True
+        self._writer.close()
+        pending = [future] if future is not None else []
+        while not self._waiting.empty():
+            pending.append(self._waiting.get_nowait()[0])
+        for waiting in pending:
+            if not waiting.done():
+                waiting.set_exception(error)
+
+    async def send(self, request: bytes, method: str) -> asyncio.Future:
+        """Write request and get future of its response."""
+        future = asyncio.get_event_loop().create_future()
+        if not self.closed and self._writer.is_closing():
+            self.close()
+        if self.closed:
+            future.set_exception(_DroppedConnectionError("Connection closed", sent=False))
+            return future
+        self.inflight += 1
+        self._waiting.put_nowait((future, method))
+        self._writer.write(request)
+        try:
+            await self._writer.drain()
+        except OSError as e:
+            self._fail(None, HTTPError(f"Connection lost: {e}"))
+        return future
+
+    def close(self) -> None:
+        """Close connection, failing requests still awaiting a response."""
+        if not self.closed:
+            self._task.cancel()
+            self._fail(None, HTTPError("Connection closed"))
+
+
+class HTTPPool:
+    """Pool of keep-alive HTTP/1.1 connections to a single server.
+
+    Up to `connections` connections are opened on demand, and each carries
+    up to `pipeline` requests awaiting a response at once. New requests go
+    to the least busy connection, so a pool of four connections with a
+    pipeline depth of eight keeps up to 32 requests in flight.
+
+    HTTP/1.1 pipelining requires the server to answer requests in order.
+    Servers close keep-alive connections that are idle or that carried
+    many requests, so a request whose connection turns out to be closed is
+    sent again on another connection, up to three times, if it was never
+    written, or if it is idempotent and none of its response arrived.
+    Other requests on a lost connection are failed rather than retried,
+    since they may have been handled.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        connections: int = 4,
+        pipeline: int = 8,
+        timeout: float = 30.0,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise HTTPError(f"Unsupported URL {url}")
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self._ssl = _ssl.create_default_context() if parts.scheme == "https" else None
+        self._prefix = parts.path.rstrip("/")
+        self._size = max(connections, 1)
+        self._pipeline = max(pipeline, 1)
+        self._timeout = timeout
+        self._headers = {"Host": parts.netloc, "Accept": "application/json", **(headers or {})}
+        self._connections: List[_Connection] = []
+        self._opening = asyncio.Lock()
+        self._slots = asyncio.Semaphore(self._size * self._pipeline)
+        self.opened = 0
+
+    async def __aenter__(self) -> "HTTPPool":
+        """Get pool of connections."""
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        """Close all connections."""
+        await self.close()
+
+    def _least_busy(self) -> Optional[_Connection]:
+        """Get the least busy open connection, unless a new one should be opened."""
+        for connection in self._connections:
+            if connection.expired:
+                connection.close()
+        self._connections = [c for c in self._connections if not c.closed]
+        idle = min(self._connections, key=lambda c: c.inflight, default=None)
+        if idle is not None and (idle.inflight == 0 or len(self._connections) >= self._size):
+            return idle
+        return None
+
+    async def _connection(self) -> _Connection:
+        """Get the least busy connection, opening one if all are busy."""
+        if (connection := self._least_busy()) is not None:
+            return connection
+        # Open one connection at a time so that a burst of requests
+        # does not open more connections than the pool holds.
+        async with self._opening:
+            if (connection := self._least_busy()) is not None:
+                return connection
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port, ssl=self._ssl), self._timeout
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                raise HTTPError(f"Failed to connect to {self.host}:{self.port}: {e}")
+            connection = _Connection(reader, writer)
+            self._connections.append(connection)
+            self.opened += 1
+            return connection
+
+    def _encode(
+        self, method: str, path: str, body: Optional[bytes], headers: Optional[Dict[str, str]]
+    ) -> bytes:
+        """Encode request line, headers and body."""
+        fields = {**self._headers, **(headers or {}), "Content-Length": str(len(body or b""))}
+        head = "".join(f"{key}: {value}\r\n" for key, value in fields.items())
+        return f"{method} {self._prefix}{path} HTTP/1.1\r\n{head}\r\n".encode() + (body or b"")
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """Send request and wait for its response.
+
+        Args:
+            method: HTTP method, e.g. "GET" or "POST".
+            path: Path of the request, relative to the pool's URL.
+            body: Body of the request. Default: None.
+            headers: Headers of the request, on top of the pool's headers. Default: None.
+
+        Raises:
+            HTTPError: Raised if the server could not be reached, the connection was
+                lost before the response arrived, or the response timed out.
+        """
+        request = self._encode(method, path, body, headers)
+        async with self._slots:
+            resends = 0
+            while True:
+                try:
+                    return await self._exchange(await self._connection(), request, method, path)
+                except _DroppedConnectionError as e:
+                    resends += 1
+                    if resends > _RESENDS or (e.sent and method.upper() not in _IDEMPOTENT):
+                        raise
+
+    async def _exchange(
+        self, connection: _Connection, request: bytes, method: str, path: str
+    ) -> Response:
+        """Send encoded request on a connection and wait for its response."""
+        future = await connection.send(request, method)
+        try:
+            return await asyncio.wait_for(future, self._timeout)
+        except asyncio.TimeoutError:
+            # Responses behind a lost one can no longer be matched to requests.
+            connection.close()
+            raise HTTPError(f"{method} {path} timed out after {self._timeout}s")
+
+    async def close(self) -> None:
+        """Close all connections."""
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
@@ -0,0 +1,84 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Checkpoint journal of completed work."""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from .paths import data_dir
+
+
+class Journal:
+    """Record which steps of an operation have completed.
+
+    The journal is written to disk after every change so an
+    interrupted operation can resume where it stopped.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path = Path(path)
+        try:
+            self._data = json.loads(self.path.read_text())
+        except (FileNotFoundError, ValueError):
+            self._data = {}
+        self._data.setdefault("steps", [])
+        self._data.setdefault("fingerprints", {})
+
+    @classmethod
+    def for_cluster(cls, name: str, operation: str = "bootstrap") -> "Journal":
+        """Get journal of an operation on a cluster.
+
+        Args:
+            name: Name of the cluster.
+            operation: Name of the operation. Default: "bootstrap".
+        """
+        return cls(data_dir() / "journal" / name / f"{operation}.json")
+
+    def _save(self) -> None:
+        """Atomically write journal to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=self.path.parent, delete=False) as f:
+            json.dump(self._data, f)
+        os.replace(f.name, self.path)
+
+    @property
+    def completed(self) -> frozenset:
+        """Get names of completed steps."""
+        return frozenset(self._data["steps"])
+
+    def complete(self, step: str) -> None:
+        """Mark step as completed.
+
+        Args:
+            step: Name of the completed step.
+        """
+        if step not in self._data["steps"]:
+            self._data["steps"].append(step)
+            self._save()
+
+    def fingerprint(self, key: str) -> Optional[Any]:
+        """Get fingerprint of previously applied content.
+
+        Args:
+            key: What the fingerprint identifies.
+        """
+        return self._data["fingerprints"].get(key)
+
+    def set_fingerprint(self, key: str, value: Any) -> None:
+        """Record fingerprint of applied content.
+
+        Args:
+            key: What the fingerprint identifies.
+            value: Fingerprint of the content, such as its digest.
+        """
+        self._data["fingerprints"][key] = value
+        self._save()
+
+    def reset(self) -> None:
+        """Forget all completed steps and fingerprints."""
+        self._data = {"steps": [], "fingerprints": {}}
+        self._save()
@@ -0,0 +1,20 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Locations of pluto's local state."""
+
+import os
+from pathlib import Path
+
+
+def data_dir() -> Path:
+    """Get directory where pluto keeps persistent local data.
+
+    Uses `$SNAP_USER_DATA` when running as a snap, otherwise
+    `$XDG_DATA_HOME/pluto` or `~/.local/share/pluto`.
+    """
+    if snap := os.getenv("SNAP_USER_DATA"):
+        return Path(snap)
+    if xdg := os.getenv("XDG_DATA_HOME"):
+        return Path(xdg) / "pluto"
+    return Path.home() / ".local" / "share" / "pluto"
@@ -0,0 +1,94 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Pack files and directory trees for distribution to units."""
+
+import gzip
+import hashlib
+import io
+import os
+import tarfile
+from collections import namedtuple
+from pathlib import Path
+from typing import Iterator, Tuple, Union
+
+# Name of the top-level member of every payload.
+MEMBER = "payload"
+
+Payload = namedtuple("Payload", ["data", "digest", "directory"])
+
+
+def _sha256(data: bytes) -> str:
+    """Get hex digest of data."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _walk(root: Path) -> Iterator[Tuple[str, Path]]:
+    """Iterate over relative paths and paths of files and directories in a tree.
+
+    Entries are sorted by the bytes of their relative path, as `LC_ALL=C sort` would.
+    """
+    entries = [
+        (os.path.relpath(os.path.join(parent, name), root), Path(parent, name))
+        for parent, dirs, files in os.walk(root)
+        for name in dirs + files
+    ]
+    return iter(sorted(entries, key=lambda entry: os.fsencode(entry[0])))
+
+
+def tree_digest(files: Iterator[Tuple[str, bytes]]) -> str:
+    """Get digest of a directory tree from the relative paths and content of its files.
+
+    The digest matches the output of
+    `find . -type f -print0 | LC_ALL=C sort -z | xargs -0r sha256sum | sha256sum`
+    run at the root of the tree.
+    """
+    manifest = "".join(f"{_sha256(data)}  ./{rel}\n" for rel, data in files)
+    return _sha256(manifest.encode())
+
+
+def _info(name: str, mode: int, size: int = 0, directory: bool = False) -> tarfile.TarInfo:
+    """Get tar header that is independent of who packed the payload, and when."""
+    info = tarfile.TarInfo(name)
+    info.type = tarfile.DIRTYPE if directory else tarfile.REGTYPE
+    info.mode, info.size = mode & 0o7777, size
+    info.mtime, info.uid, info.gid, info.uname, info.gname = 0, 0, 0, "", ""
+    return info
+
+
+def pack(source: Union[str, os.PathLike, bytes]) -> Payload:
+    """Pack content, a file or a directory tree into a compressed tarball.
+
+    The same content always packs into the same bytes, regardless of
+    timestamps and ownership.
+
+    Args:
+        source: Content of a file, or path to a file or directory to pack.
+
+    Returns:
+        Compressed tarball, digest of the content as `sha256sum` would compute
+        it on a unit, and whether the payload is a directory tree.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) as gz, tarfile.open(
+        fileobj=gz, mode="w", format=tarfile.GNU_FORMAT
+    ) as tar:
+        if isinstance(source, bytes) or not Path(source).is_dir():
+            data = source if isinstance(source, bytes) else Path(source).read_bytes()
+            mode = 0o644 if isinstance(source, bytes) else Path(source).stat().st_mode
+            tar.addfile(_info(MEMBER, mode, len(data)), io.BytesIO(data))
+            digest, directory = _sha256(data), False
+        else:
+            root = Path(source)
+            tar.addfile(_info(MEMBER, root.stat().st_mode, directory=True))
+            files = []
+            for rel, path in _walk(root):
+                name = f"{MEMBER}/{Path(rel).as_posix()}"
+                if path.is_dir():
+                    tar.addfile(_info(name, path.stat().st_mode, directory=True))
+                elif path.is_file():
+                    data = path.read_bytes()
+                    tar.addfile(_info(name, path.stat().st_mode, len(data)), io.BytesIO(data))
+                    files.append((Path(rel).as_posix(), data))
+            digest, directory = tree_digest(iter(files)), True
+    return Payload(buffer.getvalue(), digest, directory)
@@ -0,0 +1,41 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Limit the rate of operations."""
+
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """Let operations through at a steady rate, allowing short bursts.
+
+    The bucket holds up to `burst` tokens and refills at `rate` tokens per
+    second. Each operation takes a token, waiting for one if the bucket is
+    empty. Waiters are served in the order they arrived.
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None) -> None:
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = burst or max(int(rate), 1)
+        self._tokens = float(self.burst)
+        self._last: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        """Add tokens accumulated since the last refill."""
+        if self._last is not None:
+            self._tokens = min(self._tokens + (now - self._last) * self.rate, self.burst)
+        self._last = now
+
+    async def acquire(self) -> None:
+        """Take a token, waiting until one is available."""
+        loop = asyncio.get_event_loop()
+        async with self._lock:
+            self._refill(loop.time())
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill(loop.time())
+            self._tokens -= 1
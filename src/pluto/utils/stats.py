@@ -0,0 +1,44 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Summary statistics over measurements."""
+
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """Get a percentile of values, interpolating between the closest ranks.
+
+    Args:
+        values: Values to get percentile of. Need not be sorted.
+        p: Percentile to get, between 0 and 100.
+
+    Raises:
+        ValueError: Raised if there are no values.
+    """
+    if not values:
+        raise ValueError("percentile of no values")
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * min(max(p, 0), 100) / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: Sequence[float]) -> Dict[str, float]:
+    """Get mean, median, 95th and 99th percentiles and maximum of values.
+
+    Returns:
+        Dictionary with keys "mean", "p50", "p95", "p99" and "max",
+        or an empty dictionary if there are no values.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(ordered, 50),
+        "p95": percentile(ordered, 95),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1],
+    }
@@ -0,0 +1,159 @@
+# Copyright 2023 Canonical Ltd.
+# See LICENSE file for licensing details.
+
+"""Record timed spans and export them in Chrome trace-event format."""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import time
+import weakref
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+_parent: contextvars.ContextVar = contextvars.ContextVar("pluto_trace_parent", default=None)
+
+
+class Span:
+    """Timed operation recorded by the tracer."""
+
+    __slots__ = ("name", "cat", "start", "end", "track", "parent", "args")
+
+    def __init__(
+        self, name: str, cat: str, track: int, parent: Optional["Span"], args: Dict[str, Any]
+    ) -> None:
+        self.name = name
+        self.cat = cat
+        self.start = time.monotonic()
+        self.end: Optional[float] = None
+        self.track = track
+        self.parent = parent
+        self.args = args
+
+    @property
+    def duration(self) -> float:
+        """Get how long the span lasted in seconds."""
+        return (self.end or time.monotonic()) - self.start
+
+
+class Tracer:
+    """Collect spans of work performed by pluto.
+
+    Spans opened inside different asyncio tasks are placed on different
+    tracks, so operations run concurrently with `asyncio.gather` show up
+    side by side. The tracer does nothing until enabled.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.spans: List[Span] = []
+        self._origin = time.monotonic()
+        self._tracks = weakref.WeakKeyDictionary()
+        self._next_track = 1
+
+    def enable(self) -> None:
+        """Start recording spans."""
+        self.enabled = True
+        self.spans = []
+        self._origin = time.monotonic()
+
+    def _track(self) -> int:
+        """Get track of the running asyncio task."""
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return 0
+        if task not in self._tracks:
+            self._tracks[task] = self._next_track
+            self._next_track += 1
+        return self._tracks[task]
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str = "pluto", **args: Any) -> Iterator[Optional[Span]]:
+        """Time the enclosed block.
+
+        Args:
+            name: Name of the span.
+            cat: Category of the span. Default: "pluto".
+            **args: Extra details to attach to the span.
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        span = Span(name, cat, self._track(), _parent.get(), args)
+        token = _parent.set(span)
+        self.spans.append(span)
+        try:
+            yield span
+        finally:
+            span.end = time.monotonic()
+            _parent.reset(token)
+
+    def events(self) -> List[Dict[str, Any]]:
+        """Get recorded spans as Chrome trace events."""
+        events = []
+        names = {}
+        for span in self.spans:
+            args = {k: str(v) for k, v in span.args.items()}
+            if span.parent is not None:
+                args["parent"] = span.parent.name
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.cat,
+                    "ph": "X",
+                    "ts": round((span.start - self._origin) * 1e6),
+                    "dur": round(span.duration * 1e6),
+                    "pid": os.getpid(),
+                    "tid": span.track,
+                    "args": args,
+                }
+            )
+            names.setdefault(span.track, span.name)
+
+        for track, name in names.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": track,
+                    "args": {"name": name},
+                }
+            )
+        return events
+
+    def write(self, path: Union[str, os.PathLike]) -> None:
+        """Write recorded spans to a file in Chrome trace-event format.
+
+        Args:
+            path: File to write trace to.
+        """
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events(), "displayTimeUnit": "ms"}, f)
+
+    def summary(self, limit: int = 10) -> List[str]:
+        """Summarize the slowest spans as printable lines.
+
+        Args:
+            limit: Maximum number of spans to include. Default: 10.
+        """
+        slowest = sorted(self.spans, key=lambda s: s.duration, reverse=True)[:limit]
+        if not slowest:
+            return []
+
+        lines = [f"{'Span':<40} {'Start':>9} {'Duration':>9}"]
+        for span in slowest:
+            detail = " ".join(str(v) for v in span.args.values())
+            label = f"{span.name} {detail}".strip()
+            lines.append(
+                f"{label[:40]:<40} {span.start - self._origin:>8.1f}s {span.duration:>8.1f}s"
+            )
+        return lines
+
+
+tracer = Tracer()